@@ -1,301 +1,254 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import can
-
-# ---------- Global PCAN Bus and Transmissions ----------
-global_bus = None
-def get_global_bus():
-    global global_bus
-    if global_bus is None:
-        try:
-            global_bus = can.interface.Bus(interface='pcan', channel='PCAN_USBBUS1', bitrate=500000)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to initialize CAN bus: {e}")
-            return None
-    return global_bus
-
-# global_transmissions maps CAN IDs to:
-#   {"cycle_time": cycle time (ms),
-#    "params": [list of parameter functions],
-#    "job": scheduled after() job}
-global_transmissions = {}
-def global_transmit(can_id):
-    if can_id not in global_transmissions:
-        return
-    entry = global_transmissions[can_id]
-    cycle_time_ms = entry["cycle_time"]
-    combined_payload = [0] * 8
-    for func in entry["params"]:
-        payload = func()  # each function returns an 8-byte list
-        for i in range(8):
-            combined_payload[i] |= payload[i]
-    bus = get_global_bus()
-    if bus is not None:
-        message = can.Message(arbitration_id=can_id,
-                              data=combined_payload,
-                              is_extended_id=(can_id > 0x7FF))
-        try:
-            bus.send(message)
-            print(f"Sent CAN ID {hex(can_id)}: {' '.join(f'{b:02X}' for b in combined_payload)}")
-        except can.CanError as e:
-            print(f"CAN Error for {hex(can_id)}: {e}")
-    job = root.after(int(cycle_time_ms), lambda: global_transmit(can_id))
-    global_transmissions[can_id]["job"] = job
-
-# ---------- Helper: Compute Slider Range (for Numeric Parameters) ----------
-def compute_slider_range(config):
-    if "min_value" in config and "max_value" in config:
-        min_str = config["min_value"]
-        max_str = config["max_value"]
-        try:
-            min_val = float(min_str)
-            max_val = float(max_str)
-        except:
-            min_val, max_val = 0, 100
-        if "." in max_str:
-            precision = len(max_str.split(".")[1])
-        else:
-            precision = 0
-        resolution_val = 10**(-precision) if precision > 0 else 1
-        return min_val, max_val, resolution_val, precision
-    else:
-        size_str = config["size"]
-        if "bit" in size_str:
-            num_bits = int(size_str.split()[0])
-            if config["type"] == "Unsigned":
-                return 0, (2 ** num_bits) - 1, 1, 0
-            else:
-                return -(2 ** (num_bits - 1)), (2 ** (num_bits - 1)) - 1, 1, 0
-        else:
-            num_bytes = int(size_str.split()[0])
-            if config["type"] == "Unsigned":
-                return 0, (2 ** (8 * num_bytes)) - 1, 1, 0
-            else:
-                return -(2 ** (8 * num_bytes - 1)), (2 ** (8 * num_bytes - 1)) - 1, 1, 0
-
-# ==================== Numeric Parameter ====================
-class SavedParameter:
-    def __init__(self, parent, config):
-        """
-        config keys:
-          name, can_id, size, type, resolution, mapping (list), 
-          target_byte (if bit), cycle_time, min_value, max_value, initial_value, mode ("numeric")
-        """
-        self.parent = parent
-        self.config = config.copy()
-        self.enabled = False
-        self.value_var = tk.DoubleVar(value=config.get("initial_value", 0))
-        try:
-            min_val, max_val, res, prec = compute_slider_range(config)
-        except Exception:
-            min_val, max_val, res, prec = 0, 100, 1, 0
-        self.frame = tk.Frame(parent, bd=2, relief=tk.GROOVE, padx=5, pady=5)
-        self.label = tk.Label(self.frame, text=f"{config['name']} (CAN ID: {hex(config['can_id'])})")
-        self.label.grid(row=0, column=0, columnspan=3, sticky="w")
-        tk.Label(self.frame, text="Value:").grid(row=1, column=0, sticky="w")
-        self.slider = tk.Scale(self.frame, variable=self.value_var,
-                               from_=min_val, to=max_val, resolution=res, orient=tk.HORIZONTAL)
-        self.slider.grid(row=1, column=1, sticky="we")
+from tkinter import ttk, messagebox, filedialog
+import time
+import numpy as np
+import pcan_engine as engine
+import pcan_capture
+import pcan_control
+import pcan_dbc
+import pcan_process
+import pcan_receive
+import pcan_replay
+import pcan_trace
+from pcan_engine import compute_slider_range
+
+# ==================== Virtualized Parameter List ====================
+class ParameterRow:
+    """
+    One recyclable row of widgets. A row is bound to whichever parameter of the
+    filtered list is currently scrolled into its slot; its Tk variables are
+    copied from the bound parameter on bind() and written back through traces.
+    """
+    def __init__(self, parent, owner):
+        self.owner = owner
+        self.param = None
+        self.binding = False
+        self.frame = tk.Frame(parent, bd=2, relief=tk.GROOVE, padx=5)
+        self.frame.columnconfigure(1, weight=1)
+        self.label = tk.Label(self.frame, anchor="w", width=32)
+        self.label.grid(row=0, column=0, sticky="w")
+        self.value_var = tk.DoubleVar(value=0)
+        self.value_var.trace_add("write", self.on_value_change)
+        self.slider = tk.Scale(self.frame, variable=self.value_var, orient=tk.HORIZONTAL, showvalue=False)
         self.entry = tk.Entry(self.frame, textvariable=self.value_var, width=10)
-        self.entry.grid(row=1, column=2, sticky="e")
-        tk.Label(self.frame, text="Cycle Time (ms):").grid(row=2, column=0, sticky="w")
-        self.cycle_time_var = tk.StringVar(value=str(config.get("cycle_time", 1000)))
+        self.text_var = tk.StringVar(value="")
+        self.text_var.trace_add("write", self.on_text_change)
+        self.text_entry = tk.Entry(self.frame, textvariable=self.text_var, width=10)
+        self.text_hint = tk.Label(self.frame)
+        tk.Label(self.frame, text="Cycle Time (ms):").grid(row=0, column=3, sticky="e")
+        self.cycle_time_var = tk.StringVar(value="")
         self.cycle_time_entry = tk.Entry(self.frame, textvariable=self.cycle_time_var, width=8)
-        self.cycle_time_entry.grid(row=2, column=1, sticky="we")
+        self.cycle_time_entry.grid(row=0, column=4, padx=5)
         self.cycle_time_entry.bind("<FocusOut>", self.update_cycle_time)
-        self.enable_button = tk.Button(self.frame, text="Enable", command=self.toggle_enable, width=10)
-        self.enable_button.grid(row=3, column=0, padx=5, pady=5)
-        self.edit_button = tk.Button(self.frame, text="Edit", command=self.edit, width=10)
-        self.edit_button.grid(row=3, column=1, padx=5, pady=5)
-        self.frame.pack(fill="x", padx=5, pady=5)
-    def get_payload(self):
-        size_str = self.config["size"]
-        resolution = self.config["resolution"]
-        raw_value = self.value_var.get() / resolution
-        raw_value = int(round(raw_value))
-        data_payload = [0] * 8
-        if "bit" in size_str:
-            num_bits = int(size_str.split()[0])
-            if self.config["type"] == "Unsigned":
-                bin_str = format(raw_value, f"0{num_bits}b")
+        self.cycle_time_entry.bind("<Return>", self.update_cycle_time)
+        self.enable_button = tk.Button(self.frame, text="Enable", command=self.toggle_enable, width=8)
+        self.enable_button.grid(row=0, column=5, padx=2)
+        self.edit_button = tk.Button(self.frame, text="Edit", command=self.edit, width=8)
+        self.edit_button.grid(row=0, column=6, padx=2)
+        for widget in (self.frame, self.label, self.slider, self.text_hint):
+            owner.bind_wheel(widget)
+    def bind(self, param):
+        self.param = param
+        self.binding = True
+        try:
+            config = param.config
+            channel = f" on {config['channel']}" if config.get("channel") else ""
+            self.label.config(text=f"{config['name']} (CAN ID: {hex(config['can_id'])}{channel})")
+            if config.get("mode") == "ascii":
+                self.slider.grid_remove()
+                self.entry.grid_remove()
+                self.text_entry.grid(row=0, column=1, sticky="we", padx=5)
+                self.text_hint.config(text=f"(max {param.expected_length} chars)")
+                self.text_hint.grid(row=0, column=2, sticky="w")
+                self.text_var.set(param.value)
             else:
-                if raw_value < 0:
-                    raw_value = (1 << num_bits) + raw_value
-                bin_str = format(raw_value, f"0{num_bits}b")
-            byte_val = 0
-            for i, bit_pos in enumerate(self.config["mapping"]):
-                if int(bin_str[i]):
-                    byte_val |= (1 << bit_pos)
-            target_byte = self.config["target_byte"]
-            data_payload[target_byte] = byte_val
-        else:
-            num_bytes = int(size_str.split()[0])
-            if self.config["type"] == "Signed" and raw_value < 0:
-                raw_value = (1 << (8 * num_bytes)) + raw_value
-            try:
-                param_bytes = list(raw_value.to_bytes(num_bytes, byteorder='little', signed=False))
-            except OverflowError:
-                return [0] * 8
-            for i, byte_pos in enumerate(self.config["mapping"]):
-                if 0 <= byte_pos < 8:
-                    data_payload[byte_pos] = param_bytes[i]
-        return data_payload
+                self.text_entry.grid_remove()
+                self.text_hint.grid_remove()
+                try:
+                    min_val, max_val, res, prec = compute_slider_range(config)
+                except Exception:
+                    min_val, max_val, res, prec = 0, 100, 1, 0
+                # A checksum is computed by the engine; its row only shows the last value.
+                state = tk.DISABLED if config.get("mode") == "checksum" else tk.NORMAL
+                self.slider.config(from_=min_val, to=max_val, resolution=res, state=state)
+                self.slider.grid(row=0, column=1, sticky="we", padx=5)
+                self.entry.config(state=state)
+                self.entry.grid(row=0, column=2, sticky="e")
+                self.value_var.set(param.value)
+            self.cycle_time_var.set(str(config.get("cycle_time", 1000)))
+            self.enable_button.config(text="Disable" if param.enabled else "Enable")
+        finally:
+            self.binding = False
+    def sync(self):
+        """Pick up changes made outside this row (other rows, scripts, the engine)."""
+        param = self.param
+        if param is None:
+            return
+        try:
+            focus = self.frame.focus_get()
+        except (KeyError, tk.TclError):
+            focus = None  # focus is in a widget tkinter cannot map back (e.g. a combobox popdown)
+        self.binding = True
+        try:
+            if param.config.get("mode") == "ascii":
+                if focus is not self.text_entry and self.text_var.get() != param.value:
+                    self.text_var.set(param.value)
+            elif focus is not self.entry:
+                try:
+                    if self.value_var.get() != param.value:
+                        self.value_var.set(param.value)
+                except tk.TclError:
+                    self.value_var.set(param.value)
+            cycle_text = str(param.config.get("cycle_time", 1000))
+            if focus is not self.cycle_time_entry and self.cycle_time_var.get() != cycle_text:
+                self.cycle_time_var.set(cycle_text)
+            self.enable_button.config(text="Disable" if param.enabled else "Enable")
+        finally:
+            self.binding = False
+    def on_value_change(self, *args):
+        if self.binding or self.param is None:
+            return
+        try:
+            value = self.value_var.get()
+        except tk.TclError:
+            return  # Entry holds a partial/invalid number; keep sending the last valid value.
+        self.param.set_value(value)
+    def on_text_change(self, *args):
+        if self.binding or self.param is None:
+            return
+        self.param.set_value(self.text_var.get())
     def update_cycle_time(self, event=None):
+        if self.param is None:
+            return
         try:
             new_cycle_time = float(self.cycle_time_var.get())
         except ValueError:
             messagebox.showerror("Error", "Invalid cycle time")
             return
-        self.config["cycle_time"] = new_cycle_time
-        if self.enabled:
-            can_id = self.config["can_id"]
-            if can_id in global_transmissions:
-                global_transmissions[can_id]["cycle_time"] = new_cycle_time
-                if global_transmissions[can_id]["job"]:
-                    root.after_cancel(global_transmissions[can_id]["job"])
-                global_transmit(can_id)
-                print(f"Updated cycle time for CAN ID {hex(can_id)} to {new_cycle_time} ms.")
+        if new_cycle_time != self.param.config.get("cycle_time"):
+            self.param.set_cycle_time(new_cycle_time)
+            self.owner.sync_rows()
     def toggle_enable(self):
-        if not self.enabled:
+        param = self.param
+        if param is None:
+            return
+        if not param.enabled:
             try:
                 cycle_time_ms = float(self.cycle_time_var.get())
             except ValueError:
                 messagebox.showerror("Error", "Invalid cycle time")
                 return
-            can_id = self.config["can_id"]
-            def param_func():
-                return self.get_payload()
-            self.param_func = param_func
-            print(f"Enabling parameter '{self.config['name']}' on CAN ID {hex(can_id)} with cycle time {cycle_time_ms} ms.")
-            if can_id in global_transmissions:
-                if global_transmissions[can_id]["cycle_time"] != cycle_time_ms:
-                    global_transmissions[can_id]["cycle_time"] = cycle_time_ms
-                    for sp in saved_parameters:
-                        if sp.enabled and sp.config["can_id"] == can_id:
-                            sp.cycle_time_var.set(str(cycle_time_ms))
-                    if global_transmissions[can_id]["job"]:
-                        root.after_cancel(global_transmissions[can_id]["job"])
-                    global_transmit(can_id)
-                global_transmissions[can_id]["params"].append(param_func)
-            else:
-                global_transmissions[can_id] = {"cycle_time": cycle_time_ms, "params": [param_func], "job": None}
-                global_transmit(can_id)
-            self.enabled = True
-            self.enable_button.config(text="Disable")
+            param.config["cycle_time"] = cycle_time_ms
+            try:
+                param.enable()
+            except engine.BusLoadError as e:
+                messagebox.showerror("Bus Load", str(e))
         else:
-            can_id = self.config["can_id"]
-            if can_id in global_transmissions:
-                try:
-                    global_transmissions[can_id]["params"].remove(self.param_func)
-                    print(f"Disabling parameter '{self.config['name']}' on CAN ID {hex(can_id)}.")
-                except ValueError:
-                    pass
-                if not global_transmissions[can_id]["params"]:
-                    if global_transmissions[can_id]["job"]:
-                        root.after_cancel(global_transmissions[can_id]["job"])
-                    del global_transmissions[can_id]
-            self.enabled = False
-            self.enable_button.config(text="Enable")
+            param.disable()
+        self.owner.sync_rows()
     def edit(self):
-        open_parameter_editor(self)
-
-# ==================== ASCII Parameter ====================
-class ASCIISavedParameter:
-    def __init__(self, parent, config):
-        """
-        config keys:
-          name, can_id, size, mapping (list), cycle_time, mode ("ascii"),
-          initial_value (a string)
-        For ASCII parameters, size is "X byte" and mapping is a list of target byte positions.
-        """
-        self.parent = parent
-        self.config = config.copy()
-        self.enabled = False
-        self.value_var = tk.StringVar(value=config.get("initial_value", ""))
-        self.expected_length = int(config["size"].split()[0])
-        self.frame = tk.Frame(parent, bd=2, relief=tk.GROOVE, padx=5, pady=5)
-        self.label = tk.Label(self.frame, text=f"{config['name']} (CAN ID: {hex(config['can_id'])})")
-        self.label.grid(row=0, column=0, columnspan=3, sticky="w")
-        tk.Label(self.frame, text="Value:").grid(row=1, column=0, sticky="w")
-        self.entry = tk.Entry(self.frame, textvariable=self.value_var, width=10)
-        self.entry.grid(row=1, column=1, sticky="we")
-        tk.Label(self.frame, text=f"(max {self.expected_length} chars)").grid(row=1, column=2, sticky="w")
-        tk.Label(self.frame, text="Cycle Time (ms):").grid(row=2, column=0, sticky="w")
-        self.cycle_time_var = tk.StringVar(value=str(config.get("cycle_time", 1000)))
-        self.cycle_time_entry = tk.Entry(self.frame, textvariable=self.cycle_time_var, width=8)
-        self.cycle_time_entry.grid(row=2, column=1, sticky="we")
-        self.cycle_time_entry.bind("<FocusOut>", self.update_cycle_time)
-        self.enable_button = tk.Button(self.frame, text="Enable", command=self.toggle_enable, width=10)
-        self.enable_button.grid(row=3, column=0, padx=5, pady=5)
-        self.edit_button = tk.Button(self.frame, text="Edit", command=self.edit, width=10)
-        self.edit_button.grid(row=3, column=1, padx=5, pady=5)
-        self.frame.pack(fill="x", padx=5, pady=5)
-    def get_payload(self):
-        data_payload = [0] * 8
-        text = self.value_var.get()
-        text = (text + " " * self.expected_length)[:self.expected_length]
-        for i, byte_pos in enumerate(self.config["mapping"]):
-            if i < len(text):
-                data_payload[int(byte_pos)] = ord(text[i])
-        return data_payload
-    def update_cycle_time(self, event=None):
-        try:
-            new_cycle_time = float(self.cycle_time_var.get())
-        except ValueError:
-            messagebox.showerror("Error", "Invalid cycle time")
+        if self.param is None:
             return
-        self.config["cycle_time"] = new_cycle_time
-        if self.enabled:
-            can_id = self.config["can_id"]
-            if can_id in global_transmissions:
-                global_transmissions[can_id]["cycle_time"] = new_cycle_time
-                if global_transmissions[can_id]["job"]:
-                    root.after_cancel(global_transmissions[can_id]["job"])
-                global_transmit(can_id)
-                print(f"Updated cycle time for CAN ID {hex(can_id)} to {new_cycle_time} ms.")
-    def toggle_enable(self):
-        if not self.enabled:
-            try:
-                cycle_time_ms = float(self.cycle_time_var.get())
-            except ValueError:
-                messagebox.showerror("Error", "Invalid cycle time")
-                return
-            can_id = self.config["can_id"]
-            def param_func():
-                return self.get_payload()
-            self.param_func = param_func
-            print(f"Enabling ASCII parameter '{self.config['name']}' on CAN ID {hex(can_id)} with cycle time {cycle_time_ms} ms.")
-            if can_id in global_transmissions:
-                if global_transmissions[can_id]["cycle_time"] != cycle_time_ms:
-                    global_transmissions[can_id]["cycle_time"] = cycle_time_ms
-                    for sp in saved_parameters:
-                        if sp.enabled and sp.config["can_id"] == can_id:
-                            sp.cycle_time_var.set(str(cycle_time_ms))
-                    if global_transmissions[can_id]["job"]:
-                        root.after_cancel(global_transmissions[can_id]["job"])
-                    global_transmit(can_id)
-                global_transmissions[can_id]["params"].append(param_func)
+        if self.param.config.get("mode") == "ascii":
+            open_ascii_parameter_editor(self.param)
+        elif self.param.config.get("mode") in ("counter", "checksum"):
+            open_e2e_editor(self.param)
+        else:
+            open_parameter_editor(self.param)
+
+class ParameterList:
+    """
+    Scrollable view over engine.saved_parameters that only creates widgets for
+    the rows that fit on screen and rebinds them while scrolling. filter_var
+    narrows the list by name or CAN ID (e.g. "speed", "0x1a0", "1A0").
+    """
+    ROW_HEIGHT = 40
+    WHEEL_ROWS = 3
+    SYNC_INTERVAL_MS = 250
+    def __init__(self, parent):
+        self.frame = tk.Frame(parent)
+        search_frame = tk.Frame(self.frame)
+        search_frame.pack(fill="x")
+        tk.Label(search_frame, text="Search (name or CAN ID):").pack(side="left")
+        self.filter_var = tk.StringVar(value="")
+        self.filter_var.trace_add("write", lambda *args: self.refresh())
+        tk.Entry(search_frame, textvariable=self.filter_var, width=30).pack(side="left", padx=5)
+        self.count_label = tk.Label(search_frame)
+        self.count_label.pack(side="left", padx=5)
+        body = tk.Frame(self.frame)
+        body.pack(fill="both", expand=True)
+        self.vsb = ttk.Scrollbar(body, orient="vertical", command=self.yview)
+        self.vsb.pack(side="right", fill="y")
+        self.viewport = tk.Frame(body)
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.viewport.bind("<Configure>", lambda event: self.layout())
+        self.bind_wheel(self.viewport)
+        self.rows = []
+        self.items = []   # filtered parameters, in saved_parameters order
+        self.top = 0      # index into items of the first visible row
+        self.refresh()
+        self.frame.after(self.SYNC_INTERVAL_MS, self.periodic_sync)
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self.scroll(-self.WHEEL_ROWS if event.delta > 0 else self.WHEEL_ROWS))
+        widget.bind("<Button-4>", lambda event: self.scroll(-self.WHEEL_ROWS))
+        widget.bind("<Button-5>", lambda event: self.scroll(self.WHEEL_ROWS))
+    def matches(self, param, query):
+        config = param.config
+        if query in config["name"].lower():
+            return True
+        can_id = hex(config["can_id"])
+        return query in can_id or query in can_id[2:]
+    def refresh(self):
+        """Rebuild the filtered list after parameters were added, removed, loaded or edited."""
+        query = self.filter_var.get().strip().lower()
+        if query:
+            self.items = [p for p in engine.saved_parameters if self.matches(p, query)]
+        else:
+            self.items = list(engine.saved_parameters)
+        self.count_label.config(text=f"{len(self.items)} of {len(engine.saved_parameters)} parameters")
+        self.layout()
+    def visible_count(self):
+        return max(1, self.viewport.winfo_height() // self.ROW_HEIGHT)
+    def layout(self):
+        count = self.visible_count()
+        self.top = max(0, min(self.top, len(self.items) - count))
+        while len(self.rows) < min(count, len(self.items)):
+            self.rows.append(ParameterRow(self.viewport, self))
+        for slot, row in enumerate(self.rows):
+            index = self.top + slot
+            if slot < count and index < len(self.items):
+                if row.param is not self.items[index]:
+                    row.bind(self.items[index])
+                else:
+                    row.sync()
+                row.frame.place(x=0, y=slot * self.ROW_HEIGHT, relwidth=1, height=self.ROW_HEIGHT)
             else:
-                global_transmissions[can_id] = {"cycle_time": cycle_time_ms, "params": [param_func], "job": None}
-                global_transmit(can_id)
-            self.enabled = True
-            self.enable_button.config(text="Disable")
+                row.param = None
+                row.frame.place_forget()
+        total = len(self.items)
+        if total:
+            self.vsb.set(self.top / total, min(1.0, (self.top + count) / total))
         else:
-            can_id = self.config["can_id"]
-            if can_id in global_transmissions:
-                try:
-                    global_transmissions[can_id]["params"].remove(self.param_func)
-                    print(f"Disabling ASCII parameter '{self.config['name']}' on CAN ID {hex(can_id)}.")
-                except ValueError:
-                    pass
-                if not global_transmissions[can_id]["params"]:
-                    if global_transmissions[can_id]["job"]:
-                        root.after_cancel(global_transmissions[can_id]["job"])
-                    del global_transmissions[can_id]
-            self.enabled = False
-            self.enable_button.config(text="Enable")
-    def edit(self):
-        open_ascii_parameter_editor(self)
+            self.vsb.set(0, 1)
+    def scroll(self, rows):
+        self.top += rows
+        self.layout()
+    def yview(self, *args):
+        count = self.visible_count()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.items))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.top += step * count if args[2] == "pages" else step
+        self.layout()
+    def sync_rows(self):
+        for row in self.rows:
+            row.sync()
+    def periodic_sync(self):
+        if engine.remote is not None:
+            engine.remote.poll()  # values changed by the transmit process, errors
+        self.sync_rows()
+        self.frame.after(self.SYNC_INTERVAL_MS, self.periodic_sync)
 
 # ---------- Numeric Parameter Editor ----------
 def open_parameter_editor(saved_param=None):
@@ -312,34 +265,52 @@ def open_parameter_editor(saved_param=None):
         "1 bit", "2 bit", "3 bit", "4 bit", "5 bit", "6 bit", "7 bit", "8 bit",
         "2 byte", "3 byte", "4 byte", "5 byte", "6 byte", "7 byte", "8 byte"
     ]
+    signal_size_options = [f"{n} bit" for n in range(1, engine.MAX_SIGNAL_BITS + 1)]
     size_var = tk.StringVar(value=size_options[0])
     size_menu = ttk.Combobox(editor, textvariable=size_var, values=size_options, state="readonly", width=10)
     size_menu.grid(row=2, column=1, padx=5, pady=2)
+    # "Mapping": bit/byte positions chosen one by one; "Start bit": a DBC-style signal.
+    layout_var = tk.StringVar(value="Mapping")
+    ttk.Combobox(editor, textvariable=layout_var, values=["Mapping", "Start bit"], state="readonly",
+                 width=10).grid(row=2, column=2, padx=5, pady=2)
+    start_bit_var = tk.StringVar(value="0")
+    byte_order_var = tk.StringVar(value="intel")
     tk.Label(editor, text="Parameter Type:").grid(row=3, column=0, sticky="w", padx=5, pady=2)
     type_options = ["Unsigned", "Signed"]
     type_var = tk.StringVar(value=type_options[0])
     type_menu = ttk.Combobox(editor, textvariable=type_var, values=type_options, state="readonly", width=10)
     type_menu.grid(row=3, column=1, padx=5, pady=2)
+    fd_var, brs_var, dlc_var = add_frame_fields(editor, 13)
     tk.Label(editor, text="Resolution:").grid(row=4, column=0, sticky="w", padx=5, pady=2)
     resolution_entry = tk.Entry(editor)
     resolution_entry.insert(0, "1")
     resolution_entry.grid(row=4, column=1, padx=5, pady=2)
-    tk.Label(editor, text="Minimum Value:").grid(row=5, column=0, sticky="w", padx=5, pady=2)
+    tk.Label(editor, text="Offset:").grid(row=5, column=0, sticky="w", padx=5, pady=2)
+    offset_entry = tk.Entry(editor)
+    offset_entry.insert(0, "0")
+    offset_entry.grid(row=5, column=1, padx=5, pady=2)
+    tk.Label(editor, text="Minimum Value:").grid(row=6, column=0, sticky="w", padx=5, pady=2)
     min_val_entry = tk.Entry(editor)
     min_val_entry.insert(0, "0")
-    min_val_entry.grid(row=5, column=1, padx=5, pady=2)
-    tk.Label(editor, text="Maximum Value:").grid(row=6, column=0, sticky="w", padx=5, pady=2)
+    min_val_entry.grid(row=6, column=1, padx=5, pady=2)
+    tk.Label(editor, text="Maximum Value:").grid(row=7, column=0, sticky="w", padx=5, pady=2)
     max_val_entry = tk.Entry(editor)
     max_val_entry.insert(0, "100")
-    max_val_entry.grid(row=6, column=1, padx=5, pady=2)
+    max_val_entry.grid(row=7, column=1, padx=5, pady=2)
     mapping_frame = tk.Frame(editor)
-    mapping_frame.grid(row=7, column=0, columnspan=3, pady=10)
+    mapping_frame.grid(row=8, column=0, columnspan=3, pady=10)
     def update_mapping_options(*args):
         for widget in mapping_frame.winfo_children():
             widget.destroy()
         size_str = size_var.get()
         mapping_vars = []
-        if "bit" in size_str:
+        if layout_var.get() == "Start bit":
+            tk.Label(mapping_frame, text="Start bit:").grid(row=0, column=0, padx=2)
+            tk.Entry(mapping_frame, textvariable=start_bit_var, width=5).grid(row=0, column=1, padx=2)
+            tk.Label(mapping_frame, text="Byte order:").grid(row=0, column=2, padx=2)
+            ttk.Combobox(mapping_frame, textvariable=byte_order_var, values=list(engine.BYTE_ORDERS),
+                         state="readonly", width=9).grid(row=0, column=3, padx=2)
+        elif "bit" in size_str:
             num_bits = int(size_str.split()[0])
             tk.Label(mapping_frame, text="Select Bit Positions (order):").grid(row=0, column=0, columnspan=num_bits)
             for i in range(num_bits):
@@ -356,7 +327,7 @@ def open_parameter_editor(saved_param=None):
                 default_value = str(num_bytes - 1 - i)
                 var = tk.StringVar(value=default_value)
                 mapping_vars.append(var)
-                byte_menu = ttk.Combobox(mapping_frame, textvariable=var, values=[str(x) for x in range(8)],
+                byte_menu = ttk.Combobox(mapping_frame, textvariable=var, values=byte_positions(fd_var),
                                          state="readonly", width=3)
                 byte_menu.grid(row=1, column=i, padx=2)
         mapping_frame.mapping_vars = mapping_vars
@@ -364,18 +335,35 @@ def open_parameter_editor(saved_param=None):
     update_mapping_options()
     bit_target_var = tk.StringVar(value="0")
     bit_target_label = tk.Label(editor, text="Target Byte for Bit Parameter:")
-    bit_target_combo = ttk.Combobox(editor, textvariable=bit_target_var, values=[str(x) for x in range(8)],
+    bit_target_combo = ttk.Combobox(editor, textvariable=bit_target_var, values=byte_positions(fd_var),
                                     state="readonly", width=10)
+    def update_frame_positions(*args):
+        bit_target_combo.config(values=byte_positions(fd_var))
+        if layout_var.get() != "Mapping" or "bit" in size_var.get():
+            return
+        for child in mapping_frame.winfo_children():
+            if isinstance(child, ttk.Combobox):
+                child.config(values=byte_positions(fd_var))
+    fd_var.trace_add("write", update_frame_positions)
     def update_bit_target_visibility(*args):
-        if "bit" in size_var.get():
-            bit_target_label.grid(row=8, column=0, sticky="w", padx=5, pady=2)
-            bit_target_combo.grid(row=8, column=1, padx=5, pady=2)
+        if "bit" in size_var.get() and layout_var.get() == "Mapping":
+            bit_target_label.grid(row=9, column=0, sticky="w", padx=5, pady=2)
+            bit_target_combo.grid(row=9, column=1, padx=5, pady=2)
         else:
             bit_target_label.grid_forget()
             bit_target_combo.grid_forget()
     size_var.trace("w", update_bit_target_visibility)
     update_bit_target_visibility()
-    tk.Label(editor, text="Parameter Value:").grid(row=9, column=0, sticky="w", padx=5, pady=2)
+    def update_layout(*args):
+        options = signal_size_options if layout_var.get() == "Start bit" else size_options
+        size_menu.config(values=options)
+        if size_var.get() not in options:
+            size_var.set("8 bit")  # valid in both layouts; rebuilds the mapping widgets
+        else:
+            update_mapping_options()
+            update_bit_target_visibility()
+    layout_var.trace_add("write", update_layout)
+    tk.Label(editor, text="Parameter Value:").grid(row=10, column=0, sticky="w", padx=5, pady=2)
     value_var = tk.DoubleVar(value=0)
     def update_slider_range(*args):
         try:
@@ -395,26 +383,38 @@ def open_parameter_editor(saved_param=None):
         if cur_val < min_val or cur_val > max_val:
             value_var.set(min_val)
     slider = tk.Scale(editor, variable=value_var, from_=0, to=100, orient=tk.HORIZONTAL)
-    slider.grid(row=9, column=1, padx=5, pady=2, sticky="we")
+    slider.grid(row=10, column=1, padx=5, pady=2, sticky="we")
     entry = tk.Entry(editor, textvariable=value_var, width=10)
-    entry.grid(row=9, column=2, padx=5, pady=2)
+    entry.grid(row=10, column=2, padx=5, pady=2)
     min_val_entry.bind("<FocusOut>", lambda e: update_slider_range())
     max_val_entry.bind("<FocusOut>", lambda e: update_slider_range())
     size_var.trace("w", update_slider_range)
     type_var.trace("w", update_slider_range)
     update_slider_range()
-    tk.Label(editor, text="Cycle Time (ms):").grid(row=10, column=0, sticky="w", padx=5, pady=2)
+    tk.Label(editor, text="Cycle Time (ms):").grid(row=11, column=0, sticky="w", padx=5, pady=2)
     cycle_time_entry = tk.Entry(editor)
     cycle_time_entry.insert(0, "1000")
-    cycle_time_entry.grid(row=10, column=1, padx=5, pady=2)
+    cycle_time_entry.grid(row=11, column=1, padx=5, pady=2)
+    channel_var = add_channel_field(editor, 12)
+    generator_vars = add_generator_fields(editor, 14)
+    tx_mode_var, min_gap_var = add_tx_mode_fields(editor, 15)
     if saved_param:
         config = saved_param.config
+        set_frame_fields(config, fd_var, brs_var, dlc_var)
+        set_tx_mode_fields(config, tx_mode_var, min_gap_var)
+        set_generator_fields(config, generator_vars)
         name_entry.insert(0, config["name"])
         can_id_entry.insert(0, hex(config["can_id"])[2:])
+        if "start_bit" in config:
+            start_bit_var.set(str(config["start_bit"]))
+            byte_order_var.set(config.get("byte_order", "intel"))
+            layout_var.set("Start bit")
         size_var.set(config["size"])
         type_var.set(config["type"])
         resolution_entry.delete(0, tk.END)
         resolution_entry.insert(0, str(config["resolution"]))
+        offset_entry.delete(0, tk.END)
+        offset_entry.insert(0, str(config.get("offset", 0)))
         if "min_value" in config:
             min_val_entry.delete(0, tk.END)
             min_val_entry.insert(0, str(config["min_value"]))
@@ -427,11 +427,12 @@ def open_parameter_editor(saved_param=None):
                 var.set(str(config["mapping"][i]))
             except IndexError:
                 break
-        if "bit" in config["size"]:
+        if "bit" in config["size"] and "target_byte" in config:
             bit_target_var.set(str(config["target_byte"]))
-        value_var.set(saved_param.value_var.get())
+        value_var.set(saved_param.value)
         cycle_time_entry.delete(0, tk.END)
-        cycle_time_entry.insert(0, str(saved_param.cycle_time_var.get()))
+        cycle_time_entry.insert(0, str(config.get("cycle_time", 1000)))
+        channel_var.set(config.get("channel", ""))
     def save_edits():
         try:
             can_id_str = can_id_entry.get().strip()
@@ -456,30 +457,174 @@ def open_parameter_editor(saved_param=None):
             "size": size_var.get(),
             "type": type_var.get(),
             "resolution": float(resolution_entry.get()),
-            "mapping": [int(var.get()) for var in mapping_frame.mapping_vars],
+            "offset": float(offset_entry.get() or 0),
             "cycle_time": float(cycle_time_entry.get()),
             "min_value": min_value,
             "max_value": max_value,
             "mode": "numeric"
         }
-        if "bit" in size_var.get():
-            new_config["target_byte"] = int(bit_target_var.get())
+        if layout_var.get() == "Start bit":
+            try:
+                new_config["start_bit"] = int(start_bit_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Invalid start bit")
+                return
+            new_config["byte_order"] = byte_order_var.get()
+        else:
+            new_config["mapping"] = [int(var.get()) for var in mapping_frame.mapping_vars]
+            if "bit" in size_var.get():
+                new_config["target_byte"] = int(bit_target_var.get())
+        if channel_var.get().strip():
+            new_config["channel"] = channel_var.get().strip()
+        new_config.update(frame_fields_config(fd_var, brs_var, dlc_var))
+        try:
+            generator = generator_fields_config(generator_vars)
+            new_config.update(tx_mode_fields_config(tx_mode_var, min_gap_var))
+        except ValueError:
+            messagebox.showerror("Error", "Invalid generator or transmit mode settings")
+            return
+        if generator:
+            new_config["generator"] = generator
         if saved_param:
-            saved_param.config = new_config
-            saved_param.cycle_time_var.set(str(new_config["cycle_time"]))
-            saved_param.label.config(text=f"{new_config['name']} (CAN ID: {hex(new_config['can_id'])})")
-            min_val, max_val, res, prec = compute_slider_range(new_config)
-            saved_param.slider.config(from_=min_val, to=max_val, resolution=res)
+            if not update_saved_parameter(saved_param, new_config):
+                return
         else:
             new_config["initial_value"] = value_var.get()
-            add_saved_parameter(new_config)
+            if not add_saved_parameter(new_config):
+                return
         editor.destroy()
     save_button = tk.Button(editor, text="Save", command=save_edits)
-    save_button.grid(row=11, column=0, columnspan=3, pady=10)
+    save_button.grid(row=16, column=0, columnspan=3, pady=10)
+
+def add_channel_field(editor, row):
+    """Channel combobox for the editors; empty means the default channel."""
+    tk.Label(editor, text="Channel (empty = default):").grid(row=row, column=0, sticky="w", padx=5, pady=2)
+    channel_var = tk.StringVar(value="")
+    names = {engine.bus_config["channel"]} | set(engine.channel_settings) | set(engine.channels)
+    names |= {param.config["channel"] for param in engine.saved_parameters if param.config.get("channel")}
+    ttk.Combobox(editor, textvariable=channel_var, values=[""] + sorted(names)).grid(row=row, column=1, padx=5, pady=2)
+    return channel_var
+
+def add_frame_fields(editor, row):
+    """CAN FD / BRS / DLC controls for the editors; returns their variables."""
+    frame = tk.Frame(editor)
+    frame.grid(row=row, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+    fd_var = tk.BooleanVar(value=False)
+    brs_var = tk.BooleanVar(value=False)
+    dlc_var = tk.StringVar(value="auto")
+    tk.Checkbutton(frame, text="CAN FD", variable=fd_var).pack(side="left")
+    tk.Checkbutton(frame, text="Bit-rate switch", variable=brs_var).pack(side="left", padx=5)
+    tk.Label(frame, text="Frame length:").pack(side="left")
+    ttk.Combobox(frame, textvariable=dlc_var, values=["auto"] + [str(n) for n in engine.FD_LENGTHS if n >= 8],
+                 state="readonly", width=5).pack(side="left", padx=5)
+    return fd_var, brs_var, dlc_var
+
+def set_frame_fields(config, fd_var, brs_var, dlc_var):
+    fd_var.set(bool(config.get("fd")))
+    brs_var.set(bool(config.get("brs")))
+    dlc_var.set(str(config["dlc"]) if config.get("dlc") else "auto")
+
+def frame_fields_config(fd_var, brs_var, dlc_var):
+    if not fd_var.get():
+        return {}
+    config = {"fd": True, "brs": brs_var.get()}
+    if dlc_var.get() != "auto":
+        config["dlc"] = int(dlc_var.get())
+    return config
+
+def add_tx_mode_fields(editor, row):
+    """Transmit mode and minimum on-change gap for the editors; returns their variables."""
+    frame = tk.Frame(editor)
+    frame.grid(row=row, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+    tx_mode_var = tk.StringVar(value="cyclic")
+    min_gap_var = tk.StringVar(value="0")
+    tk.Label(frame, text="Transmit:").pack(side="left")
+    ttk.Combobox(frame, textvariable=tx_mode_var, values=list(engine.TX_MODES), state="readonly",
+                 width=16).pack(side="left", padx=5)
+    tk.Label(frame, text="Min gap (ms):").pack(side="left")
+    tk.Entry(frame, textvariable=min_gap_var, width=7).pack(side="left", padx=5)
+    return tx_mode_var, min_gap_var
+
+def set_tx_mode_fields(config, tx_mode_var, min_gap_var):
+    tx_mode_var.set(config.get("tx_mode", "cyclic"))
+    min_gap_var.set(f"{config.get('min_gap_ms', 0):g}")
+
+def tx_mode_fields_config(tx_mode_var, min_gap_var):
+    """Config keys for the transmit mode fields; raises ValueError on a bad gap."""
+    config = {}
+    if tx_mode_var.get() != "cyclic":
+        config["tx_mode"] = tx_mode_var.get()
+    min_gap_ms = float(min_gap_var.get() or 0)
+    if min_gap_ms:
+        config["min_gap_ms"] = min_gap_ms
+    return config
+
+GENERATOR_TYPES = ["none", "ramp", "sine", "triangle", "square", "steps", "random"]
+
+def add_generator_fields(editor, row):
+    """Waveform generator controls for the numeric editor; returns their variables."""
+    frame = tk.Frame(editor)
+    frame.grid(row=row, column=0, columnspan=3, sticky="w", padx=5, pady=2)
+    generator_vars = {key: tk.StringVar(value="") for key in ("period_ms", "low", "high", "duty", "seed", "steps")}
+    generator_vars["type"] = tk.StringVar(value="none")
+    tk.Label(frame, text="Generator:").grid(row=0, column=0, sticky="w")
+    ttk.Combobox(frame, textvariable=generator_vars["type"], values=GENERATOR_TYPES, state="readonly",
+                 width=8).grid(row=0, column=1, padx=2)
+    column = 2
+    for key, label, width in (("period_ms", "Period (ms):", 7), ("low", "Low:", 7), ("high", "High:", 7),
+                              ("duty", "Duty:", 4), ("seed", "Seed:", 5)):
+        tk.Label(frame, text=label).grid(row=0, column=column, sticky="e")
+        tk.Entry(frame, textvariable=generator_vars[key], width=width).grid(row=0, column=column + 1, padx=2)
+        column += 2
+    tk.Label(frame, text="Steps (ms:value, ...):").grid(row=1, column=0, columnspan=2, sticky="w")
+    tk.Entry(frame, textvariable=generator_vars["steps"], width=50).grid(row=1, column=2, columnspan=10,
+                                                                         sticky="we", padx=2)
+    return generator_vars
+
+def set_generator_fields(config, generator_vars):
+    spec = config.get("generator") or {}
+    generator_vars["type"].set(spec.get("type", "none"))
+    for key in ("period_ms", "low", "high", "duty", "seed"):
+        generator_vars[key].set("" if spec.get(key) is None else f"{spec[key]:g}")
+    generator_vars["steps"].set(", ".join(f"{duration:g}:{value:g}" for duration, value in spec.get("steps", [])))
+
+def generator_fields_config(generator_vars):
+    """Generator spec from the editor fields, None for "none"; raises ValueError on bad numbers."""
+    kind = generator_vars["type"].get()
+    if kind == "none":
+        return None
+    spec = {"type": kind}
+    for key in ("period_ms", "low", "high", "duty"):
+        text = generator_vars[key].get().strip()
+        if text:
+            spec[key] = float(text)
+    if generator_vars["seed"].get().strip():
+        spec["seed"] = int(generator_vars["seed"].get())
+    if kind == "steps":
+        spec["steps"] = [[float(part) for part in step.split(":")] for step in
+                         generator_vars["steps"].get().split(",") if step.strip()]
+    return spec
+
+def byte_positions(fd_var):
+    return [str(x) for x in range(engine.FD_MAX_LENGTH if fd_var.get() else 8)]
+
+def update_saved_parameter(param, config):
+    try:
+        engine.update_parameter(param, config)
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        return False
+    parameter_list.refresh()
+    return True
 
 def add_saved_parameter(config):
-    sp = SavedParameter(saved_parameters_frame, config)
-    saved_parameters.append(sp)
+    try:
+        engine.add_parameter(config)
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        return False
+    parameter_list.refresh()
+    return True
 
 # =================== ASCII Parameter Editor ===================
 def open_ascii_parameter_editor(saved_param=None):
@@ -496,6 +641,14 @@ def open_ascii_parameter_editor(saved_param=None):
     size_var = tk.StringVar(value=size_options[0])
     size_menu = ttk.Combobox(editor, textvariable=size_var, values=size_options, state="readonly", width=10)
     size_menu.grid(row=2, column=1, padx=5, pady=2)
+    fd_var, brs_var, dlc_var = add_frame_fields(editor, 7)
+    def update_size_options(*args):
+        limit = engine.FD_MAX_LENGTH if fd_var.get() else 8
+        size_menu.config(values=[f"{n} byte" for n in range(1, limit + 1)])
+        if int(size_var.get().split()[0]) > limit:
+            size_var.set(f"{limit} byte")
+        update_mapping_options()
+    fd_var.trace_add("write", update_size_options)
     mapping_frame = tk.Frame(editor)
     mapping_frame.grid(row=3, column=0, columnspan=3, pady=10)
     def update_mapping_options(*args):
@@ -503,15 +656,15 @@ def open_ascii_parameter_editor(saved_param=None):
             widget.destroy()
         size_str = size_var.get()
         num_bytes = int(size_str.split()[0])
-        tk.Label(mapping_frame, text="Select Byte Positions (order):").grid(row=0, column=0, columnspan=num_bytes)
+        tk.Label(mapping_frame, text="Select Byte Positions (order):").grid(row=0, column=0, columnspan=min(num_bytes, 16))
         mapping_vars = []
         for i in range(num_bytes):
             default_value = str(num_bytes - 1 - i)
             var = tk.StringVar(value=default_value)
             mapping_vars.append(var)
-            byte_menu = ttk.Combobox(mapping_frame, textvariable=var, values=[str(x) for x in range(8)],
+            byte_menu = ttk.Combobox(mapping_frame, textvariable=var, values=byte_positions(fd_var),
                                      state="readonly", width=3)
-            byte_menu.grid(row=1, column=i, padx=2)
+            byte_menu.grid(row=1 + i // 16, column=i % 16, padx=2)
         mapping_frame.mapping_vars = mapping_vars
     size_var.trace("w", update_mapping_options)
     update_mapping_options()
@@ -528,8 +681,12 @@ def open_ascii_parameter_editor(saved_param=None):
     cycle_time_entry = tk.Entry(editor)
     cycle_time_entry.insert(0, "1000")
     cycle_time_entry.grid(row=5, column=1, padx=5, pady=2)
+    channel_var = add_channel_field(editor, 6)
+    tx_mode_var, min_gap_var = add_tx_mode_fields(editor, 8)
     if saved_param:
         config = saved_param.config
+        set_frame_fields(config, fd_var, brs_var, dlc_var)
+        set_tx_mode_fields(config, tx_mode_var, min_gap_var)
         name_entry.insert(0, config["name"])
         can_id_entry.insert(0, hex(config["can_id"])[2:])
         size_var.set(config["size"])
@@ -543,6 +700,7 @@ def open_ascii_parameter_editor(saved_param=None):
         value_entry.insert(0, config.get("initial_value", ""))
         cycle_time_entry.delete(0, tk.END)
         cycle_time_entry.insert(0, str(config.get("cycle_time", 1000)))
+        channel_var.set(config.get("channel", ""))
     def save_edits():
         try:
             can_id_str = can_id_entry.get().strip()
@@ -562,65 +720,738 @@ def open_ascii_parameter_editor(saved_param=None):
             "mode": "ascii",
             "initial_value": value_entry.get()
         }
+        if channel_var.get().strip():
+            new_config["channel"] = channel_var.get().strip()
+        new_config.update(frame_fields_config(fd_var, brs_var, dlc_var))
+        try:
+            new_config.update(tx_mode_fields_config(tx_mode_var, min_gap_var))
+        except ValueError:
+            messagebox.showerror("Error", "Invalid minimum gap")
+            return
         if saved_param:
-            saved_param.config = new_config
-            saved_param.cycle_time_var.set(str(new_config["cycle_time"]))
-            saved_param.label.config(text=f"{new_config['name']} (CAN ID: {hex(new_config['can_id'])})")
-            saved_param.expected_length = int(new_config["size"].split()[0])
+            if not update_saved_parameter(saved_param, new_config):
+                return
         else:
-            add_ascii_saved_parameter(new_config)
+            if not add_ascii_saved_parameter(new_config):
+                return
         editor.destroy()
     save_button = tk.Button(editor, text="Save", command=save_edits)
-    save_button.grid(row=6, column=0, columnspan=3, pady=10)
+    save_button.grid(row=9, column=0, columnspan=3, pady=10)
 
 def add_ascii_saved_parameter(config):
-    sp = ASCIISavedParameter(saved_parameters_frame, config)
-    saved_parameters.append(sp)
+    return add_saved_parameter(config)
+
+# =================== Counter / Checksum Editor ===================
+CHECKSUM_TYPES = ["crc8_sae_j1850", "crc8h2f", "e2e_p1", "e2e_p2", "xor", "sum"]
+
+def open_e2e_editor(saved_param=None):
+    """Editor for rolling counters and checksum bytes (modes "counter" and "checksum")."""
+    editor = tk.Toplevel(root)
+    editor.title("Counter / Checksum Editor")
+    tk.Label(editor, text="Parameter Name:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+    name_entry = tk.Entry(editor)
+    name_entry.grid(row=0, column=1, padx=5, pady=2)
+    tk.Label(editor, text="CAN ID (hex):").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+    can_id_entry = tk.Entry(editor)
+    can_id_entry.grid(row=1, column=1, padx=5, pady=2)
+    tk.Label(editor, text="Kind:").grid(row=2, column=0, sticky="w", padx=5, pady=2)
+    mode_var = tk.StringVar(value="counter")
+    ttk.Combobox(editor, textvariable=mode_var, values=["counter", "checksum"], state="readonly",
+                 width=10).grid(row=2, column=1, padx=5, pady=2)
+    tk.Label(editor, text="Start bit / byte order:").grid(row=3, column=0, sticky="w", padx=5, pady=2)
+    start_bit_var = tk.StringVar(value="0")
+    byte_order_var = tk.StringVar(value="intel")
+    tk.Entry(editor, textvariable=start_bit_var, width=5).grid(row=3, column=1, sticky="w", padx=5, pady=2)
+    ttk.Combobox(editor, textvariable=byte_order_var, values=list(engine.BYTE_ORDERS), state="readonly",
+                 width=9).grid(row=3, column=2, padx=5, pady=2)
+    tk.Label(editor, text="Counter size / wrap:").grid(row=4, column=0, sticky="w", padx=5, pady=2)
+    size_var = tk.StringVar(value="4 bit")
+    wrap_var = tk.StringVar(value="")
+    ttk.Combobox(editor, textvariable=size_var, values=[f"{n} bit" for n in range(1, 33)], state="readonly",
+                 width=6).grid(row=4, column=1, sticky="w", padx=5, pady=2)
+    tk.Entry(editor, textvariable=wrap_var, width=6).grid(row=4, column=2, padx=5, pady=2)
+    tk.Label(editor, text="Checksum:").grid(row=5, column=0, sticky="w", padx=5, pady=2)
+    checksum_var = tk.StringVar(value=CHECKSUM_TYPES[0])
+    ttk.Combobox(editor, textvariable=checksum_var, values=CHECKSUM_TYPES, state="readonly",
+                 width=14).grid(row=5, column=1, padx=5, pady=2)
+    tk.Label(editor, text="Data ID (hex; E2E P2: 16 values):").grid(row=6, column=0, sticky="w", padx=5, pady=2)
+    data_id_var = tk.StringVar(value="0")
+    tk.Entry(editor, textvariable=data_id_var, width=50).grid(row=6, column=1, columnspan=2, padx=5, pady=2)
+    tk.Label(editor, text="Cycle Time (ms):").grid(row=7, column=0, sticky="w", padx=5, pady=2)
+    cycle_time_entry = tk.Entry(editor)
+    cycle_time_entry.insert(0, "1000")
+    cycle_time_entry.grid(row=7, column=1, padx=5, pady=2)
+    channel_var = add_channel_field(editor, 8)
+    fd_var, brs_var, dlc_var = add_frame_fields(editor, 9)
+    tx_mode_var, min_gap_var = add_tx_mode_fields(editor, 10)
+    if saved_param:
+        config = saved_param.config
+        set_frame_fields(config, fd_var, brs_var, dlc_var)
+        set_tx_mode_fields(config, tx_mode_var, min_gap_var)
+        name_entry.insert(0, config["name"])
+        can_id_entry.insert(0, hex(config["can_id"])[2:])
+        mode_var.set(config["mode"])
+        start_bit_var.set(str(config["start_bit"]))
+        byte_order_var.set(config.get("byte_order", "intel"))
+        if config["mode"] == "counter":
+            size_var.set(config["size"])
+            wrap_var.set(str(config["wrap"]))
+        else:
+            spec = config["checksum"]
+            checksum_var.set(spec["type"])
+            if "data_ids" in spec:
+                data_id_var.set(" ".join(f"{data_id:x}" for data_id in spec["data_ids"]))
+            else:
+                data_id_var.set(f"{spec.get('data_id', 0):x}")
+        cycle_time_entry.delete(0, tk.END)
+        cycle_time_entry.insert(0, str(config.get("cycle_time", 1000)))
+        channel_var.set(config.get("channel", ""))
+    def save_edits():
+        try:
+            can_id = int(can_id_entry.get().strip(), 16)
+            start_bit = int(start_bit_var.get())
+            cycle_time = float(cycle_time_entry.get())
+            data_ids = [int(part, 16) for part in data_id_var.get().replace(",", " ").split()]
+            wrap = int(wrap_var.get()) if wrap_var.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Error", "Invalid CAN ID, start bit, cycle time, wrap or data ID")
+            return
+        new_config = {"name": name_entry.get().strip(), "can_id": can_id, "mode": mode_var.get(),
+                      "start_bit": start_bit, "byte_order": byte_order_var.get(), "cycle_time": cycle_time}
+        if mode_var.get() == "counter":
+            new_config["size"] = size_var.get()
+            if wrap is not None:
+                new_config["wrap"] = wrap
+        else:
+            new_config["size"] = "8 bit"
+            spec = {"type": checksum_var.get()}
+            if spec["type"] == "e2e_p1":
+                spec["data_id"] = data_ids[0] if data_ids else 0
+            elif spec["type"] == "e2e_p2":
+                spec["data_ids"] = data_ids
+            new_config["checksum"] = spec
+        if channel_var.get().strip():
+            new_config["channel"] = channel_var.get().strip()
+        new_config.update(frame_fields_config(fd_var, brs_var, dlc_var))
+        try:
+            new_config.update(tx_mode_fields_config(tx_mode_var, min_gap_var))
+        except ValueError:
+            messagebox.showerror("Error", "Invalid minimum gap")
+            return
+        if saved_param:
+            new_config["value"] = saved_param.value
+            if not update_saved_parameter(saved_param, new_config):
+                return
+        else:
+            if not add_saved_parameter(new_config):
+                return
+        editor.destroy()
+    save_button = tk.Button(editor, text="Save", command=save_edits)
+    save_button.grid(row=11, column=0, columnspan=3, pady=10)
+
+# ---------- Profiles ----------
+PROFILE_FILETYPES = [("Parameter profiles", "*.json"), ("All files", "*.*")]
+
+def save_profile():
+    path = filedialog.asksaveasfilename(title="Save Profile", defaultextension=".json", filetypes=PROFILE_FILETYPES)
+    if not path:
+        return
+    try:
+        engine.save_profile(path)
+    except OSError as e:
+        messagebox.showerror("Error", f"Failed to save profile: {e}")
+        return
+    print(f"Saved {len(engine.saved_parameters)} parameters to {path}.")
+
+def load_profile():
+    path = filedialog.askopenfilename(title="Load Profile", filetypes=PROFILE_FILETYPES)
+    if not path:
+        return
+    receiving = pcan_receive.receiver.running()
+    try:
+        params = engine.load_profile(path)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Error", f"Failed to load profile: {e}")
+        return
+    finally:
+        resume_receiver(receiving)
+    print(f"Loaded {len(params)} parameters from {path}.")
+    parameter_list.refresh()
+
+# ---------- Bus Settings ----------
+def resume_receiver(was_running):
+    """Restart the receiver on the current bus if a bus change stopped it."""
+    if was_running and not pcan_receive.receiver.running():
+        bus = engine.get_global_bus()
+        if bus is not None:
+            pcan_receive.receiver.start(bus)
+
+def open_bus_settings():
+    dialog = tk.Toplevel(root)
+    dialog.title("Bus Settings")
+    preset_var = tk.StringVar()
+    interface_var = tk.StringVar(value=engine.bus_config.get("interface", ""))
+    channel_var = tk.StringVar(value=engine.bus_config.get("channel", ""))
+    bitrate_var = tk.StringVar(value=str(engine.bus_config.get("bitrate", 500000)))
+    def apply_preset(event=None):
+        preset = engine.BUS_PRESETS.get(preset_var.get())
+        if preset is not None:
+            interface_var.set(preset["interface"])
+            channel_var.set(preset["channel"])
+            bitrate_var.set(str(preset["bitrate"]))
+    tk.Label(dialog, text="Preset:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+    preset_combo = ttk.Combobox(dialog, textvariable=preset_var, values=sorted(engine.BUS_PRESETS), state="readonly")
+    preset_combo.grid(row=0, column=1, padx=5, pady=5)
+    preset_combo.bind("<<ComboboxSelected>>", apply_preset)
+    tk.Label(dialog, text="Interface:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(dialog, textvariable=interface_var).grid(row=1, column=1, padx=5, pady=5)
+    tk.Label(dialog, text="Channel:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(dialog, textvariable=channel_var).grid(row=2, column=1, padx=5, pady=5)
+    tk.Label(dialog, text="Bitrate:").grid(row=3, column=0, padx=5, pady=5, sticky="e")
+    ttk.Combobox(dialog, textvariable=bitrate_var, values=[str(b) for b in engine.BITRATES]).grid(row=3, column=1, padx=5, pady=5)
+    fd_var = tk.BooleanVar(value=bool(engine.bus_config.get("fd")))
+    tk.Checkbutton(dialog, text="CAN FD", variable=fd_var).grid(row=4, column=0, padx=5, pady=5, sticky="e")
+    data_bitrate_var = tk.StringVar(value=str(engine.bus_config.get("data_bitrate", 2000000)))
+    ttk.Combobox(dialog, textvariable=data_bitrate_var,
+                 values=[str(b) for b in engine.DATA_BITRATES]).grid(row=4, column=1, padx=5, pady=5)
+    tk.Label(dialog, text="Load budget (%):").grid(row=5, column=0, padx=5, pady=5, sticky="e")
+    budget_var = tk.StringVar(value=f"{engine.bus_load_budget:g}")
+    tk.Entry(dialog, textvariable=budget_var).grid(row=5, column=1, padx=5, pady=5)
+    refuse_var = tk.BooleanVar(value=engine.bus_load_refuse)
+    tk.Checkbutton(dialog, text="Refuse to enable over budget", variable=refuse_var).grid(
+        row=6, column=0, columnspan=2, padx=5, pady=5)
+    tk.Label(dialog, text="When send queue is full:").grid(row=7, column=0, padx=5, pady=5, sticky="e")
+    queue_policy_var = tk.StringVar(value=engine.send_queue_policy)
+    ttk.Combobox(dialog, textvariable=queue_policy_var, values=engine.SEND_QUEUE_POLICIES,
+                 state="readonly").grid(row=7, column=1, padx=5, pady=5)
+    tk.Label(dialog, text="Send queue length:").grid(row=8, column=0, padx=5, pady=5, sticky="e")
+    queue_limit_var = tk.StringVar(value=str(engine.send_queue_limit))
+    tk.Entry(dialog, textvariable=queue_limit_var).grid(row=8, column=1, padx=5, pady=5)
+    def apply_settings():
+        try:
+            bitrate = int(bitrate_var.get())
+            data_bitrate = int(data_bitrate_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Bitrate must be an integer.", parent=dialog)
+            return
+        try:
+            budget = float(budget_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Load budget must be a number.", parent=dialog)
+            return
+        try:
+            queue_limit = int(queue_limit_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Send queue length must be an integer.", parent=dialog)
+            return
+        if not interface_var.get().strip():
+            messagebox.showerror("Error", "Interface cannot be empty.", parent=dialog)
+            return
+        engine.set_send_queue(queue_policy_var.get(), queue_limit)
+        engine.remote_changed()
+        engine.bus_load_budget = budget
+        engine.bus_load_refuse = refuse_var.get()
+        receiving = pcan_receive.receiver.running()
+        settings = {"interface": interface_var.get().strip(), "channel": channel_var.get().strip(),
+                    "bitrate": bitrate, "fd": fd_var.get()}
+        if fd_var.get():
+            settings["data_bitrate"] = data_bitrate
+        ok = engine.configure_bus(settings)
+        resume_receiver(receiving)
+        if ok:
+            dialog.destroy()
+    tk.Button(dialog, text="Apply", command=apply_settings).grid(row=9, column=0, columnspan=2, pady=10)
+
+# ---------- DBC Import ----------
+def import_dbc():
+    path = filedialog.askopenfilename(title="Import DBC", filetypes=[("DBC files", "*.dbc"), ("All files", "*.*")])
+    if not path:
+        return
+    try:
+        db = pcan_dbc.load_dbc(path)
+    except OSError as e:
+        messagebox.showerror("Error", f"Failed to read DBC: {e}")
+        return
+    configs, skipped = pcan_dbc.database_configs(db)
+    imported = 0
+    for config in configs:
+        try:
+            engine.add_parameter(config)
+            imported += 1
+        except ValueError as e:
+            skipped.append(config["name"])
+            print(f"Skipping DBC signal: {e}")
+    parameter_list.refresh()
+    text = f"Imported {imported} signals from {len(db.messages)} messages."
+    if skipped:
+        text += (f"\n{len(skipped)} signals were skipped (multiplexed or not expressible as a parameter): "
+                 + ", ".join(skipped[:10]) + (" ..." if len(skipped) > 10 else ""))
+    messagebox.showinfo("DBC Import", text)
+
+# ---------- Trace ----------
+TRACE_FILETYPES = [("Vector ASCII", "*.asc"), ("Vector BLF", "*.blf"), ("CSV", "*.csv"), ("All files", "*.*")]
+
+def toggle_trace():
+    if engine.tracer is not None:
+        tracer = engine.tracer
+        engine.tracer = None
+        tracer.stop()
+        trace_button.config(text="Start Trace")
+        status = tracer.status()
+        messagebox.showinfo("Trace", f"Wrote {status['written']} frames to {tracer.path}.\n"
+                                     f"Dropped: {status['dropped']}")
+        return
+    path = filedialog.asksaveasfilename(title="Start Trace", defaultextension=".asc", filetypes=TRACE_FILETYPES)
+    if not path:
+        return
+    tracer = pcan_trace.TraceLogger(path)
+    try:
+        tracer.start()
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Error", f"Failed to open trace file: {e}")
+        return
+    engine.tracer = tracer
+    trace_button.config(text="Stop Trace")
+
+# ---------- Log Replay ----------
+REPLAY_REFRESH_MS = 250
+REPLAY_SPEEDS = ["0.5", "1", "2", "5", "10", "max"]
+replay_window = None
+
+def open_replay_dialog():
+    global replay_window
+    if replay_window is not None and replay_window.winfo_exists():
+        replay_window.lift()
+        return
+    dialog = replay_window = tk.Toplevel(root)
+    dialog.title("Log Replay")
+    path_var = tk.StringVar()
+    speed_var = tk.StringVar(value="1")
+    allow_var = tk.StringVar()
+    deny_var = tk.StringVar()
+    loop_var = tk.BooleanVar(value=False)
+    overlay_var = tk.BooleanVar(value=True)
+    def browse():
+        path = filedialog.askopenfilename(title="Replay Log", filetypes=TRACE_FILETYPES, parent=dialog)
+        if path:
+            path_var.set(path)
+    tk.Label(dialog, text="Log file:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(dialog, textvariable=path_var, width=40).grid(row=0, column=1, padx=5, pady=5)
+    tk.Button(dialog, text="Browse...", command=browse).grid(row=0, column=2, padx=5, pady=5)
+    tk.Label(dialog, text="Speed:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+    ttk.Combobox(dialog, textvariable=speed_var, values=REPLAY_SPEEDS, width=8).grid(
+        row=1, column=1, padx=5, pady=5, sticky="w")
+    tk.Label(dialog, text="Only IDs (hex):").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(dialog, textvariable=allow_var, width=40).grid(row=2, column=1, padx=5, pady=5)
+    tk.Label(dialog, text="Skip IDs (hex):").grid(row=3, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(dialog, textvariable=deny_var, width=40).grid(row=3, column=1, padx=5, pady=5)
+    tk.Checkbutton(dialog, text="Loop", variable=loop_var).grid(row=4, column=0, padx=5, pady=5, sticky="e")
+    tk.Checkbutton(dialog, text="Enabled parameters replace their recorded frames",
+                   variable=overlay_var).grid(row=4, column=1, padx=5, pady=5, sticky="w")
+    status_label = tk.Label(dialog, anchor="w")
+    status_label.grid(row=6, column=0, columnspan=3, padx=5, pady=5, sticky="we")
+    def start():
+        speed_text = speed_var.get().strip()
+        try:
+            speed = pcan_replay.AS_FAST_AS_POSSIBLE if speed_text == "max" else float(speed_text)
+            allow = pcan_replay.parse_ids(allow_var.get())
+            deny = pcan_replay.parse_ids(deny_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Speed must be a number or max; IDs must be hex.", parent=dialog)
+            return
+        try:
+            pcan_replay.start_replay(path_var.get(), speed=speed, allow=allow, deny=deny,
+                                     loop=loop_var.get(), overlay=overlay_var.get())
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to start replay: {e}", parent=dialog)
+    button_frame = tk.Frame(dialog)
+    button_frame.grid(row=5, column=0, columnspan=3, pady=5)
+    tk.Button(button_frame, text="Start", command=start, width=10).pack(side="left", padx=5)
+    tk.Button(button_frame, text="Stop", command=pcan_replay.stop_replay, width=10).pack(side="left", padx=5)
+    def refresh():
+        if not dialog.winfo_exists():
+            return
+        replay = pcan_replay.replay
+        if replay is None:
+            status_label.config(text="Not started")
+        else:
+            status = replay.status()
+            text = (f"{'Running' if status['running'] else 'Stopped'}: {status['sent']} sent, "
+                    f"{status['errors']} errors, {status['overlaid']} replaced by parameters, "
+                    f"max late {status['late_max_ms']:.1f} ms")
+            if status["error"]:
+                text += f"\n{status['error']}"
+            status_label.config(text=text)
+        dialog.after(REPLAY_REFRESH_MS, refresh)
+    refresh()
+
+# ---------- Transmit Statistics ----------
+STATS_REFRESH_MS = 1000
+stats_window = None
+
+def format_stat(value, fmt):
+    return "-" if value is None else format(value, fmt)
+
+def open_stats_panel():
+    global stats_window
+    if stats_window is not None and stats_window.winfo_exists():
+        stats_window.lift()
+        return
+    stats_window = tk.Toplevel(root)
+    stats_window.title("Transmit Statistics")
+    button_frame = tk.Frame(stats_window)
+    button_frame.pack(fill="x", padx=5, pady=5)
+    load_label = tk.Label(button_frame, anchor="w")
+    columns = [("sent", "Sent", 70), ("errors", "Errors", 60), ("mean", "Mean (ms)", 80),
+               ("min", "Min (ms)", 80), ("max", "Max (ms)", 80), ("p99", "p99 (ms)", 80),
+               ("latency", "Send (us)", 80), ("latency_p99", "Send p99 (us)", 90),
+               ("encode", "Encode (us)", 80), ("load", "Load (%)", 70)]
+    tree = ttk.Treeview(stats_window, columns=[c[0] for c in columns], height=20)
+    tree.heading("#0", text="Channel / CAN ID")
+    tree.column("#0", width=140)
+    for key, title, width in columns:
+        tree.heading(key, text=title)
+        tree.column(key, width=width, anchor="e")
+    def export():
+        path = filedialog.asksaveasfilename(title="Export Statistics", defaultextension=".json", parent=stats_window,
+                                            filetypes=[("JSON", "*.json"), ("CSV", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            engine.export_stats(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export statistics: {e}", parent=stats_window)
+    tk.Button(button_frame, text="Export...", command=export).pack(side="left", padx=2)
+    tk.Button(button_frame, text="Reset", command=engine.reset_stats).pack(side="left", padx=2)
+    load_label.pack(side="left", padx=10)
+    tree.pack(fill="both", expand=True, padx=5, pady=5)
+    def refresh():
+        if not stats_window.winfo_exists():
+            return
+        report = engine.stats_report()["channels"]
+        for name, channel_report in report.items():
+            parent = f"channel:{name}"
+            if not tree.exists(parent):
+                tree.insert("", "end", iid=parent, text=name, open=True)
+            tree.set(parent, "load", format_stat(channel_report["bus_load_percent"], ".1f"))
+            for can_id, snap in channel_report["ids"].items():
+                item = f"{name}:{can_id:x}"
+                values = (snap["sent"], snap["errors"],
+                          format_stat(snap["period_mean_ms"], ".3f"), format_stat(snap["period_min_ms"], ".3f"),
+                          format_stat(snap["period_max_ms"], ".3f"), format_stat(snap["period_p99_ms"], ".3f"),
+                          format_stat(snap["send_latency_mean_us"], ".1f"),
+                          format_stat(snap["send_latency_p99_us"], ".1f"),
+                          format_stat(snap["encode_mean_us"], ".2f"), format_stat(snap["bus_load_percent"], ".2f"))
+                if tree.exists(item):
+                    tree.item(item, values=values)
+                else:
+                    tree.insert(parent, "end", iid=item, text=hex(can_id), values=values)
+        load_label.config(text="Estimated bus load: " + ("   ".join(
+            f"{name} {r['bus_load_percent']:.1f}% (planned {r['planned_load_percent']:.1f}%, "
+            f"budget {engine.bus_load_budget:g}%) of {r['bitrate']} bit/s" for name, r in report.items()) or "-"))
+        stats_window.after(STATS_REFRESH_MS, refresh)
+    refresh()
+
+# ---------- Receive Monitor ----------
+RX_REFRESH_MS = 50  # 20 Hz; the receiver decodes in the background, this only reads the latest values
+rx_monitor = None
+
+def open_receive_monitor():
+    global rx_monitor
+    if rx_monitor is not None and rx_monitor.winfo_exists():
+        rx_monitor.lift()
+        return
+    if not pcan_receive.receiver.running() and not pcan_receive.start_receiver():
+        return
+    rx_monitor = tk.Toplevel(root)
+    rx_monitor.title("Receive Monitor")
+    button_frame = tk.Frame(rx_monitor)
+    button_frame.pack(fill="x", padx=5, pady=5)
+    status_label = tk.Label(button_frame, anchor="w")
+    tree = ttk.Treeview(rx_monitor, columns=("can_id", "value", "age"), height=20)
+    tree.heading("#0", text="Signal")
+    tree.heading("can_id", text="CAN ID")
+    tree.heading("value", text="Value")
+    tree.heading("age", text="Age (s)")
+    tree.column("can_id", width=90)
+    tree.column("value", width=120)
+    tree.column("age", width=80)
+    shown = {}  # (can_id, name) -> displayed timestamp
+    def use_saved_parameters():
+        pcan_receive.receiver.set_signals(pcan_receive.saved_signal_configs())
+        tree.delete(*tree.get_children())
+        shown.clear()
+    def load_rx_profile():
+        path = filedialog.askopenfilename(title="Load RX Signals", filetypes=PROFILE_FILETYPES, parent=rx_monitor)
+        if not path:
+            return
+        try:
+            bus, compiled = engine.read_profile(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load RX signals: {e}", parent=rx_monitor)
+            return
+        pcan_receive.receiver.set_signals([config for config, enabled in compiled])
+        tree.delete(*tree.get_children())
+        shown.clear()
+    tk.Button(button_frame, text="Use Saved Parameters", command=use_saved_parameters).pack(side="left", padx=2)
+    tk.Button(button_frame, text="Load RX Signals", command=load_rx_profile).pack(side="left", padx=2)
+    def toggle_capture():
+        store = pcan_capture.store
+        if store is not None and not store.closed:
+            pcan_capture.stop_capture()
+            capture_button.config(text="Start Capture")
+            return
+        directory = filedialog.askdirectory(title="Capture Directory (new or empty)", parent=rx_monitor)
+        if not directory:
+            return
+        try:
+            pcan_capture.start_capture(directory)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to start capture: {e}", parent=rx_monitor)
+            return
+        capture_button.config(text="Stop Capture")
+    store = pcan_capture.store
+    capture_button = tk.Button(button_frame, command=toggle_capture,
+                               text="Stop Capture" if store is not None and not store.closed else "Start Capture")
+    capture_button.pack(side="left", padx=2)
+    tk.Button(button_frame, text="Plot Capture", command=open_capture_plot).pack(side="left", padx=2)
+    status_label.pack(side="left", padx=10)
+    tree.pack(fill="both", expand=True, padx=5, pady=5)
+    def refresh():
+        if not rx_monitor.winfo_exists():
+            return
+        rx = pcan_receive.receiver
+        now = time.time()
+        for key, (timestamp, value) in sorted(rx.latest_values().items()):
+            can_id, name = key
+            item = f"{can_id:x}:{name}"
+            text = value if isinstance(value, str) else f"{value:g}"
+            if key not in shown:
+                tree.insert("", "end", iid=item, text=name, values=(hex(can_id), text, ""))
+            if shown.get(key) != timestamp:
+                tree.set(item, "value", text)
+                shown[key] = timestamp
+            tree.set(item, "age", f"{max(now - timestamp, 0):.1f}")
+        text = f"Frames received: {rx.received}   Errors: {rx.errors}"
+        store = pcan_capture.store
+        if store is not None and not store.closed:
+            text += f"   Captured: {store.frame_count()}"
+        status_label.config(text=text)
+        rx_monitor.after(RX_REFRESH_MS, refresh)
+    refresh()
+
+# ---------- Capture Plot ----------
+PLOT_WIDTH = 900
+PLOT_HEIGHT = 360
+PLOT_MARGIN = 50
+
+def plot_signal_configs():
+    """Numeric configs by name: the RX signals, then saved parameters of other names."""
+    configs = {}
+    for config in pcan_receive.receiver.configs + [param.config for param in engine.saved_parameters]:
+        if config.get("mode", "numeric") == "numeric" and config.get("name") not in configs:
+            configs[config["name"]] = config
+    return configs
+
+def open_capture_plot():
+    """
+    Plot one signal of a capture. The signal is decoded once over the whole
+    capture (Reload decodes again, e.g. while capturing); zooming (mouse
+    wheel) and panning (drag) only re-decimate, so every redraw is at most
+    two points per pixel column however long the capture is.
+    """
+    window = tk.Toplevel(root)
+    window.title("Capture Plot")
+    state = {"store": pcan_capture.store, "times": None, "values": None, "view": None, "drag": None}
+    configs = plot_signal_configs()
+    signal_var = tk.StringVar()
+    top = tk.Frame(window)
+    top.pack(fill="x", padx=5, pady=5)
+    tk.Label(top, text="Signal:").pack(side="left")
+    signal_combo = ttk.Combobox(top, textvariable=signal_var, values=sorted(configs), state="readonly", width=30)
+    signal_combo.pack(side="left", padx=5)
+    info_label = tk.Label(top, anchor="w")
+    canvas = tk.Canvas(window, width=PLOT_WIDTH, height=PLOT_HEIGHT, background="white")
+    def open_directory():
+        directory = filedialog.askdirectory(title="Open Capture", parent=window)
+        if not directory:
+            return
+        try:
+            state["store"] = pcan_capture.CaptureStore(directory, create=False)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"Failed to open capture: {e}", parent=window)
+            return
+        load()
+    def load(event=None):
+        store = state["store"]
+        config = configs.get(signal_var.get())
+        if store is None or config is None:
+            info_label.config(text="Open a capture and choose a signal." if store is None else "Choose a signal.")
+            return
+        try:
+            times, values = store.decode(config)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=window)
+            return
+        state["times"], state["values"] = times, values
+        state["view"] = (float(times[0]), float(times[-1])) if len(times) else None
+        draw()
+    def draw():
+        canvas.delete("all")
+        times, values, view = state["times"], state["values"], state["view"]
+        if times is None or view is None:
+            info_label.config(text="No frames of this signal in the capture.")
+            return
+        width = max(canvas.winfo_width(), PLOT_WIDTH) - 2 * PLOT_MARGIN
+        height = max(canvas.winfo_height(), PLOT_HEIGHT) - 2 * PLOT_MARGIN
+        t0, t1 = view
+        xs, ys = pcan_capture.min_max_decimate(times, values, width, t0, t1)
+        info_label.config(text=f"{len(times)} samples, showing {t0:.3f}..{t1:.3f} s ({len(xs)} points)")
+        if not len(xs):
+            return
+        low, high = float(ys.min()), float(ys.max())
+        if high == low:
+            low, high = low - 1, high + 1
+        span = max(t1 - t0, 1e-9)
+        px = PLOT_MARGIN + (xs - t0) / span * width
+        py = PLOT_MARGIN + (high - ys) / (high - low) * height
+        canvas.create_rectangle(PLOT_MARGIN, PLOT_MARGIN, PLOT_MARGIN + width, PLOT_MARGIN + height, outline="gray")
+        canvas.create_text(PLOT_MARGIN - 5, PLOT_MARGIN, text=f"{high:g}", anchor="e")
+        canvas.create_text(PLOT_MARGIN - 5, PLOT_MARGIN + height, text=f"{low:g}", anchor="e")
+        canvas.create_text(PLOT_MARGIN, PLOT_MARGIN + height + 15, text=f"{t0:.3f}", anchor="w")
+        canvas.create_text(PLOT_MARGIN + width, PLOT_MARGIN + height + 15, text=f"{t1:.3f}", anchor="e")
+        if len(xs) == 1:
+            canvas.create_oval(px[0] - 2, py[0] - 2, px[0] + 2, py[0] + 2, fill="blue")
+        else:
+            points = np.empty(2 * len(xs))
+            points[0::2] = px
+            points[1::2] = py
+            canvas.create_line(*points.tolist(), fill="blue")
+    def zoom(event):
+        view = state["view"]
+        if view is None:
+            return
+        width = max(canvas.winfo_width(), PLOT_WIDTH) - 2 * PLOT_MARGIN
+        t0, t1 = view
+        at = t0 + (t1 - t0) * min(max((event.x - PLOT_MARGIN) / width, 0.0), 1.0)
+        factor = 0.8 if (event.delta > 0 or event.num == 4) else 1.25
+        state["view"] = (at - (at - t0) * factor, at + (t1 - at) * factor)
+        draw()
+    def start_drag(event):
+        state["drag"] = (event.x, state["view"])
+    def drag(event):
+        if state["drag"] is None or state["drag"][1] is None:
+            return
+        x, (t0, t1) = state["drag"]
+        width = max(canvas.winfo_width(), PLOT_WIDTH) - 2 * PLOT_MARGIN
+        shift = (x - event.x) / width * (t1 - t0)
+        state["view"] = (t0 + shift, t1 + shift)
+        draw()
+    tk.Button(top, text="Reload", command=load).pack(side="left", padx=2)
+    tk.Button(top, text="Open Capture...", command=open_directory).pack(side="left", padx=2)
+    info_label.pack(side="left", padx=10)
+    canvas.pack(fill="both", expand=True, padx=5, pady=5)
+    signal_combo.bind("<<ComboboxSelected>>", load)
+    canvas.bind("<MouseWheel>", zoom)
+    canvas.bind("<Button-4>", zoom)
+    canvas.bind("<Button-5>", zoom)
+    canvas.bind("<ButtonPress-1>", start_drag)
+    canvas.bind("<B1-Motion>", drag)
+    canvas.bind("<Configure>", lambda event: draw())
 
 # ================= Main Window Setup =================
-root = tk.Tk()
-root.title("CAN Parameter Creator")
-top_frame = tk.Frame(root)
-top_frame.pack(pady=10)
-create_numeric_button = tk.Button(top_frame, text="Create Parameter", command=open_parameter_editor, width=20)
-create_numeric_button.pack(side="left", padx=5)
-create_ascii_button = tk.Button(top_frame, text="Create ASCII parameter", command=open_ascii_parameter_editor, width=20)
-create_ascii_button.pack(side="left", padx=5)
-# 1) Container for canvas + scrollbar
-container = tk.Frame(root)
-container.pack(fill="both", expand=True, padx=10, pady=10)
-
-# 2) Canvas itself
-canvas = tk.Canvas(container, borderwidth=0)
-canvas.pack(side="left", fill="both", expand=True)
-
-# 3) Vertical scrollbar
-vsb = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
-vsb.pack(side="right", fill="y")
-canvas.configure(yscrollcommand=vsb.set)
-
-# 4) A frame inside the canvas which will actually hold the saved-parameter widgets
-saved_parameters_frame = tk.Frame(canvas)
-# Put that frame in the canvas’s scrolling region
-canvas.create_window((0, 0), window=saved_parameters_frame, anchor="nw")
-
-# 5) When the inner frame changes size, update scrollregion
-def on_frame_configure(event):
-    canvas.configure(scrollregion=canvas.bbox("all"))
-
-saved_parameters_frame.bind("<Configure>", on_frame_configure)
-
-saved_parameters = []  # Combined list for both numeric and ASCII parameters.
-def on_closing():
-    for can_id in list(global_transmissions.keys()):
-        if global_transmissions[can_id]["job"]:
-            root.after_cancel(global_transmissions[can_id]["job"])
-    global global_bus
-    if global_bus is not None:
+CONNECTION_REFRESH_MS = 500
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("CAN Parameter Creator")
+    top_frame = tk.Frame(root)
+    top_frame.pack(pady=10)
+    create_numeric_button = tk.Button(top_frame, text="Create Parameter", command=open_parameter_editor, width=20)
+    create_numeric_button.pack(side="left", padx=5)
+    create_ascii_button = tk.Button(top_frame, text="Create ASCII parameter", command=open_ascii_parameter_editor, width=20)
+    create_ascii_button.pack(side="left", padx=5)
+    create_e2e_button = tk.Button(top_frame, text="Create Counter/Checksum", command=open_e2e_editor, width=22)
+    create_e2e_button.pack(side="left", padx=5)
+    save_profile_button = tk.Button(top_frame, text="Save Profile", command=save_profile, width=12)
+    save_profile_button.pack(side="left", padx=5)
+    load_profile_button = tk.Button(top_frame, text="Load Profile", command=load_profile, width=12)
+    load_profile_button.pack(side="left", padx=5)
+    import_dbc_button = tk.Button(top_frame, text="Import DBC", command=import_dbc, width=12)
+    import_dbc_button.pack(side="left", padx=5)
+    bus_settings_button = tk.Button(top_frame, text="Bus Settings", command=open_bus_settings, width=12)
+    bus_settings_button.pack(side="left", padx=5)
+    engine.bus_error_handler = lambda message: messagebox.showerror("Error", message)
+    engine.wait_for_bus = False  # buses open in the background, see connection_label
+    engine.bus_load_handler = lambda message: messagebox.showwarning("Bus Load", message)
+    def show_timing_report():
+        lines = engine.timing_report_lines()
+        if not lines:
+            messagebox.showinfo("Transmit Timing", "No measurements yet.")
+            return
+        messagebox.showinfo("Transmit Timing", "\n".join(lines))
+    timing_button = tk.Button(top_frame, text="Timing Report", command=show_timing_report, width=20)
+    timing_button.pack(side="left", padx=5)
+    stats_button = tk.Button(top_frame, text="Statistics", command=open_stats_panel, width=12)
+    stats_button.pack(side="left", padx=5)
+    periodic_tasks_var = tk.BooleanVar(value=engine.use_periodic_tasks)
+    def toggle_periodic_tasks():
+        engine.use_periodic_tasks = periodic_tasks_var.get()
+        engine.restart_transmissions()
+    periodic_tasks_check = tk.Checkbutton(top_frame, text="Use hardware periodic tasks",
+                                          variable=periodic_tasks_var, command=toggle_periodic_tasks)
+    periodic_tasks_check.pack(side="left", padx=5)
+    isolate_var = tk.BooleanVar(value=False)
+    def toggle_isolation():
+        if isolate_var.get():
+            pcan_process.start()
+        else:
+            pcan_process.stop()
+        parameter_list.sync_rows()
+    isolate_check = tk.Checkbutton(top_frame, text="Separate transmit process",
+                                   variable=isolate_var, command=toggle_isolation)
+    isolate_check.pack(side="left", padx=5)
+    control_var = tk.BooleanVar(value=False)
+    def toggle_control():
+        if not control_var.get():
+            pcan_control.stop_server()
+            return
         try:
-            global_bus.shutdown()
-        except Exception as e:
-            print("Error during bus shutdown:", e)
-    root.destroy()
-root.protocol("WM_DELETE_WINDOW", on_closing)
-root.mainloop()
+            pcan_control.start_server(pcan_control.DEFAULT_PORT)
+        except OSError as e:
+            control_var.set(False)
+            messagebox.showerror("Error", f"Failed to start control server: {e}")
+    control_check = tk.Checkbutton(top_frame, text=f"Control server (port {pcan_control.DEFAULT_PORT})",
+                                   variable=control_var, command=toggle_control)
+    control_check.pack(side="left", padx=5)
+    connection_label = tk.Label(root, anchor="w")
+    connection_label.pack(side="bottom", fill="x", padx=10)
+    def refresh_connection_status():
+        parts = []
+        for name, status in engine.connection_status().items():
+            text = f"{name}: {status['state']}"
+            if status["state"] != "connected" and status["last_error"]:
+                text += f" ({status['last_error']})"
+            if status["queue_dropped"]:
+                text += f", {status['queue_dropped']} frames replaced/dropped"
+            parts.append(text)
+        connection_label.config(text="   ".join(parts) or "No bus open")
+        root.after(CONNECTION_REFRESH_MS, refresh_connection_status)
+    refresh_connection_status()
+    parameter_list = ParameterList(root)
+    parameter_list.frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+    receive_button = tk.Button(top_frame, text="Receive Monitor", command=open_receive_monitor, width=16)
+    receive_button.pack(side="left", padx=5)
+    trace_button = tk.Button(top_frame, text="Start Trace", command=toggle_trace, width=12)
+    trace_button.pack(side="left", padx=5)
+    replay_button = tk.Button(top_frame, text="Replay Log", command=open_replay_dialog, width=12)
+    replay_button.pack(side="left", padx=5)
+    def on_closing():
+        pcan_capture.stop_capture()
+        pcan_control.stop_server()
+        pcan_replay.stop_replay()
+        pcan_receive.receiver.shutdown()
+        engine.shutdown()
+        root.destroy()
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
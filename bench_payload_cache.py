@@ -0,0 +1,106 @@
+"""
+Micro-benchmark for the per-ID payload cache.
+
+Compares the cost of producing one frame the old way (the original GUI's
+SavedParameter.get_payload and global_transmit merge, kept verbatim below:
+Tcl round-trip through value_var.get(), format() bit string and an 8-element
+list OR-merge of every member on every period) with the cached path (get_frame() on a clean entry) and with the cached path after one
+member changed, for 1, 8 and 64 one-bit parameters on a single CAN ID.
+
+Usage: python bench_payload_cache.py [--repeat N]
+"""
+import argparse
+import timeit
+import tkinter as tk
+
+import pcan_engine as engine
+
+CAN_ID = 0x100
+
+def make_config(index):
+    return {"name": f"sig{index}", "can_id": CAN_ID, "size": "1 bit", "type": "Unsigned",
+            "resolution": 1.0, "mapping": [index % 8], "target_byte": (index // 8) % 8,
+            "cycle_time": 10, "initial_value": index % 2, "mode": "numeric"}
+
+# ---------- Baseline (original GUI) ----------
+class BaselineParameter:
+    """The numeric encoder of the original SavedParameter: reads the value through a Tcl variable every period."""
+    def __init__(self, config, interp):
+        self.config = config
+        self.value_var = tk.DoubleVar(master=interp, value=config["initial_value"])
+    def get_payload(self):
+        size_str = self.config["size"]
+        resolution = self.config["resolution"]
+        raw_value = self.value_var.get() / resolution
+        raw_value = int(round(raw_value))
+        data_payload = [0] * 8
+        if "bit" in size_str:
+            num_bits = int(size_str.split()[0])
+            if self.config["type"] == "Unsigned":
+                bin_str = format(raw_value, f"0{num_bits}b")
+            else:
+                if raw_value < 0:
+                    raw_value = (1 << num_bits) + raw_value
+                bin_str = format(raw_value, f"0{num_bits}b")
+            byte_val = 0
+            for i, bit_pos in enumerate(self.config["mapping"]):
+                if int(bin_str[i]):
+                    byte_val |= (1 << bit_pos)
+            target_byte = self.config["target_byte"]
+            data_payload[target_byte] = byte_val
+        else:
+            num_bytes = int(size_str.split()[0])
+            if self.config["type"] == "Signed" and raw_value < 0:
+                raw_value = (1 << (8 * num_bytes)) + raw_value
+            try:
+                param_bytes = list(raw_value.to_bytes(num_bytes, byteorder='little', signed=False))
+            except OverflowError:
+                return [0] * 8
+            for i, byte_pos in enumerate(self.config["mapping"]):
+                if 0 <= byte_pos < 8:
+                    data_payload[byte_pos] = param_bytes[i]
+        return data_payload
+
+def baseline_frame(params):
+    """global_transmit's merge of the members' payloads, as in the original GUI."""
+    combined_payload = [0] * 8
+    for func in params:
+        payload = func()  # each function returns an 8-byte list
+        for i in range(8):
+            combined_payload[i] |= payload[i]
+    return bytearray(combined_payload)  # what can.Message made of the list
+
+def run(count, repeat, interp):
+    params = [engine.NumericParameter(make_config(i)) for i in range(count)]
+
+    baseline = [BaselineParameter(make_config(i), interp) for i in range(count)]
+    funcs = [sp.get_payload for sp in baseline]
+    t_before = timeit.timeit(lambda: baseline_frame(funcs), number=repeat)
+
+    after = engine.new_transmission(10, params[0].get_payload)
+    after["params"] = [sp.get_payload for sp in params]
+    engine.get_frame(after)
+    t_clean = timeit.timeit(lambda: engine.get_frame(after), number=repeat)
+
+    changed = params[0]
+    def change_one():
+        changed.value = 1.0 - changed.value
+        changed.payload = changed.encode_payload()
+        after["version"] += 1
+        return engine.get_frame(after)
+    t_dirty = timeit.timeit(change_one, number=repeat)
+
+    return [t / repeat * 1e6 for t in (t_before, t_clean, t_dirty)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    interp = tk.Tcl()
+    print(f"{'params/ID':>10} {'before (us)':>12} {'cached (us)':>12} {'1 dirty (us)':>13} {'speedup':>8}")
+    for count in (1, 8, 64):
+        t_before, t_clean, t_dirty = run(count, args.repeat, interp)
+        print(f"{count:>10} {t_before:>12.3f} {t_clean:>12.3f} {t_dirty:>13.3f} {t_before / t_clean:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Throughput and jitter benchmark for the transmit path.
+
+Drives N CAN IDs x M one-byte parameters through the real engine path
+(add_parameter, enable_parameters, then the default Channel's
+TransmitScheduler thread and Channel.transmit) on a bus without hardware, and writes the results as JSON so runs can be compared
+for regressions:
+
+  jitter     every ID at --cycle-ms while all values are updated at --update-hz;
+             reports achieved vs. target frames/s, period jitter, p99 and overruns
+  throughput every ID at a 0.01 ms cycle so the scheduler sends back to back;
+             reports the maximum sustained frames/s
+
+CPU usage is process CPU time over wall time (100% = one core).
+
+With --baseline, the run is compared to an earlier results file and the exit
+status is 2 if throughput dropped or jitter grew by more than --tolerance.
+
+Usage: python bench_transmit.py [--backend virtual|vcan] [--duration S] [--output FILE]
+                                [--baseline OLD.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+
+import can
+
+import pcan_engine as engine
+
+GRID = [(1, 1), (10, 8), (100, 8), (500, 4)]  # (IDs, parameters per ID)
+
+def make_configs(ids, params_per_id, cycle_ms):
+    configs = []
+    for i in range(ids):
+        for j in range(params_per_id):
+            configs.append({"name": f"id{i}_p{j}", "can_id": 0x100 + i, "size": "8 bit", "type": "Unsigned",
+                            "resolution": 1.0, "mapping": [7, 6, 5, 4, 3, 2, 1, 0], "target_byte": j % 8,
+                            "min_value": "0", "max_value": "255", "cycle_time": cycle_ms, "mode": "numeric",
+                            "initial_value": j})
+    return configs
+
+def run_case(ids, params_per_id, cycle_ms, duration, update_hz):
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        engine.clear_parameters()
+        params = [engine.add_parameter(config) for config in make_configs(ids, params_per_id, cycle_ms)]
+        engine.reset_stats()
+        engine.enable_parameters(params)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    updates = 0
+    next_update = wall_start
+    end = wall_start + duration
+    while True:
+        now = time.perf_counter()
+        if now >= end:
+            break
+        if update_hz and now >= next_update:
+            for param in params:
+                param.set_value((param.value + 1) % 256)
+            updates += len(params)
+            next_update += 1.0 / update_hz
+        time.sleep(min(0.001, max(end - now, 0)) if update_hz else min(0.05, max(end - now, 0)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    channel = engine.get_channel()
+    timing = channel.scheduler.timing_stats()
+    report = engine.stats_report()["channels"].get(channel.name, {"ids": {}})
+    with contextlib.redirect_stdout(quiet):
+        engine.clear_parameters()
+    snaps = list(report["ids"].values())
+    sent = sum(snap["sent"] for snap in snaps)
+    p99s = [snap["period_p99_ms"] for snap in snaps if snap["period_p99_ms"] is not None]
+    jitter_std = [st["jitter_std_ms"] for st in timing.values()]
+    return {"ids": ids,
+            "params_per_id": params_per_id,
+            "cycle_ms": cycle_ms,
+            "duration_s": wall,
+            "target_fps": ids * 1000.0 / cycle_ms,
+            "achieved_fps": sent / wall,
+            "errors": sum(snap["errors"] for snap in snaps),
+            "value_updates_per_s": updates / wall,
+            "jitter_std_ms_mean": sum(jitter_std) / len(jitter_std) if jitter_std else None,
+            "jitter_max_ms": max((st["jitter_max_ms"] for st in timing.values()), default=None),
+            "period_p99_ms_max": max(p99s, default=None),
+            "overruns": sum(st["overruns"] for st in timing.values()),
+            "send_latency_p99_us_max": max((snap["send_latency_p99_us"] or 0 for snap in snaps), default=None),
+            "encode_mean_us": (sum(snap["encode_mean_us"] or 0 for snap in snaps) / len(snaps)) if snaps else None,
+            "cpu_percent": cpu / wall * 100.0}
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions of results against baseline (matched by case)."""
+    regressions = []
+    for section, key, higher_is_better in (("throughput", "achieved_fps", True),
+                                           ("jitter", "achieved_fps", True),
+                                           ("jitter", "jitter_std_ms_mean", False)):
+        old_cases = {(c["ids"], c["params_per_id"]): c for c in baseline.get(section, [])}
+        for case in results[section]:
+            old = old_cases.get((case["ids"], case["params_per_id"]))
+            if old is None or not old.get(key) or case.get(key) is None:
+                continue
+            ratio = case[key] / old[key]
+            if (higher_is_better and ratio < 1 - tolerance) or (not higher_is_better and ratio > 1 + tolerance):
+                regressions.append(f"{section} {case['ids']}x{case['params_per_id']} {key}: "
+                                   f"{old[key]:.3f} -> {case[key]:.3f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["virtual", "vcan"], default="virtual")
+    parser.add_argument("--channel", default=None, help="override the preset channel (e.g. vcan1)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per case")
+    parser.add_argument("--cycle-ms", type=float, default=10.0, help="cycle time of the jitter cases")
+    parser.add_argument("--update-hz", type=float, default=10.0, help="value updates per parameter per second")
+    parser.add_argument("--periodic-tasks", action="store_true",
+                        help="allow native periodic tasks (default: measure the software scheduler)")
+    parser.add_argument("--output", default="bench_transmit.json")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change (default 0.2)")
+    args = parser.parse_args()
+    bus = dict(engine.BUS_PRESETS[args.backend])
+    if args.channel:
+        bus["channel"] = args.channel
+    engine.configure_bus(bus)
+    engine.use_periodic_tasks = args.periodic_tasks
+    if engine.get_global_bus() is None:
+        return 1
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": platform.python_version(),
+               "python_can": can.__version__,
+               "platform": platform.platform(),
+               "bus": dict(engine.bus_config),
+               "jitter": [],
+               "throughput": []}
+    print(f"{'IDs':>5} {'params':>6} {'target/s':>9} {'sent/s':>9} {'jit std':>8} {'jit max':>8} "
+          f"{'p99 ms':>7} {'overrun':>7} {'cpu %':>6}")
+    try:
+        for ids, params_per_id in GRID:
+            r = run_case(ids, params_per_id, args.cycle_ms, args.duration, args.update_hz)
+            results["jitter"].append(r)
+            print(f"{ids:>5} {params_per_id:>6} {r['target_fps']:>9.0f} {r['achieved_fps']:>9.0f} "
+                  f"{r['jitter_std_ms_mean'] or 0:>8.3f} {r['jitter_max_ms'] or 0:>8.3f} "
+                  f"{r['period_p99_ms_max'] or 0:>7.2f} {r['overruns']:>7} {r['cpu_percent']:>6.1f}")
+        print("Throughput (back-to-back):")
+        for ids in (1, 10, 100):
+            r = run_case(ids, 1, 0.01, args.duration, 0)
+            results["throughput"].append(r)
+            print(f"{ids:>5} IDs: {r['achieved_fps']:.0f} frames/s, cpu {r['cpu_percent']:.1f}%")
+    finally:
+        engine.shutdown()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
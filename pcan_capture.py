@@ -0,0 +1,298 @@
+"""
+Memory-mapped capture of received traffic for long soak tests.
+
+A CaptureStore is a directory of segments, each a set of preallocated .npy
+columns opened with np.lib.format.open_memmap:
+
+  timestamp  float64        can_id  uint32        length  uint8 (data bytes)
+  flags      uint8 (FLAG_*) data    uint8 [segment_frames, data_bytes]
+
+append() runs on the receive thread (register it with
+pcan_receive.receiver.add_listener, see start_capture) and writes one row;
+`count` of a segment is raised after the row is complete, so readers on other
+threads see whole frames only. When a segment is full it is sealed and a new
+one started; capture.json lists the segments and their frame counts.
+
+query(can_id, t0, t1) finds the frames of one ID in a time range: sealed
+segments get a per-ID index (frame numbers sorted by ID, then time) the first
+time they are queried, the segment being written is scanned. decode() turns
+the rows into physical values with NumPy using the same numeric configs the
+parameters encode (size, type, resolution, offset, mapping/target_byte or
+start_bit/byte_order, see engine.SignalLayout), and min_max_decimate()
+reduces any number of samples to a min/max envelope per pixel column for
+plotting. Timestamps are expected to rise within a capture and be non-zero,
+as they are for received frames; reopening a capture after a crash counts
+the rows of the last segment up to the first zero timestamp (see recover).
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+import pcan_engine as engine
+import pcan_receive
+
+FORMAT = 1
+SEGMENT_FRAMES = 1 << 20
+FLAG_EXTENDED = 1
+FLAG_FD = 2
+FLAG_REMOTE = 4
+COLUMNS = (("timestamp", np.float64), ("can_id", np.uint32), ("length", np.uint8), ("flags", np.uint8))
+
+class Segment:
+    """One segment's columns; `count` rows are valid."""
+    def __init__(self, directory, frames, data_bytes, count=0, mode="r+"):
+        self.directory = directory
+        if mode == "w+":
+            os.makedirs(directory, exist_ok=True)
+            self.columns = {name: np.lib.format.open_memmap(os.path.join(directory, name + ".npy"), mode="w+",
+                                                            dtype=dtype, shape=(frames,))
+                            for name, dtype in COLUMNS}
+            self.data = np.lib.format.open_memmap(os.path.join(directory, "data.npy"), mode="w+",
+                                                  dtype=np.uint8, shape=(frames, data_bytes))
+        else:
+            self.columns = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mode)
+                            for name, dtype in COLUMNS}
+            self.data = np.load(os.path.join(directory, "data.npy"), mmap_mode=mode)
+        self.timestamp = self.columns["timestamp"]
+        self.can_id = self.columns["can_id"]
+        self.length = self.columns["length"]
+        self.flags = self.columns["flags"]
+        self.count = count
+        self.index = None  # (ids, starts, order) once built, see frames_of
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+        self.data.flush()
+    def time_range(self, count):
+        return (float(self.timestamp[0]), float(self.timestamp[count - 1])) if count else None
+    def frames_of(self, can_id, count):
+        """Row numbers of can_id in time order; uses the per-ID index of a sealed segment."""
+        if self.index is None:
+            return np.flatnonzero(self.can_id[:count] == can_id)
+        ids, starts, order = self.index
+        i = np.searchsorted(ids, can_id)
+        if i == len(ids) or ids[i] != can_id:
+            return order[:0]
+        return order[starts[i]:starts[i + 1]]
+    def build_index(self):
+        """Per-ID index of a sealed segment, loaded from index.npz or built and saved there."""
+        path = os.path.join(self.directory, "index.npz")
+        if os.path.exists(path):
+            with np.load(path) as saved:
+                self.index = (saved["ids"], saved["starts"], saved["order"])
+            return
+        order = np.argsort(self.can_id[:self.count], kind="stable")  # stable: time order within an ID
+        sorted_ids = self.can_id[:self.count][order]
+        ids, starts = np.unique(sorted_ids, return_index=True)
+        starts = np.append(starts, len(order))
+        np.savez(path, ids=ids, starts=starts, order=order)
+        self.index = (ids, starts, order)
+
+class CaptureStore:
+    """See the module docstring. Open an existing capture with CaptureStore(directory, create=False)."""
+    def __init__(self, directory, segment_frames=SEGMENT_FRAMES, data_bytes=None, create=True):
+        self.directory = directory
+        self.lock = threading.Lock()  # segment list changes and index builds; append() does not take it
+        self.segments = []
+        self.closed = False
+        if create:
+            if os.path.exists(os.path.join(directory, "capture.json")):
+                raise ValueError(f"{directory} already holds a capture")
+            self.segment_frames = int(segment_frames)
+            self.data_bytes = data_bytes or (engine.FD_MAX_LENGTH if engine.bus_config.get("fd") else 8)
+            os.makedirs(directory, exist_ok=True)
+            self.active = self.new_segment()
+        else:
+            with open(os.path.join(directory, "capture.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != FORMAT:
+                raise ValueError(f"{directory}: unsupported capture format {meta.get('format')}")
+            self.segment_frames = meta["segment_frames"]
+            self.data_bytes = meta["data_bytes"]
+            for i, count in enumerate(meta["counts"]):
+                segment = Segment(self.segment_path(i), self.segment_frames, self.data_bytes, count, mode="r")
+                self.segments.append(segment)
+            if self.segments:
+                self.recover(self.segments[-1])
+            self.active = None
+            self.closed = True
+    def recover(self, segment):
+        """
+        Count the frames the last segment holds beyond capture.json, which is
+        only rewritten per segment and on close(): after a crash the rows are
+        in the files, up to the first never-written (zero) timestamp.
+        """
+        unused = np.flatnonzero(segment.timestamp[segment.count:] == 0)
+        count = segment.count + (unused[0] if len(unused) else len(segment.timestamp) - segment.count)
+        if count != segment.count:
+            print(f"Capture {self.directory}: recovered {count - segment.count} frames not in capture.json.")
+            segment.count = int(count)
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"segment_{number:05d}")
+    def new_segment(self):
+        segment = Segment(self.segment_path(len(self.segments)), self.segment_frames, self.data_bytes, mode="w+")
+        with self.lock:
+            self.segments.append(segment)
+        self.write_meta()
+        return segment
+    def write_meta(self):
+        meta = {"format": FORMAT, "segment_frames": self.segment_frames, "data_bytes": self.data_bytes,
+                "counts": [segment.count for segment in self.segments]}
+        path = os.path.join(self.directory, "capture.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+    # ---------- writer (receive thread) ----------
+    def append(self, msg):
+        segment = self.active
+        if segment is None or msg.is_error_frame:
+            return
+        i = segment.count
+        if i == self.segment_frames:
+            segment.flush()
+            try:
+                segment = self.active = self.new_segment()
+            except OSError as e:
+                print(f"Capture stopped, no new segment: {e}")
+                self.active = None
+                return
+            i = 0
+        data = msg.data
+        length = min(len(data), self.data_bytes)
+        segment.timestamp[i] = msg.timestamp
+        segment.can_id[i] = msg.arbitration_id
+        segment.length[i] = length
+        segment.flags[i] = (msg.is_extended_id and FLAG_EXTENDED) | (msg.is_fd and FLAG_FD) \
+            | (msg.is_remote_frame and FLAG_REMOTE)
+        if length:
+            segment.data[i, :length] = np.frombuffer(data, np.uint8, length)
+        segment.count = i + 1
+    def close(self):
+        segment = self.active
+        self.active = None
+        self.closed = True
+        if segment is not None:
+            segment.flush()
+            self.write_meta()
+    # ---------- readers (any thread) ----------
+    def frame_count(self):
+        return sum(segment.count for segment in list(self.segments))
+    def time_range(self):
+        ranges = [segment.time_range(segment.count) for segment in list(self.segments) if segment.count]
+        return (ranges[0][0], ranges[-1][1]) if ranges else None
+    def query(self, can_id, t0=-np.inf, t1=np.inf):
+        """(timestamps, lengths, data rows) of the frames of can_id with t0 <= timestamp <= t1."""
+        parts = []
+        for segment in list(self.segments):
+            count = segment.count
+            if not count:
+                continue
+            first, last = segment.time_range(count)
+            if last < t0 or first > t1:
+                continue
+            if segment is not self.active and segment.index is None:
+                with self.lock:
+                    if segment.index is None:
+                        segment.build_index()
+            rows = segment.frames_of(can_id, count)
+            times = segment.timestamp[rows]
+            lo, hi = np.searchsorted(times, t0, side="left"), np.searchsorted(times, t1, side="right")
+            rows = rows[lo:hi]
+            parts.append((times[lo:hi], segment.length[rows], segment.data[rows]))
+        if not parts:
+            return np.empty(0), np.empty(0, np.uint8), np.empty((0, self.data_bytes), np.uint8)
+        return (np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]),
+                np.concatenate([p[2] for p in parts]))
+    def decode(self, config, t0=-np.inf, t1=np.inf):
+        """(timestamps, physical values) of a numeric config over a time range; frames too short are skipped."""
+        timestamps, lengths, data = self.query(config["can_id"], t0, t1)
+        return decode_rows(config, timestamps, lengths, data)
+
+# ---------- Vectorized decode ----------
+def byte_pieces(pieces):
+    """Split SignalLayout pieces into (byte, shift in byte, mask, value shift) that each lie in one byte."""
+    result = []
+    for value_shift, mask, frame_shift in pieces:
+        width = mask.bit_length()
+        done = 0
+        while done < width:
+            byte, in_byte = divmod(frame_shift + done, 8)
+            n = min(8 - in_byte, width - done)
+            result.append((byte, in_byte, (1 << n) - 1, value_shift + done))
+            done += n
+    return result
+
+def decode_rows(config, timestamps, lengths, data):
+    if config.get("mode", "numeric") != "numeric":
+        raise ValueError(f"only numeric signals can be decoded, not mode {config.get('mode')!r}")
+    layout = engine.SignalLayout(config)
+    valid = lengths >= layout.needed_bytes
+    if layout.needed_bytes > data.shape[1]:
+        valid[:] = False
+    if not valid.all():
+        timestamps, data = timestamps[valid], data[valid]
+    raw = np.zeros(len(timestamps), np.uint64)
+    for byte, shift, mask, value_shift in byte_pieces(layout.pieces):
+        part = (data[:, byte] >> np.uint8(shift)) & np.uint8(mask)
+        raw |= part.astype(np.uint64) << np.uint64(value_shift)
+    if layout.signed:
+        bits = layout.bits
+        negative = ((raw >> np.uint64(bits - 1)) & np.uint64(1)).astype(bool)
+        extension = np.uint64(~((1 << bits) - 1) & 0xFFFFFFFFFFFFFFFF)  # sign-extend in uint64, then reinterpret
+        values = np.where(negative, raw | extension, raw).view(np.int64)
+    else:
+        values = raw
+    return timestamps, values.astype(np.float64) * float(config["resolution"]) + float(config.get("offset", 0))
+
+# ---------- Decimation ----------
+def min_max_decimate(timestamps, values, buckets, t0=None, t1=None):
+    """
+    (times, values) of at most 2 * buckets samples: the minimum and maximum of
+    each of `buckets` equal time slices of t0..t1 with their own timestamps,
+    in time order, so a line through them shows every peak where it was.
+    """
+    if t0 is None:
+        t0 = timestamps[0] if len(timestamps) else 0.0
+    if t1 is None:
+        t1 = timestamps[-1] if len(timestamps) else 0.0
+    lo, hi = np.searchsorted(timestamps, t0, side="left"), np.searchsorted(timestamps, t1, side="right")
+    timestamps, values = timestamps[lo:hi], values[lo:hi]
+    if len(values) <= 2 * buckets:
+        return timestamps, values
+    edges = np.searchsorted(timestamps, np.linspace(t0, t1, buckets + 1)[:-1], side="left")
+    starts = np.unique(edges[edges < len(values)])
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+    rows = np.arange(len(values))
+    last = len(values)
+    # first row of each bucket holding its minimum / maximum
+    at_min = np.minimum.reduceat(np.where(values == np.minimum.reduceat(values, starts)[bucket], rows, last), starts)
+    at_max = np.minimum.reduceat(np.where(values == np.maximum.reduceat(values, starts)[bucket], rows, last), starts)
+    picked = np.empty(2 * len(starts), np.intp)
+    picked[0::2] = np.minimum(at_min, at_max)
+    picked[1::2] = np.maximum(at_min, at_max)
+    return timestamps[picked], values[picked]
+
+# ---------- Capture control ----------
+store = None  # the CaptureStore being written (or the last one)
+
+def start_capture(directory, segment_frames=SEGMENT_FRAMES):
+    """
+    Start writing received frames of the default channel into a new store in
+    directory, starting the receiver if needed; raises OSError if its bus is
+    not available, ValueError if directory already holds a capture.
+    """
+    global store
+    stop_capture()
+    if not pcan_receive.receiver.running() and not pcan_receive.start_receiver():
+        raise OSError("Receiver could not be started: bus not available")
+    new = CaptureStore(directory, segment_frames)
+    store = new
+    pcan_receive.receiver.add_listener(new.append)
+    return new
+
+def stop_capture():
+    if store is not None and not store.closed:
+        pcan_receive.receiver.remove_listener(store.append)
+        store.close()
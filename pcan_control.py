@@ -0,0 +1,267 @@
+"""
+Local control server for driving the engine from other processes.
+
+A ControlServer listens on localhost TCP ("5005", "127.0.0.1:5005") or a
+Unix socket (a path) and speaks JSON lines: one request object per line, one
+reply line per request, in order, so clients can pipeline requests without
+waiting for replies. Requests are handled on the server's own asyncio thread
+against the engine model (saved_parameters and the channels' transmissions),
+never on a front end's thread; the engine's model_change functions they call
+take engine.model_lock, so they never interleave with a front end's edits.
+
+    {"id": 1, "op": "list"}
+    {"id": 2, "op": "set", "values": {"EngineSpeed": 800, "Gear": 2}}
+    {"id": 3, "op": "enable", "names": ["EngineSpeed"]}        # also "disable"
+    {"id": 4, "op": "cycle_time", "name": "EngineSpeed", "cycle_time": 20}
+    {"id": 5, "op": "stats"}       # engine.stats_report(), CAN IDs as hex strings
+    {"id": 6, "op": "rx"}          # latest decoded values of pcan_receive.receiver
+    {"id": 7, "op": "status"}      # engine.connection_status()
+    {"id": 8, "op": "subscribe", "stats": 1.0, "rx": 0.1}     # seconds, 0 stops
+
+Replies are {"id": ..., "ok": true, "result": ...} or {"id": ..., "ok":
+false, "error": "..."}; subscriptions push {"event": "stats"|"rx", "data":
+...} lines until cancelled or the connection closes. "set" goes through
+engine.set_values(), so one message updates many signals and the members of
+one frame change together (see pcan_script).
+"""
+import asyncio
+import contextlib
+import json
+import os
+import threading
+
+import pcan_engine as engine
+import pcan_receive
+import pcan_script
+
+DEFAULT_PORT = 5005
+MAX_LINE = 1 << 20      # bytes per request line
+DRAIN_BYTES = 1 << 16   # reply bytes buffered before waiting for the client to read
+START_TIMEOUT = 5.0
+
+def parse_address(text):
+    """("tcp", host, port) for "5005"/"host:port", ("unix", path) for anything else."""
+    text = str(text).strip()
+    if text.isdigit():
+        return ("tcp", "127.0.0.1", int(text))
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit() and "/" not in text:
+        return ("tcp", host or "127.0.0.1", int(port))
+    return ("unix", text)
+
+def describe(param):
+    config = param.config
+    return {"name": config.get("name"), "can_id": hex(config["can_id"]), "channel": param_channel(param),
+            "mode": config.get("mode", "numeric"), "value": param.value, "enabled": param.enabled,
+            "cycle_time": config.get("cycle_time"), "tx_mode": config.get("tx_mode", "cyclic"),
+            "min_value": config.get("min_value"), "max_value": config.get("max_value")}
+
+def param_channel(param):
+    return param.config.get("channel") or engine.bus_config.get("channel")
+
+def stats_snapshot():
+    report = engine.stats_report()
+    return {"channels": {name: dict(channel_report, ids={hex(can_id): snap
+                                                          for can_id, snap in channel_report["ids"].items()})
+                         for name, channel_report in report["channels"].items()},
+            "connections": report.get("connections", {})}
+
+def rx_snapshot():
+    return [{"can_id": hex(can_id), "signal": name, "timestamp": timestamp, "value": value}
+            for (can_id, name), (timestamp, value) in pcan_receive.receiver.latest_values().items()]
+
+# ---------- Operations ----------
+# Each takes (connection, request) and returns the reply's result; errors are
+# raised as KeyError/ValueError/TypeError (or engine.BusLoadError).
+def need(request, key):
+    if key not in request:
+        raise ValueError(f"{request.get('op')} needs {key!r}")
+    return request[key]
+
+def op_list(connection, request):
+    return [describe(param) for param in list(engine.saved_parameters)]
+
+def op_set(connection, request):
+    values = need(request, "values")
+    if not isinstance(values, dict):
+        raise TypeError("values must be an object of name: value")
+    engine.set_values([(pcan_script.parameter(name), value) for name, value in values.items()])
+    return len(values)
+
+def op_enable(connection, request):
+    params = [pcan_script.parameter(name) for name in need(request, "names")]
+    return engine.open_and_enable(params)
+
+def op_disable(connection, request):
+    params = [pcan_script.parameter(name) for name in need(request, "names")]
+    engine.disable_parameters(params)
+    return len(params)
+
+def op_cycle_time(connection, request):
+    cycle_time = float(need(request, "cycle_time"))
+    if cycle_time <= 0:
+        raise ValueError("cycle_time must be positive")
+    pcan_script.parameter(need(request, "name")).set_cycle_time(cycle_time)
+    return cycle_time
+
+def op_stats(connection, request):
+    return stats_snapshot()
+
+async def op_rx(connection, request):
+    if not await pcan_script.start_receiver():
+        raise ValueError("Receiver could not be started: bus not available")
+    return rx_snapshot()
+
+def op_status(connection, request):
+    return engine.connection_status()
+
+async def op_subscribe(connection, request):
+    for kind in ("stats", "rx"):
+        if kind in request:
+            interval = float(request[kind])
+            if kind == "rx" and interval > 0 and not await pcan_script.start_receiver():
+                raise ValueError("Receiver could not be started: bus not available")
+            connection.subscribe(kind, interval)
+    return sorted(connection.streams)
+
+OPS = {"list": op_list, "set": op_set, "enable": op_enable, "disable": op_disable, "cycle_time": op_cycle_time,
+       "stats": op_stats, "rx": op_rx, "status": op_status, "subscribe": op_subscribe}
+SNAPSHOTS = {"stats": stats_snapshot, "rx": rx_snapshot}
+
+# ---------- Server ----------
+class Connection:
+    """One client: its writer and its subscription tasks (kind -> asyncio.Task)."""
+    def __init__(self, writer):
+        self.writer = writer
+        self.streams = {}
+    def send(self, obj):
+        self.writer.write(json.dumps(obj, separators=(",", ":"), default=str).encode() + b"\n")
+    def subscribe(self, kind, interval):
+        task = self.streams.pop(kind, None)
+        if task is not None:
+            task.cancel()
+        if interval > 0:
+            self.streams[kind] = asyncio.get_running_loop().create_task(self.stream(kind, interval))
+    async def stream(self, kind, interval):
+        snapshot = SNAPSHOTS[kind]
+        while True:
+            self.send({"event": kind, "data": snapshot()})
+            await self.writer.drain()
+            await asyncio.sleep(interval)
+    def close(self):
+        for task in self.streams.values():
+            task.cancel()
+        self.streams.clear()
+        self.writer.close()
+
+async def dispatch(connection, line):
+    """Reply object for one request line."""
+    request_id = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        request_id = request.get("id")
+        op = OPS.get(request.get("op"))
+        if op is None:
+            raise ValueError(f"unknown op {request.get('op')!r}; one of {sorted(OPS)}")
+        result = op(connection, request)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return {"id": request_id, "ok": True, "result": result}
+    except (KeyError, ValueError, TypeError, engine.BusLoadError) as e:
+        message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+        return {"id": request_id, "ok": False, "error": message}
+
+class ControlServer:
+    """The server thread; start() raises OSError if the address cannot be bound."""
+    def __init__(self, address=DEFAULT_PORT):
+        self.address = parse_address(address)
+        self.loop = None
+        self.stopping = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+        self.connections = {}  # handler task -> Connection
+        self.requests = 0
+    def start(self):
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.serve()), name="ControlServer", daemon=True)
+        self.thread.start()
+        self.ready.wait(START_TIMEOUT)
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+        print(f"Control server listening on {self.describe_address()}.")
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            self.thread.join(timeout=2.0)
+    def describe_address(self):
+        if self.address[0] == "tcp":
+            return f"{self.address[1]}:{self.address[2]}"
+        return self.address[1]
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        try:
+            if self.address[0] == "tcp":
+                server = await asyncio.start_server(self.handle, self.address[1], self.address[2], limit=MAX_LINE)
+            else:
+                server = await asyncio.start_unix_server(self.handle, self.address[1], limit=MAX_LINE)
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        try:
+            async with server:
+                await self.stopping.wait()
+                handlers = list(self.connections)
+                for connection in list(self.connections.values()):
+                    connection.close()  # the handler reads EOF and returns
+                await asyncio.gather(*handlers, return_exceptions=True)
+        finally:
+            if self.address[0] == "unix":
+                with contextlib.suppress(OSError):
+                    os.unlink(self.address[1])
+    async def handle(self, reader, writer):
+        connection = Connection(writer)
+        task = asyncio.current_task()
+        self.connections[task] = connection
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # longer than MAX_LINE
+                    connection.send({"id": None, "ok": False, "error": f"request longer than {MAX_LINE} bytes"})
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                self.requests += 1
+                connection.send(await dispatch(connection, line))
+                if writer.transport.get_write_buffer_size() > DRAIN_BYTES:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[task]
+            connection.close()
+
+server = None  # the running ControlServer
+
+def start_server(address=DEFAULT_PORT):
+    """Start (or restart on a new address) the control server; raises OSError."""
+    global server
+    stop_server()
+    new = ControlServer(address)
+    new.start()
+    server = new
+    return new
+
+def stop_server():
+    global server
+    if server is not None:
+        server.stop()
+        server = None
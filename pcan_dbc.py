@@ -0,0 +1,239 @@
+"""
+DBC import for the CAN engine.
+
+parse_dbc() streams a DBC file line by line and compiles its BO_/SG_
+definitions into DbcMessage/DbcSignal objects. Each message also gets a
+PackPlan: integer shift/mask fields for every signal that build the frame
+data from physical values in one pass (Intel and Motorola, any start bit).
+
+load_dbc() caches the compiled database as a pickle keyed on the SHA-1 of the
+file, so re-opening a large DBC only costs a hash and an unpickle.
+signal_to_config() turns a signal into an editor-style parameter config with
+the same start bit, length and byte order; messages longer than 8 bytes become
+CAN FD parameters.
+"""
+import gc
+import hashlib
+import os
+import pickle
+import re
+from collections import namedtuple
+
+import pcan_engine as engine
+
+CACHE_VERSION = 2
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pcan-custom-software", "dbc")
+DEFAULT_CYCLE_TIME = 1000
+
+BO_RE = re.compile(r"^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)\s+(\S+)")
+SG_RE = re.compile(r"^SG_\s+(\w+)\s*(M|m\d+)?\s*:\s*(\d+)\|(\d+)@([01])([+-])\s*"
+                   r"\(\s*([^,]+),\s*([^)]+)\)\s*\[\s*([^|]+)\|\s*([^\]]+)\]\s*\"([^\"]*)\"")
+CYCLE_TIME_RE = re.compile(r'^BA_\s+"GenMsgCycleTime"\s+BO_\s+(\d+)\s+(\d+(?:\.\d+)?)\s*;')
+CYCLE_TIME_DEFAULT_RE = re.compile(r'^BA_DEF_DEF_\s+"GenMsgCycleTime"\s+(\d+(?:\.\d+)?)\s*;')
+
+# start_bit is the DBC start bit: the LSB for Intel (little_endian, @1) and the
+# MSB for Motorola (@0). multiplex is None, "M" (multiplexor) or "m<n>".
+# Signals are tuples so the cached database unpickles quickly.
+DbcSignal = namedtuple("DbcSignal", ["name", "start_bit", "length", "little_endian", "signed", "factor",
+                                     "offset", "minimum", "maximum", "unit", "multiplex"])
+
+class DbcMessage:
+    __slots__ = ("can_id", "is_extended_id", "name", "dlc", "sender", "cycle_time", "signals", "plan")
+    def __init__(self, can_id, is_extended_id, name, dlc, sender):
+        self.can_id = can_id
+        self.is_extended_id = is_extended_id
+        self.name = name
+        self.dlc = dlc
+        self.sender = sender
+        self.cycle_time = None
+        self.signals = []
+        self.plan = None
+
+class DbcDatabase:
+    def __init__(self):
+        self.messages = {}  # can_id -> DbcMessage
+    def signals(self):
+        for msg in self.messages.values():
+            for sig in msg.signals:
+                yield msg, sig
+
+# ---------- Pack Plans ----------
+class PackPlan:
+    """
+    Builds a message's data from physical signal values with integer
+    arithmetic only. Intel fields are placed in a little-endian frame integer
+    and Motorola fields in a big-endian one; both are merged at the end.
+    Multiplexed signals are left out.
+    """
+    __slots__ = ("dlc", "fields")
+    def __init__(self, dlc, signals):
+        self.dlc = dlc
+        self.fields = []  # (name, shift, mask, factor, offset, little_endian, signed)
+        for sig in signals:
+            if sig.multiplex is not None and sig.multiplex != "M":
+                continue
+            if sig.little_endian:
+                shift = sig.start_bit
+            else:
+                msb = (dlc - 1 - sig.start_bit // 8) * 8 + sig.start_bit % 8
+                shift = msb - (sig.length - 1)
+            if shift < 0 or shift + sig.length > 8 * dlc:
+                continue  # does not fit the declared DLC
+            self.fields.append((sig.name, shift, (1 << sig.length) - 1, sig.factor, sig.offset,
+                                sig.little_endian, sig.signed))
+    def pack(self, values):
+        """values maps signal name -> physical value; missing signals are sent as raw 0."""
+        little = 0
+        big = 0
+        for name, shift, mask, factor, offset, little_endian, signed in self.fields:
+            value = values.get(name)
+            if value is None:
+                continue
+            raw = int(round((value - offset) / factor)) & mask
+            if little_endian:
+                little |= raw << shift
+            else:
+                big |= raw << shift
+        if big:
+            little |= int.from_bytes(big.to_bytes(self.dlc, "big"), "little")
+        return little.to_bytes(self.dlc, "little")
+    def unpack(self, data):
+        """Inverse of pack(): physical values of every field found in data."""
+        dlc = self.dlc
+        little = int.from_bytes(bytes(data[:dlc]).ljust(dlc, b"\0"), "little")
+        big = int.from_bytes(bytes(data[:dlc]).ljust(dlc, b"\0"), "big")
+        values = {}
+        for name, shift, mask, factor, offset, little_endian, signed in self.fields:
+            raw = ((little if little_endian else big) >> shift) & mask
+            if signed and raw > mask >> 1:
+                raw -= mask + 1
+            values[name] = raw * factor + offset
+        return values
+
+# ---------- Parsing ----------
+def parse_dbc(lines):
+    """Compile an iterable of DBC lines (e.g. an open file) into a DbcDatabase."""
+    db = DbcDatabase()
+    current = None
+    cycle_times = {}
+    default_cycle_time = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith("SG_"):
+            match = SG_RE.match(line)
+            if current is None or match is None:
+                continue
+            name, multiplex, start, length, order, sign, factor, offset, minimum, maximum, unit = match.groups()
+            current.signals.append(DbcSignal(name, int(start), int(length), order == "1", sign == "-",
+                                             float(factor), float(offset), float(minimum), float(maximum),
+                                             unit, multiplex))
+            continue
+        current = None
+        if line.startswith("BO_ "):
+            match = BO_RE.match(line)
+            if match is None:
+                continue
+            raw_id, name, dlc, sender = match.groups()
+            raw_id = int(raw_id)
+            is_extended_id = bool(raw_id & 0x80000000)
+            current = DbcMessage(raw_id & 0x1FFFFFFF, is_extended_id, name, int(dlc), sender)
+            db.messages[current.can_id] = current
+        elif line.startswith("BA_ "):
+            match = CYCLE_TIME_RE.match(line)
+            if match is not None:
+                cycle_times[int(match.group(1)) & 0x1FFFFFFF] = float(match.group(2))
+        elif line.startswith("BA_DEF_DEF_"):
+            match = CYCLE_TIME_DEFAULT_RE.match(line)
+            if match is not None:
+                default_cycle_time = float(match.group(1))
+    for msg in db.messages.values():
+        msg.cycle_time = cycle_times.get(msg.can_id) or default_cycle_time or None
+        msg.plan = PackPlan(msg.dlc, msg.signals)
+    return db
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_dbc(path, cache_dir=CACHE_DIR):
+    """Return the compiled database for path, from the cache when the file is unchanged."""
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"{file_digest(path)}-v{CACHE_VERSION}.pickle")
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = None
+        if data is not None:
+            # Unpickling allocates many small objects; skip the GC passes that would trigger.
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return pickle.loads(data)
+            except (pickle.UnpicklingError, EOFError, AttributeError, TypeError):
+                pass
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+    with open(path, "r", encoding="latin-1") as f:
+        db = parse_dbc(f)
+    if cache_path is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(db, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not cache compiled DBC: {e}")
+    return db
+
+# ---------- Parameter Configs ----------
+def format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def signal_to_config(msg, sig):
+    """Editor-style numeric config for sig, or None if it cannot be expressed as a parameter."""
+    if sig.multiplex is not None and sig.multiplex != "M":
+        return None
+    if sig.factor <= 0 or not 1 <= sig.length <= 64:
+        return None
+    byte_order = "intel" if sig.little_endian else "motorola"
+    minimum, maximum = sig.minimum, sig.maximum
+    if minimum == maximum == 0:
+        if sig.signed:
+            raw_min, raw_max = -(1 << (sig.length - 1)), (1 << (sig.length - 1)) - 1
+        else:
+            raw_min, raw_max = 0, (1 << sig.length) - 1
+        minimum = raw_min * sig.factor + sig.offset
+        maximum = raw_max * sig.factor + sig.offset
+    config = {"name": f"{msg.name}.{sig.name}", "can_id": msg.can_id, "size": f"{sig.length} bit",
+              "start_bit": sig.start_bit, "byte_order": byte_order,
+              "type": "Signed" if sig.signed else "Unsigned", "resolution": sig.factor,
+              "offset": sig.offset,
+              "min_value": format_number(minimum), "max_value": format_number(maximum),
+              "cycle_time": msg.cycle_time or DEFAULT_CYCLE_TIME, "mode": "numeric",
+              "initial_value": min(max(0.0, minimum), maximum)}
+    if engine.frame_mask(config).bit_length() > 8 * max(msg.dlc, 8):
+        return None  # does not fit the declared DLC
+    if msg.dlc > 8:
+        # Longer than classic CAN allows: an FD frame of the declared length.
+        config["fd"] = True
+        config["dlc"] = msg.dlc
+    return config
+
+def database_configs(db):
+    """Return (configs, skipped signal names) for every signal of db."""
+    configs = []
+    skipped = []
+    for msg, sig in db.signals():
+        config = signal_to_config(msg, sig)
+        if config is None:
+            skipped.append(f"{msg.name}.{sig.name}")
+        else:
+            configs.append(config)
+    return configs, skipped
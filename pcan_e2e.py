@@ -0,0 +1,89 @@
+"""
+Checksums for end-to-end protected frames.
+
+A "checksum" parameter carries "checksum": {"type": ..., ...} with
+  crc8_sae_j1850  CRC-8 SAE J1850 (poly 0x1D, init/xor 0xFF) over the other bytes
+  crc8h2f         CRC-8H2F (poly 0x2F, init/xor 0xFF) over the other bytes
+  e2e_p1          AUTOSAR E2E profile 1: SAE J1850 polynomial with init/xor 0x00
+                  over "data_id" (low byte, high byte) followed by the other bytes
+  e2e_p2          AUTOSAR E2E profile 2: CRC-8H2F over the bytes after the checksum
+                  byte followed by "data_ids"[counter], where counter is the low
+                  nibble of the byte after the checksum byte (16 data IDs)
+  xor             XOR of the other bytes
+  sum             sum of the other bytes modulo 256
+The checksum always fills one whole byte; "other bytes" are all bytes of the
+frame except that one, in frame order.
+
+The CRCs use 256-entry tables built once at import, so a checksum costs one
+table lookup per frame byte. make_checksum() binds a spec to its byte position
+and returns the function the engine calls on every finished frame.
+"""
+CHECKSUMS = ("crc8_sae_j1850", "crc8h2f", "e2e_p1", "e2e_p2", "xor", "sum")
+
+def crc8_table(poly):
+    """Lookup table of an MSB-first CRC-8 with polynomial poly."""
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+SAE_J1850_TABLE = crc8_table(0x1D)
+H2F_TABLE = crc8_table(0x2F)
+
+def crc8(data, table, crc=0xFF, xor_out=0xFF):
+    for byte in data:
+        crc = table[crc ^ byte]
+    return crc ^ xor_out
+
+def compile_spec(spec):
+    """Validate a checksum spec and return it normalized; raises ValueError."""
+    if not isinstance(spec, dict):
+        raise ValueError("checksum must be an object")
+    kind = spec.get("type")
+    if kind not in CHECKSUMS:
+        raise ValueError(f"checksum type must be one of {CHECKSUMS}")
+    result = {"type": kind}
+    if kind == "e2e_p1":
+        data_id = spec.get("data_id", 0)
+        if not isinstance(data_id, int) or not 0 <= data_id <= 0xFFFF:
+            raise ValueError("checksum data_id must be in 0..0xFFFF")
+        result["data_id"] = data_id
+    elif kind == "e2e_p2":
+        data_ids = spec.get("data_ids", [0] * 16)
+        if not isinstance(data_ids, list) or len(data_ids) != 16 \
+                or not all(isinstance(data_id, int) and 0 <= data_id <= 0xFF for data_id in data_ids):
+            raise ValueError("checksum data_ids must list 16 values in 0..255")
+        result["data_ids"] = list(data_ids)
+    return result
+
+def make_checksum(spec, index):
+    """Function of the frame data (bytes/bytearray) returning the checksum for byte index."""
+    kind = spec["type"]
+    if kind == "crc8_sae_j1850" or kind == "crc8h2f":
+        table = SAE_J1850_TABLE if kind == "crc8_sae_j1850" else H2F_TABLE
+        return lambda data: crc8(data[index + 1:], table, crc8(data[:index], table, 0xFF, 0x00))
+    if kind == "e2e_p1":
+        data_id = bytes((spec["data_id"] & 0xFF, spec["data_id"] >> 8))
+        def e2e_p1(data):
+            crc = crc8(data_id, SAE_J1850_TABLE, 0x00, 0x00)
+            crc = crc8(data[:index], SAE_J1850_TABLE, crc, 0x00)
+            return crc8(data[index + 1:], SAE_J1850_TABLE, crc, 0x00)
+        return e2e_p1
+    if kind == "e2e_p2":
+        data_ids = spec["data_ids"]
+        def e2e_p2(data):
+            counter = data[index + 1] & 0x0F if index + 1 < len(data) else 0
+            crc = crc8(data[index + 1:], H2F_TABLE, 0xFF, 0x00)
+            return crc8((data_ids[counter],), H2F_TABLE, crc, 0xFF)
+        return e2e_p2
+    if kind == "xor":
+        def xor(data):
+            result = 0
+            for byte in data:
+                result ^= byte
+            return result ^ data[index]
+        return xor
+    return lambda data: (sum(data) - data[index]) & 0xFF
@@ -0,0 +1,2159 @@
+"""
+Headless CAN transmission engine.
+
+Holds everything needed to send saved parameter sets without Tk: the buses
+(one Channel per bus, each with its own transmissions, scheduler thread and
+statistics), payload encoding and the parameter model. pcan_process can move
+the sending into a separate process (see remote).
+PCAN-Custom-software.py is one front end on top of it; the other is the
+command line:
+
+    python pcan_engine.py --config rig.json --duration 3600
+    python pcan_engine.py --config rig.json --backend virtual   # no hardware needed
+    python pcan_engine.py --replay drive.blf --replay-speed 2 --config rig.json  # see pcan_replay
+    python pcan_engine.py --config rig.json --control 5005   # remote control, see pcan_control
+
+The config file is a profile saved from the GUI (see save_profile) or
+hand-written JSON:
+    {"bus": {"interface": "pcan", "channel": "PCAN_USBBUS1", "bitrate": 500000,
+             "channels": {"PCAN_USBBUS2": {"bitrate": 250000}}},
+     "parameters": [{"name": ..., "can_id": "0x100", "size": "8 bit", ...,
+                     "initial_value": 0, "enabled": true, "channel": "PCAN_USBBUS2"}, ...]}
+Parameter entries use the same keys as the editor configs; "channel" is
+optional and defaults to the bus channel. Numeric parameters are placed by
+"mapping"/"target_byte" or, like DBC signals, by "start_bit" and "byte_order"
+("intel"/"motorola") with sizes up to "64 bit"; parameters sharing a frame
+must not write the same bits. "channels" holds per-channel
+overrides of the bus settings. For CAN FD add "fd": true and "data_bitrate"
+to the bus settings and "fd"/"brs"/"dlc" to the parameters. A numeric
+parameter with "generator" (see pcan_waveform) sends a precomputed waveform.
+Mode "counter" is a rolling counter stepped every frame ("wrap") and mode
+"checksum" a CRC/E2E byte over the finished frame ("checksum", see pcan_e2e).
+"tx_mode" and "min_gap_ms" select cyclic and/or on-change sending (TX_MODES).
+"""
+import argparse
+import bisect
+import collections
+import csv
+import functools
+import gc
+import heapq
+import json
+import math
+import numbers
+import os
+import signal
+import sys
+import threading
+import time
+
+import can
+
+# ---------- Bus Settings ----------
+# Every channel opens its bus with bus_config, its own channel name and any
+# overrides from channel_settings (e.g. {"PCAN_USBBUS2": {"bitrate": 250000}}).
+# Parameters without a "channel" in their config go to bus_config["channel"].
+bus_config = {"interface": "pcan", "channel": "PCAN_USBBUS1", "bitrate": 500000}
+channel_settings = {}
+# Ready-made bus_config values; "virtual" needs no hardware (python-can's in-process
+# bus) and "vcan" is a Linux virtual SocketCAN device
+# (ip link add dev vcan0 type vcan && ip link set up vcan0).
+BUS_PRESETS = {
+    "pcan": {"interface": "pcan", "channel": "PCAN_USBBUS1", "bitrate": 500000},
+    "virtual": {"interface": "virtual", "channel": "pcan-custom", "bitrate": 500000},
+    "vcan": {"interface": "socketcan", "channel": "vcan0", "bitrate": 500000},
+}
+BITRATES = [125000, 250000, 500000, 1000000]
+DATA_BITRATES = [1000000, 2000000, 4000000, 5000000, 8000000]
+# Called with the bus object right before it is closed (e.g. to stop a can.Notifier on it).
+bus_closing_handlers = []
+# Front ends may set this to surface bus errors to the user (e.g. a messagebox).
+bus_error_handler = None
+# Optional pcan_trace.TraceLogger; frames sent by Channel.transmit are queued to it.
+tracer = None
+# pcan_process.EngineProcess while sending runs in a separate process. The
+# parameter model, transmissions and load checks stay here; channels then
+# neither schedule nor send, and every change is pushed to that process.
+remote = None
+
+def remote_changed():
+    """Push parameter, timing and bus setting changes to the transmit process, if any."""
+    if remote is not None:
+        remote.push()
+
+# ---------- CAN FD ----------
+# A parameter config with "fd": True is sent in CAN FD frames of "dlc" bytes
+# (default: the smallest FD length that holds its mapped bytes), with bit-rate
+# switching if "brs" is set. Classic frames are always 8 bytes.
+FD_LENGTHS = [0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64]
+FD_MAX_LENGTH = 64
+# Bus settings used for FD on top of bus_config: "fd": True, "data_bitrate" and,
+# for interfaces configured through a can.BitTimingFd, the controller clock and
+# sample points. SocketCAN takes its data bit rate from `ip link` instead.
+FD_TIMING_INTERFACES = {"pcan", "kvaser", "vector", "ixxat"}
+FD_SETTING_KEYS = ("data_bitrate", "f_clock", "sample_point", "data_sample_point")
+
+def fd_length(n):
+    """Smallest valid CAN FD data length >= n."""
+    for length in FD_LENGTHS:
+        if length >= n:
+            return length
+    raise ValueError(f"{n} bytes do not fit a CAN FD frame")
+
+def payload_length(config):
+    """Bytes in the frame of config: 8 for classic CAN, the FD length otherwise."""
+    if not config.get("fd"):
+        return 8
+    needed = (frame_mask(config).bit_length() + 7) // 8
+    return fd_length(max(needed, int(config.get("dlc") or 0)))
+
+# ---------- Signal Layout ----------
+# Payloads are handled as one integer per frame: frame bit n is bit n % 8 of
+# data byte n // 8 (the DBC bit numbering), i.e. int.from_bytes(data, "little").
+# Every numeric layout compiles to pieces (value_shift, mask, frame_shift), each
+# moving a run of raw value bits to a run of frame bits:
+#   "start_bit" configs   any start bit, "length" 1..64 as "size": "N bit",
+#                         "byte_order" "intel" (start bit = LSB) or
+#                         "motorola" (start bit = MSB, DBC sawtooth numbering)
+#   "N bit" + target_byte value bits placed by mapping (bit positions, MSB first)
+#   "N byte"              value bytes placed by mapping (byte positions, LSB first)
+BYTE_ORDERS = ("intel", "motorola")
+MAX_SIGNAL_BITS = 64
+
+def signal_pieces(start_bit, length, byte_order="intel"):
+    if byte_order == "intel":
+        return [(0, (1 << length) - 1, start_bit)]
+    # Motorola: walk from the MSB down through each byte's bits, then on to bit 7 of the next byte.
+    pieces = []
+    byte, bit = divmod(start_bit, 8)
+    remaining = length
+    while remaining > 0:
+        width = min(bit + 1, remaining)
+        remaining -= width
+        pieces.append((remaining, (1 << width) - 1, byte * 8 + bit - width + 1))
+        byte += 1
+        bit = 7
+    return pieces
+
+def layout_pieces(config):
+    """(pieces, raw value bits) of a numeric config."""
+    count, unit = config["size"].split()
+    count = int(count)
+    if "start_bit" in config:
+        return signal_pieces(int(config["start_bit"]), count, config.get("byte_order", "intel")), count
+    mapping = [int(pos) for pos in config["mapping"]]
+    if unit == "bit":
+        base = int(config["target_byte"]) * 8
+        return [(count - 1 - i, 1, base + pos) for i, pos in enumerate(mapping)], count
+    return [(8 * i, 0xFF, 8 * pos) for i, pos in enumerate(mapping)], 8 * count
+
+def frame_mask(config):
+    """Integer with every frame bit config writes set (its occupancy in the frame)."""
+    if config.get("mode") == "ascii":
+        return sum(0xFF << (8 * int(pos)) for pos in set(config["mapping"]))
+    pieces, _ = layout_pieces(config)
+    mask = 0
+    for _, piece_mask, frame_shift in pieces:
+        mask |= piece_mask << frame_shift
+    return mask
+
+class SignalLayout:
+    """
+    Compiled layout of a numeric config: pack() turns a raw value into its bits
+    of the frame integer and unpack() reads it back, both with shifts and masks.
+    Raw values outside the signal's range are saturated.
+    """
+    __slots__ = ("pieces", "bits", "signed", "minimum", "maximum", "mask", "needed_bytes")
+    def __init__(self, config):
+        self.pieces, self.bits = layout_pieces(config)
+        self.signed = config.get("type") == "Signed"
+        if self.signed:
+            self.minimum, self.maximum = -(1 << (self.bits - 1)), (1 << (self.bits - 1)) - 1
+        else:
+            self.minimum, self.maximum = 0, (1 << self.bits) - 1
+        self.mask = frame_mask(config)
+        self.needed_bytes = (self.mask.bit_length() + 7) // 8
+    def pack(self, raw):
+        raw = min(max(raw, self.minimum), self.maximum) & ((1 << self.bits) - 1)
+        pieces = self.pieces
+        if len(pieces) == 1:
+            value_shift, mask, frame_shift = pieces[0]
+            return ((raw >> value_shift) & mask) << frame_shift
+        frame = 0
+        for value_shift, mask, frame_shift in pieces:
+            frame |= ((raw >> value_shift) & mask) << frame_shift
+        return frame
+    def unpack(self, frame):
+        raw = 0
+        for value_shift, mask, frame_shift in self.pieces:
+            raw |= ((frame >> frame_shift) & mask) << value_shift
+        if self.signed and raw > self.maximum:
+            raw -= 1 << self.bits
+        return raw
+
+def bus_kwargs(settings):
+    """can.interface.Bus() arguments for settings, with a BitTimingFd for FD-capable interfaces."""
+    kwargs = {key: value for key, value in settings.items() if key not in FD_SETTING_KEYS}
+    if settings.get("fd") and settings.get("data_bitrate") and "timing" not in kwargs \
+            and settings.get("interface") in FD_TIMING_INTERFACES:
+        kwargs["timing"] = can.BitTimingFd.from_sample_point(
+            f_clock=int(settings.get("f_clock", 80000000)),
+            nom_bitrate=int(settings.get("bitrate", 500000)),
+            nom_sample_point=float(settings.get("sample_point", 80.0)),
+            data_bitrate=int(settings["data_bitrate"]),
+            data_sample_point=float(settings.get("data_sample_point", 80.0)))
+        kwargs.pop("bitrate", None)
+    return kwargs
+
+# Each channel's transmissions dict maps CAN IDs to:
+#   {"cycle_time": cycle time (ms),
+#    "params": [list of parameter functions],
+#    "version": bumped whenever a member's payload or the member list changes,
+#    "frame": (version, merged bytes) cache of the last built frame,
+#    "length", "fd", "brs": frame format, see update_frame_format,
+#    "generators": members with a waveform generator, stepped once per frame,
+#    "counters": rolling counter members, stepped once per frame,
+#    "checksums": checksum members, filled in over the merged frame,
+#    "tx_mode", "min_gap_ms": when frames are sent, see TX_MODES}
+# Entries are driven by the channel's scheduler, which runs on its own thread, so
+# parameter functions must only return cached data (no Tk calls).
+def new_transmission(cycle_time_ms, param_func, tx_mode="cyclic", min_gap_ms=0.0):
+    return {"cycle_time": cycle_time_ms, "params": [param_func], "version": 0, "frame": None,
+            "length": 8, "fd": False, "brs": False, "generators": [], "counters": [], "checksums": [],
+            "tx_mode": tx_mode, "min_gap_ms": min_gap_ms}
+
+# Transmit modes of a CAN ID, shared by all its members like the cycle time:
+#   cyclic            every cycle_time (default)
+#   on_change         once when enabled, then whenever a member's value changes
+#   cyclic_on_change  every cycle_time and additionally on every change
+# On-change frames are rate-limited to one per min_gap_ms after the ID's
+# previous frame; a pending frame always carries the latest values.
+TX_MODES = ("cyclic", "on_change", "cyclic_on_change")
+
+def tx_timing(config):
+    """(cycle_time, tx_mode, min_gap_ms) of a parameter config."""
+    return (float(config.get("cycle_time", 1000)), config.get("tx_mode", "cyclic"),
+            float(config.get("min_gap_ms", 0)))
+
+def apply_tx_timing(config, entry):
+    """Copy the timing of a transmissions entry into a member's config."""
+    config["cycle_time"] = entry["cycle_time"]
+    for key, default in (("tx_mode", "cyclic"), ("min_gap_ms", 0.0)):
+        if entry[key] != default:
+            config[key] = entry[key]
+        else:
+            config.pop(key, None)
+
+def update_frame_format(entry):
+    """
+    Size the frame of entry for its members (FD if any member is FD, long
+    enough for all of them), prepare the generators of its members for the
+    entry's cycle time and collect its counters and checksums.
+    """
+    length = 8
+    fd = brs = False
+    generators = []
+    counters = []
+    checksums = []
+    for func in entry["params"]:
+        param = getattr(func, "__self__", None)
+        if getattr(param, "generator", None) is not None:
+            param.prepare_generator(entry["cycle_time"])
+            generators.append(param)
+        elif isinstance(param, CounterParameter):
+            counters.append(param)
+        elif isinstance(param, ChecksumParameter):
+            checksums.append(param)
+        config = getattr(param, "config", None)
+        if config is None or not config.get("fd"):
+            continue
+        if not fd:
+            fd = True
+            length = 0
+        brs = brs or bool(config.get("brs"))
+        length = max(length, payload_length(config))
+    entry["length"] = length
+    entry["fd"] = fd
+    entry["brs"] = brs
+    entry["generators"] = generators
+    entry["counters"] = counters
+    entry["checksums"] = checksums
+    entry["version"] += 1
+
+def step_members(entry):
+    """Move every generated member of entry to its next precomputed sample and every counter on by one."""
+    for param in entry["generators"]:
+        param.payload, param.value = param.generator.advance()
+    for param in entry["counters"]:
+        param.advance()
+    entry["version"] += 1
+
+def build_payload(entry):
+    """Merge every member's payload integer in one pass and return the frame bytes."""
+    length = entry["length"]
+    merged = 0
+    for func in list(entry["params"]):
+        merged |= func()  # each function returns its cached payload integer
+    return (merged & ((1 << (8 * length)) - 1)).to_bytes(length, "little")
+
+def get_frame(entry):
+    """Return the merged frame of entry as bytes, re-merging only after a member changed."""
+    version = entry["version"]
+    cached = entry["frame"]
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    frame = build_payload(entry)
+    if entry["checksums"]:
+        frame = apply_checksums(entry["checksums"], frame)
+    entry["frame"] = (version, frame)
+    return frame
+
+def apply_checksums(checksums, frame):
+    """Write each checksum member's byte over the finished frame, in member order."""
+    data = bytearray(frame)
+    for param in checksums:
+        param.value = data[param.byte] = param.compute(data)
+    return bytes(data)
+
+
+# ---------- Transmit Statistics ----------
+# Durations are binned into a fixed log-linear histogram of microseconds: exact
+# below 32 us, then 16 bins per power of two (~3-6% wide), up to ~67 s. The bins
+# are preallocated per CAN ID, so recording a frame is a few integer updates.
+HIST_SUB_BITS = 4
+HIST_BINS = 23 << HIST_SUB_BITS  # (26 - HIST_SUB_BITS + 1) octaves above the exact range
+
+def histogram_bin(seconds):
+    us = int(seconds * 1e6)
+    if us < 2 << HIST_SUB_BITS:
+        return max(us, 0)
+    shift = us.bit_length() - HIST_SUB_BITS - 1
+    return min((shift << HIST_SUB_BITS) + (us >> shift), HIST_BINS - 1)
+
+def histogram_bin_upper(index):
+    """Upper edge of bin index in seconds."""
+    sub = 1 << HIST_SUB_BITS
+    if index < 2 * sub:
+        return (index + 1) / 1e6
+    shift = index // sub - 1
+    return ((index % sub + sub + 1) << shift) / 1e6
+
+def histogram_percentile(hist, count, fraction):
+    """Upper edge (seconds) of the bin holding the given fraction of count samples."""
+    if count == 0:
+        return None
+    target = fraction * count
+    seen = 0
+    for index, n in enumerate(hist):
+        seen += n
+        if seen >= target:
+            return histogram_bin_upper(index)
+    return histogram_bin_upper(HIST_BINS - 1)
+
+class TransmitStats:
+    """Counters for one CAN ID, updated by Channel.transmit on the channel's sending thread."""
+    __slots__ = ("sent", "errors", "last_send", "dlc", "is_extended_id", "fd", "brs",
+                 "period_count", "period_sum", "period_min", "period_max", "period_hist",
+                 "latency_sum", "latency_max", "latency_hist", "encode_sum", "encode_max")
+    def __init__(self, can_id):
+        self.dlc = 8
+        self.is_extended_id = can_id > 0x7FF
+        self.fd = False
+        self.brs = False
+        self.period_hist = [0] * HIST_BINS
+        self.latency_hist = [0] * HIST_BINS
+        self.reset()
+    def reset(self):
+        self.sent = 0
+        self.errors = 0
+        self.last_send = None
+        self.period_count = 0
+        self.period_sum = 0.0
+        self.period_min = float("inf")
+        self.period_max = 0.0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.encode_sum = 0.0
+        self.encode_max = 0.0
+        hist = self.period_hist
+        for i in range(HIST_BINS):
+            hist[i] = 0
+        hist = self.latency_hist
+        for i in range(HIST_BINS):
+            hist[i] = 0
+    def record(self, start, encoded, sent, ok):
+        """start/encoded/sent are perf_counter() readings around get_frame() and bus.send()."""
+        encode = encoded - start
+        self.encode_sum += encode
+        if encode > self.encode_max:
+            self.encode_max = encode
+        if not ok:
+            self.errors += 1
+            return
+        self.sent += 1
+        latency = sent - encoded
+        self.latency_sum += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+        self.latency_hist[histogram_bin(latency)] += 1
+        last = self.last_send
+        self.last_send = encoded
+        if last is not None:
+            period = encoded - last
+            self.period_count += 1
+            self.period_sum += period
+            if period < self.period_min:
+                self.period_min = period
+            if period > self.period_max:
+                self.period_max = period
+            self.period_hist[histogram_bin(period)] += 1
+    def snapshot(self):
+        """Plain dict of the current figures, durations in ms (latency/encode in us)."""
+        attempts = self.sent + self.errors
+        n = self.period_count
+        p99 = histogram_percentile(self.period_hist, n, 0.99)
+        latency_p99 = histogram_percentile(self.latency_hist, self.sent, 0.99)
+        return {"sent": self.sent,
+                "errors": self.errors,
+                "period_mean_ms": self.period_sum / n * 1000.0 if n else None,
+                "period_min_ms": self.period_min * 1000.0 if n else None,
+                "period_max_ms": self.period_max * 1000.0 if n else None,
+                "period_p99_ms": p99 * 1000.0 if p99 is not None else None,
+                "send_latency_mean_us": self.latency_sum / self.sent * 1e6 if self.sent else None,
+                "send_latency_p99_us": latency_p99 * 1e6 if latency_p99 is not None else None,
+                "send_latency_max_us": self.latency_max * 1e6 if self.sent else None,
+                "encode_mean_us": self.encode_sum / attempts * 1e6 if attempts else None,
+                "encode_max_us": self.encode_max * 1e6 if attempts else None}
+
+def frame_bits(dlc, is_extended_id):
+    """Bits on the wire of a classic CAN data frame including worst-case stuffing and IFS."""
+    if is_extended_id:
+        return 8 * dlc + 67 + (54 + 8 * dlc - 1) // 4
+    return 8 * dlc + 47 + (34 + 8 * dlc - 1) // 4
+
+def frame_time(dlc, is_extended_id, bitrate, fd=False, brs=False, data_bitrate=None):
+    """
+    Seconds a data frame occupies the bus (worst-case stuffing). For CAN FD
+    with bit-rate switching the data phase (ESI to CRC delimiter) runs at
+    data_bitrate, the arbitration and ACK/EOF/IFS bits at bitrate.
+    """
+    if not fd:
+        return frame_bits(dlc, is_extended_id) / bitrate
+    header = 33 if is_extended_id else 15        # SOF .. BRS
+    header += (header - 1) // 4                  # dynamic stuffing
+    tail = 2 + 7 + 3                             # ACK, ACK delimiter, EOF, IFS
+    crc = 17 if dlc <= 16 else 21
+    data = 1 + 4 + 8 * dlc                       # ESI, DLC, data
+    data += data // 4 + 4 + crc + (4 + crc) // 4 + 1  # stuffing, stuff count, CRC, fixed stuff bits, delimiter
+    data_rate = data_bitrate if brs and data_bitrate else bitrate
+    return (header + tail) / bitrate + data / data_rate
+
+# ---------- Bus Load Budget ----------
+# Before parameters are enabled, the worst-case load their channel would have
+# is computed from the configured timing: every cyclic ID once per cycle time,
+# every on-change ID once per min_gap_ms (unbounded gaps are not counted), each
+# frame at its worst-case stuffed length. Above bus_load_budget percent the
+# enable is refused with BusLoadError if bus_load_refuse is set; otherwise it
+# goes ahead and the warning is passed to bus_load_handler (or printed).
+bus_load_budget = 70.0
+bus_load_refuse = False
+bus_load_handler = None
+
+class BusLoadError(ValueError):
+    """Enabling would push a channel's planned load past bus_load_budget."""
+
+def frame_rate(cycle_time_ms, tx_mode="cyclic", min_gap_ms=0.0):
+    """Worst-case frames per second of an ID with this timing."""
+    rate = 0.0
+    if tx_mode != "on_change" and cycle_time_ms > 0:
+        rate += 1000.0 / cycle_time_ms
+    if tx_mode != "cyclic" and min_gap_ms > 0:
+        rate += 1000.0 / min_gap_ms
+    return rate
+
+
+# ---------- Transmit Scheduler ----------
+phase_offsets = True    # spread cyclic IDs over their period (see TransmitScheduler)
+PHASE_MAX_REPEATS = 64  # send times considered per faster ID when choosing a phase
+
+class TransmitScheduler:
+    """
+    Sends every transmission of one channel from a dedicated thread.
+    Deadlines are kept in a heap on the monotonic clock and each next deadline is
+    computed from the previous deadline (not from the send time), so the period
+    does not drift with encode/send work or with front-end (Tk) latency.
+    On-change frames (see TX_MODES) are one-shot heap entries queued by
+    trigger(): at most one is pending per ID and it is sent no earlier than
+    min_gap_ms after the ID's previous frame, carrying the latest data.
+    With phase_offsets set, every cyclic ID gets a fixed phase within its
+    period (relative to `epoch`), placed in the middle of the largest gap
+    between the send times of the IDs already scheduled, so IDs sharing a
+    cycle time are spread over the period instead of all firing together.
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self.cond = threading.Condition()
+        self.heap = []          # (deadline, generation, can_id, cyclic)
+        self.generation = {}    # can_id -> current generation; stale heap entries are skipped
+        self.pending = {}       # can_id -> generation of its queued on-change frame
+        self.last_sent = {}     # can_id -> monotonic time of its last frame
+        self.epoch = time.monotonic()
+        self.phases = {}        # can_id -> (cycle s, phase s) of cyclic IDs
+        self.phase_lists = {}   # cycle s -> sorted phases of the IDs with that cycle
+        self.timing = {}        # can_id -> measured period/jitter accumulators
+        self.thread = None
+        self.running = False
+    def start(self):
+        if self.thread is not None:
+            return
+        if sys.platform == "win32":
+            # Raise the Windows timer resolution so waits are ~1 ms instead of ~15.6 ms.
+            try:
+                import ctypes
+                ctypes.windll.winmm.timeBeginPeriod(1)
+            except Exception:
+                pass
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"TransmitScheduler-{self.channel.name}", daemon=True)
+        self.thread.start()
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.heap.clear()
+            self.phases.clear()
+            self.phase_lists.clear()
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        if sys.platform == "win32":
+            try:
+                import ctypes
+                ctypes.windll.winmm.timeEndPeriod(1)
+            except Exception:
+                pass
+    def schedule(self, can_id):
+        """
+        (Re)start can_id and its deadline chain. With phase_offsets a cyclic
+        ID gets a phase (choose_phase) and its first frame waits for the next
+        epoch + phase + k * cycle, at most one cycle; otherwise the first
+        frame is sent immediately. An on-change ID sends one frame now and
+        then only when triggered.
+        """
+        self.start()
+        entry = self.channel.transmissions.get(can_id)
+        cyclic = entry is None or entry["tx_mode"] != "on_change"
+        with self.cond:
+            gen = self.generation.get(can_id, 0) + 1
+            self.generation[can_id] = gen
+            self.timing[can_id] = {"count": 0, "last": None, "period_sum": 0.0, "period_sq_sum": 0.0,
+                                   "period_min": None, "period_max": None, "max_jitter": 0.0, "overruns": 0}
+            self.drop_phase(can_id)
+            now = time.monotonic()
+            first = now
+            if not cyclic:
+                self.pending[can_id] = gen
+            elif phase_offsets and entry is not None and entry["cycle_time"] > 0:
+                cycle_s = entry["cycle_time"] / 1000.0
+                phase = self.choose_phase(cycle_s)
+                self.phases[can_id] = (cycle_s, phase)
+                bisect.insort(self.phase_lists.setdefault(cycle_s, []), phase)
+                first = self.epoch + phase + math.ceil((now - self.epoch - phase) / cycle_s) * cycle_s
+            heapq.heappush(self.heap, (first, gen, can_id, cyclic))
+            self.cond.notify()
+    def choose_phase(self, cycle_s):
+        """Phase in [0, cycle_s) farthest from the send times of the other cyclic IDs (call with cond held)."""
+        lists = self.phase_lists
+        if len(lists) == 1 and cycle_s in lists:
+            occupied = lists[cycle_s]  # the common case: already sorted
+        else:
+            occupied = []
+            for other_cycle, phases in lists.items():
+                repeats = min(max(int(cycle_s / other_cycle), 1), PHASE_MAX_REPEATS)
+                for k in range(repeats):
+                    occupied.extend([(phase + k * other_cycle) % cycle_s for phase in phases])
+            occupied.sort()
+        if not occupied:
+            return 0.0
+        gaps = [after - before for before, after in zip(occupied, occupied[1:])]
+        wrap = occupied[0] + cycle_s - occupied[-1]
+        if not gaps or wrap >= max(gaps):
+            return (occupied[-1] + wrap / 2) % cycle_s
+        i = gaps.index(max(gaps))
+        return occupied[i] + gaps[i] / 2
+    def drop_phase(self, can_id):
+        cycle_phase = self.phases.pop(can_id, None)
+        if cycle_phase is not None:
+            phases = self.phase_lists[cycle_phase[0]]
+            phases.remove(cycle_phase[1])
+            if not phases:
+                del self.phase_lists[cycle_phase[0]]
+    def trigger(self, can_id, min_gap_ms=0):
+        """Queue an on-change frame of a scheduled can_id unless one is already pending."""
+        with self.cond:
+            gen = self.generation.get(can_id)
+            if gen is None or can_id not in self.timing or self.pending.get(can_id) == gen:
+                return
+            self.pending[can_id] = gen
+            deadline = max(time.monotonic(), self.last_sent.get(can_id, 0.0) + min_gap_ms / 1000.0)
+            heapq.heappush(self.heap, (deadline, gen, can_id, False))
+            self.cond.notify()
+    def cancel(self, can_id):
+        with self.cond:
+            self.generation[can_id] = self.generation.get(can_id, 0) + 1
+            self.timing.pop(can_id, None)
+            self.pending.pop(can_id, None)
+            self.drop_phase(can_id)
+    def run(self):
+        while True:
+            with self.cond:
+                while self.running:
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    remaining = self.heap[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if not self.running:
+                    return
+                deadline, gen, can_id, cyclic = heapq.heappop(self.heap)
+                entry = self.channel.transmissions.get(can_id)
+                if self.generation.get(can_id) != gen or entry is None:
+                    continue
+                now = time.monotonic()
+                self.last_sent[can_id] = now
+                if cyclic:
+                    cycle_s = entry["cycle_time"] / 1000.0
+                    next_deadline = deadline + cycle_s
+                    if cycle_s > 0 and next_deadline <= now:
+                        # Fell behind by more than one period: skip the missed slots instead of bursting.
+                        missed = int((now - next_deadline) / cycle_s) + 1
+                        next_deadline += missed * cycle_s
+                        self.timing[can_id]["overruns"] += missed
+                    heapq.heappush(self.heap, (next_deadline, gen, can_id, True))
+                    self.record(can_id, now, cycle_s)
+                else:
+                    self.pending.pop(can_id, None)
+            self.channel.transmit(can_id)
+    def record(self, can_id, now, cycle_s):
+        t = self.timing[can_id]
+        if t["last"] is not None:
+            period = now - t["last"]
+            t["count"] += 1
+            t["period_sum"] += period
+            t["period_sq_sum"] += period * period
+            t["period_min"] = period if t["period_min"] is None else min(t["period_min"], period)
+            t["period_max"] = period if t["period_max"] is None else max(t["period_max"], period)
+            t["max_jitter"] = max(t["max_jitter"], abs(period - cycle_s))
+        t["last"] = now
+    def timing_stats(self):
+        """Return {can_id: {...}} with measured period and jitter in ms for every scheduled ID."""
+        stats = {}
+        with self.cond:
+            for can_id, t in self.timing.items():
+                n = t["count"]
+                if n == 0:
+                    continue
+                mean = t["period_sum"] / n
+                variance = max(t["period_sq_sum"] / n - mean * mean, 0.0)
+                stats[can_id] = {"samples": n,
+                                 "period_mean_ms": mean * 1000.0,
+                                 "period_min_ms": t["period_min"] * 1000.0,
+                                 "period_max_ms": t["period_max"] * 1000.0,
+                                 "jitter_std_ms": variance ** 0.5 * 1000.0,
+                                 "jitter_max_ms": t["max_jitter"] * 1000.0,
+                                 "overruns": t["overruns"]}
+        return stats
+
+# ---------- Channels ----------
+# When use_periodic_tasks is set and the bus implements cyclic sending natively
+# (e.g. socketcan BCM), each CAN ID is registered once with bus.send_periodic()
+# and value changes only push new data through modify_data(). Interfaces that
+# would fall back to python-can's thread-based emulation keep using the scheduler.
+use_periodic_tasks = True
+
+def bus_has_native_periodic(bus):
+    return type(bus)._send_periodic_internal is not can.BusABC._send_periodic_internal
+
+# ---------- Connection ----------
+# Buses are opened on a background connector thread, so enabling a parameter
+# never waits for the driver. Channel.state is one of
+#   closed        never opened, or closed by configure_bus()/shutdown()
+#   connecting    first open in progress
+#   connected     bus open, frames are being sent
+#   reconnecting  the bus was lost (bus-off, adapter unplugged) or could not be
+#                 opened; retried with exponential backoff while the channel
+#                 has transmissions
+#   failed        could not be opened and nothing is waiting to send on it
+# A blocking get_bus() (command line, receive monitor) waits up to
+# BUS_OPEN_TIMEOUT for the open; front ends set wait_for_bus = False so that
+# enabling never waits at all.
+BUS_OPEN_TIMEOUT = 5.0          # s
+RECONNECT_MIN_DELAY = 0.5       # s, doubled after every failed attempt
+RECONNECT_MAX_DELAY = 10.0      # s
+RECONNECT_AFTER_ERRORS = 20     # consecutive send errors that count as a lost bus
+wait_for_bus = True
+# Called with (channel, bus) after a bus was opened, also after a reconnect.
+bus_opened_handlers = []
+
+# The scheduler sends with timeout=0. A frame the adapter does not take at once
+# (full transmit buffer, hiccup) goes into the channel's bounded SendQueue
+# instead, and so does everything after it until a sender thread has drained
+# the queue with blocking sends, so a stalled adapter holds up neither the
+# scheduler nor a front end and at most send_queue_limit frames wait.
+SEND_QUEUE_POLICIES = ("latest", "drop_oldest")
+send_queue_policy = "latest"
+send_queue_limit = 256
+SEND_TIMEOUT = 0.5  # s, per queued frame
+
+class SendQueue:
+    """
+    Bounded hand-over of (can_id, message, start, encoded) items to the sender
+    thread. With policy "latest" at most one frame per CAN ID is queued: a new
+    frame replaces a queued one of its ID in place (it would only be stale), and
+    when the queue is full a new ID evicts the oldest frame. "drop_oldest" keeps
+    every frame and evicts the oldest when full. Replaced and evicted frames are
+    counted in `dropped`.
+    """
+    def __init__(self, policy, limit):
+        self.cond = threading.Condition()
+        self.policy = policy
+        self.limit = limit
+        self.items = collections.OrderedDict() if policy == "latest" else collections.deque()
+        self.dropped = 0
+        self.closed = False
+        self.busy = False  # the sender is working on a batch
+    def idle(self):
+        return not self.items and not self.busy
+    def put(self, can_id, item):
+        with self.cond:
+            items = self.items
+            was_empty = not items
+            if self.policy == "latest":
+                if can_id in items:
+                    items[can_id] = item
+                    self.dropped += 1
+                    return
+                if len(items) >= self.limit:
+                    items.popitem(last=False)
+                    self.dropped += 1
+                items[can_id] = item
+            else:
+                if len(items) >= self.limit:
+                    items.popleft()
+                    self.dropped += 1
+                items.append(item)
+            if was_empty:
+                self.cond.notify()
+    def take(self):
+        """Every queued item in order, waiting while the queue is empty; None once closed."""
+        with self.cond:
+            self.busy = False
+            while not self.items and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                return None
+            self.busy = True
+            items = self.items
+            batch = list(items.values()) if self.policy == "latest" else list(items)
+            items.clear()
+            return batch
+    def clear(self):
+        with self.cond:
+            self.items.clear()
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.busy = False
+            self.items.clear()
+            self.cond.notify_all()
+
+def set_send_queue(policy=None, limit=None):
+    """Change the send queue policy and/or limit of new and existing channels."""
+    global send_queue_policy, send_queue_limit
+    if policy is not None:
+        if policy not in SEND_QUEUE_POLICIES:
+            raise ValueError(f"send queue policy must be one of {SEND_QUEUE_POLICIES}")
+        send_queue_policy = policy
+    if limit is not None:
+        send_queue_limit = max(1, int(limit))
+    for channel in list(channels.values()):
+        queue = channel.queue
+        with queue.cond:
+            if queue.policy != send_queue_policy:
+                pending = list(queue.items.values()) if queue.policy == "latest" else list(queue.items)
+                queue.policy = send_queue_policy
+                queue.items = collections.OrderedDict() if queue.policy == "latest" else collections.deque()
+                for item in pending[-send_queue_limit:]:
+                    if queue.policy == "latest":
+                        queue.items[item[0]] = item
+                    else:
+                        queue.items.append(item)
+            queue.limit = send_queue_limit
+
+def bus_off(bus):
+    """True if the interface reports bus-off/error state (not every interface can tell)."""
+    try:
+        return bus.state == can.BusState.ERROR
+    except Exception:
+        return False
+
+class Channel:
+    """
+    One CAN bus and everything that sends on it: its transmissions (CAN ID ->
+    entry, see new_transmission), a TransmitScheduler whose thread also does the
+    sending, a SendQueue and sender thread for frames the bus could not take at
+    once, native periodic tasks and per-ID statistics. Channels share nothing, so a slow or
+    error-passive bus only ever holds up its own frames.
+    """
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index  # 1-based, used as the channel number in traces
+        self.bus = None
+        self.transmissions = {}
+        self.scheduler = TransmitScheduler(self)
+        self.periodic_tasks = {}  # can_id -> python-can cyclic send task
+        self.stats = {}           # can_id -> TransmitStats, kept until reset_stats()
+        self.state = "closed"     # see Connection
+        self.last_error = None
+        self.lock = threading.Lock()
+        self.connector = None     # thread opening the bus
+        self.opened = threading.Event()  # set when an open attempt has finished
+        self.wake = threading.Event()    # cuts a backoff wait short on close()
+        self.queue = SendQueue(send_queue_policy, send_queue_limit)
+        self.sender = None
+        self.error_run = 0        # consecutive send errors
+        self.frame_lock = threading.Lock()  # held while a frame is built, so set_values() batches stay whole
+    def settings(self):
+        settings = dict(bus_config)
+        settings.update(channel_settings.get(self.name, {}))
+        settings["channel"] = self.name
+        return settings
+    def bitrate(self):
+        return self.settings().get("bitrate") or 500000
+    def data_bitrate(self):
+        return self.settings().get("data_bitrate")
+    def get_bus(self, timeout=BUS_OPEN_TIMEOUT):
+        """The open bus, opening it if needed and waiting up to timeout (s); None if it is not available."""
+        if self.bus is None:
+            self.connect()
+            if not self.opened.wait(timeout):
+                print(f"CAN bus {self.name} is still connecting after {timeout:g} s.")
+                return None
+            if self.bus is None and bus_error_handler is not None:
+                bus_error_handler(f"Failed to initialize CAN bus {self.name}: {self.last_error}")
+        return self.bus
+    def connect(self):
+        """Start opening the bus in the background unless it is open or already being opened."""
+        with self.lock:
+            if self.bus is not None or self.connector is not None:
+                return
+            if self.state != "reconnecting":
+                self.state = "connecting"
+            self.opened.clear()
+            self.wake.clear()
+            self.connector = threading.Thread(target=self.run_connector, name=f"Connector-{self.name}", daemon=True)
+            self.connector.start()
+    def run_connector(self):
+        """Open the bus, retrying with backoff while transmissions wait for it (connector thread)."""
+        me = threading.current_thread()
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            self.opened.clear()
+            bus = error = None
+            try:
+                bus = can.interface.Bus(**bus_kwargs(self.settings()))
+            except Exception as e:
+                error = e
+            with self.lock:
+                if self.connector is not me:  # closed meanwhile
+                    if bus is not None:
+                        bus.shutdown()
+                    return
+                if bus is not None:
+                    reconnected = self.state == "reconnecting"
+                    self.bus = bus
+                    self.state = "connected"
+                    self.last_error = None
+                    self.error_run = 0
+                    self.connector = None
+                    break
+                retry = bool(self.transmissions)
+                if self.last_error != str(error) or self.state == "connecting":
+                    print(f"Failed to initialize CAN bus {self.name}: {error}"
+                          + (f" (retrying every {RECONNECT_MAX_DELAY:g} s at most)" if retry else ""))
+                self.last_error = str(error)
+                self.state = "reconnecting" if retry else "failed"
+                if not retry:
+                    self.connector = None
+            self.opened.set()
+            if not retry or self.wake.wait(delay):
+                with self.lock:
+                    if self.connector is me:
+                        self.connector = None
+                return
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        self.start_sender()
+        print(f"CAN bus {self.name} {'reconnected' if reconnected else 'connected'}.")
+        for handler in list(bus_opened_handlers):
+            handler(self, bus)
+        self.opened.set()  # after the handlers, so a waiting get_bus() sees what they started
+        if use_periodic_tasks and bus_has_native_periodic(bus):
+            for can_id in list(self.transmissions.keys()):
+                self.start_transmission(can_id)  # move them from the scheduler to periodic tasks
+    def start_sender(self):
+        if self.sender is None:
+            self.queue.closed = False
+            self.sender = threading.Thread(target=self.run_sender, name=f"Sender-{self.name}", daemon=True)
+            self.sender.start()
+    def stop_sender(self):
+        if self.sender is not None:
+            self.queue.close()
+            self.sender.join(timeout=1.0)
+            self.sender = None
+    def run_sender(self):
+        """Send queued frames until the queue is closed (sender thread)."""
+        queue = self.queue
+        while True:
+            batch = queue.take()
+            if batch is None:
+                return
+            for can_id, message, start, encoded in batch:
+                bus = self.bus
+                if bus is None:
+                    break  # lost; the rest of the batch is stale
+                try:
+                    bus.send(message, SEND_TIMEOUT)
+                except can.CanError as e:
+                    if not self.send_failed(bus, can_id, start, encoded, e):
+                        break
+                    continue
+                self.sent(can_id, message, start, encoded)
+    def sent(self, can_id, message, start, encoded):
+        self.get_stats(can_id).record(start, encoded, time.perf_counter(), True)
+        self.error_run = 0
+        if tracer is not None:
+            tracer.log(message)
+    def send_failed(self, bus, can_id, start, encoded, error):
+        """Count a failed send; returns False if the bus is considered lost (see lost())."""
+        self.get_stats(can_id).record(start, encoded, encoded, False)
+        self.error_run += 1
+        if self.error_run == 1:
+            print(f"CAN Error for {hex(can_id)} on {self.name}: {error}")
+        if tracer is not None:
+            tracer.log_error(can_id, error)
+        if self.error_run >= RECONNECT_AFTER_ERRORS or bus_off(bus):
+            self.lost(error)
+            return False
+        return True
+    def lost(self, error):
+        """The bus went away (bus-off, unplugged adapter): release it and reconnect with backoff."""
+        with self.lock:
+            bus = self.bus
+            if bus is None:
+                return
+            self.bus = None
+            self.state = "reconnecting"
+            self.last_error = str(error)
+        print(f"Lost CAN bus {self.name}: {error}; reconnecting.")
+        self.queue.clear()
+        for can_id in list(self.periodic_tasks.keys()):
+            self.stop_transmission(can_id)
+            self.scheduler.schedule(can_id)  # keeps its timing; frames resume with the new bus
+        for handler in list(bus_closing_handlers):
+            handler(bus)
+        try:
+            bus.shutdown()
+        except Exception as e:
+            print(f"Error during shutdown of bus {self.name}:", e)
+        self.connect()
+    def close(self):
+        """Stop sending and release the bus; transmissions are kept and resume on the next start."""
+        self.scheduler.stop()
+        for can_id in list(self.periodic_tasks.keys()):
+            self.stop_transmission(can_id)
+        with self.lock:
+            self.connector = None  # a running open attempt discards its bus
+            bus = self.bus
+            self.bus = None
+            self.state = "closed"
+        self.wake.set()
+        self.stop_sender()
+        if bus is None:
+            return
+        for handler in list(bus_closing_handlers):
+            handler(bus)
+        try:
+            bus.shutdown()
+        except Exception as e:
+            print(f"Error during shutdown of bus {self.name}:", e)
+    def planned_load(self, changes=None):
+        """
+        Worst-case bus load in percent of this channel's transmissions, with
+        changes {can_id: (length, fd, brs, frames per second)} applied on top.
+        """
+        bitrate = self.bitrate()
+        data_bitrate = self.data_bitrate()
+        frames = {can_id: (entry["length"], entry["fd"], entry["brs"],
+                           frame_rate(entry["cycle_time"], entry["tx_mode"], entry["min_gap_ms"]))
+                  for can_id, entry in list(self.transmissions.items())}
+        frames.update(changes or {})
+        busy = sum(frame_time(length, can_id > 0x7FF, bitrate, fd, brs, data_bitrate) * rate
+                   for can_id, (length, fd, brs, rate) in frames.items())
+        return busy * 100.0
+    def get_stats(self, can_id):
+        stats = self.stats.get(can_id)
+        if stats is None:
+            stats = self.stats[can_id] = TransmitStats(can_id)
+        return stats
+    def transmit(self, can_id):
+        """Encode the frame of can_id and send it without waiting, or queue it for the sender thread (scheduler thread)."""
+        entry = self.transmissions.get(can_id)
+        bus = self.bus
+        if entry is None or bus is None:
+            return  # not connected (yet): nothing is queued
+        start = time.perf_counter()
+        with self.frame_lock:
+            if entry["generators"] or entry["counters"]:
+                step_members(entry)
+            frame = get_frame(entry)
+        encoded = time.perf_counter()
+        stats = self.get_stats(can_id)
+        stats.dlc = len(frame)
+        stats.fd = entry["fd"]
+        stats.brs = entry["brs"]
+        message = can.Message(timestamp=time.time(),
+                              arbitration_id=can_id,
+                              data=frame,
+                              is_extended_id=(can_id > 0x7FF),
+                              is_fd=entry["fd"],
+                              bitrate_switch=entry["brs"],
+                              is_rx=False,
+                              channel=self.index)
+        queue = self.queue
+        if queue.idle():
+            try:
+                bus.send(message, 0)
+            except can.CanError:
+                pass  # busy or failing: the sender retries it with a timeout and counts errors
+            else:
+                self.sent(can_id, message, start, encoded)
+                return
+        queue.put(can_id, (can_id, message, start, encoded))
+    def build_message(self, can_id):
+        entry = self.transmissions[can_id]
+        with self.frame_lock:
+            data = get_frame(entry)
+        return can.Message(arbitration_id=can_id,
+                           data=data,
+                           is_extended_id=(can_id > 0x7FF),
+                           is_fd=entry["fd"],
+                           bitrate_switch=entry["brs"])
+    def start_periodic_task(self, can_id):
+        bus = self.bus
+        entry = self.transmissions[can_id]
+        if not use_periodic_tasks or bus is None or not bus_has_native_periodic(bus) or entry["generators"] \
+                or entry["counters"] or entry["tx_mode"] != "cyclic":
+            return False  # generated values, counters and on-change frames are only sent by the scheduler
+        try:
+            task = bus.send_periodic(self.build_message(can_id), entry["cycle_time"] / 1000.0)
+        except (can.CanError, NotImplementedError, ValueError) as e:
+            print(f"Periodic task unavailable for {hex(can_id)}, using software scheduler: {e}")
+            return False
+        if isinstance(task, can.broadcastmanager.ThreadBasedCyclicSendTask):
+            task.stop()
+            return False
+        self.periodic_tasks[can_id] = task
+        print(f"Registered periodic task for CAN ID {hex(can_id)} on {self.name} every {entry['cycle_time']} ms.")
+        return True
+    def start_transmission(self, can_id):
+        """(Re)start cyclic sending of can_id, preferring a native periodic task."""
+        self.stop_transmission(can_id)
+        update_frame_format(self.transmissions[can_id])
+        if remote is not None:
+            return  # sent by the transmit process
+        self.connect()
+        if not self.start_periodic_task(can_id):
+            self.scheduler.schedule(can_id)
+    def stop_transmission(self, can_id):
+        self.scheduler.cancel(can_id)
+        task = self.periodic_tasks.pop(can_id, None)
+        if task is not None:
+            try:
+                task.stop()
+            except can.CanError as e:
+                print(f"Error stopping periodic task for {hex(can_id)}: {e}")
+    def invalidate_frame(self, can_id):
+        entry = self.transmissions.get(can_id)
+        if entry is not None:
+            entry["version"] += 1
+    def members_changed(self, can_id):
+        """A parameter joined or left can_id: periodic tasks are restarted, the scheduler picks it up on its own."""
+        entry = self.transmissions.get(can_id)
+        if entry is not None:
+            update_frame_format(entry)
+        if can_id in self.periodic_tasks:
+            self.start_transmission(can_id)
+    def data_changed(self, can_id):
+        self.invalidate_frame(can_id)
+        if remote is not None:
+            return
+        entry = self.transmissions.get(can_id)
+        if entry is not None and entry["tx_mode"] != "cyclic":
+            self.scheduler.trigger(can_id, entry["min_gap_ms"])
+            return
+        task = self.periodic_tasks.get(can_id)
+        if task is None or can_id not in self.transmissions:
+            return
+        try:
+            task.modify_data(self.build_message(can_id))
+        except can.CanError as e:
+            print(f"CAN Error updating periodic task for {hex(can_id)}: {e}")
+
+channels = {}  # channel name -> Channel, created on first use
+
+def get_channel(name=None):
+    """The Channel called name, or the default channel (bus_config["channel"]) for None/""."""
+    name = name or bus_config["channel"]
+    channel = channels.get(name)
+    if channel is None:
+        channel = channels[name] = Channel(name, len(channels) + 1)
+    return channel
+
+def get_bus(name=None):
+    return get_channel(name).get_bus()
+
+def get_global_bus():
+    """Bus of the default channel."""
+    return get_bus()
+
+def planned_frame(entry, configs, timing):
+    """(length, fd, brs, frames per second) of entry (None for a new frame) once configs join it with timing."""
+    fd = bool(entry and entry["fd"]) or any(config.get("fd") for config in configs)
+    brs = bool(entry and entry["brs"]) or any(config.get("brs") for config in configs if config.get("fd"))
+    length = 8
+    if fd:
+        lengths = [payload_length(config) for config in configs if config.get("fd")]
+        if entry and entry["fd"]:
+            lengths.append(entry["length"])
+        length = max(lengths)
+    return length, fd, brs, frame_rate(*timing)
+
+def check_bus_load(channel, changes, refuse=None):
+    """
+    Apply the bus load budget to enabling changes (see Channel.planned_load) on
+    channel: raises BusLoadError or warns. Returns the planned load in percent.
+    """
+    load = channel.planned_load(changes)
+    if load <= bus_load_budget:
+        return load
+    message = f"Planned bus load on {channel.name} would be {load:.1f}% (budget {bus_load_budget:g}%)."
+    if bus_load_refuse if refuse is None else refuse:
+        raise BusLoadError(message)
+    print(f"Warning: {message}")
+    if bus_load_handler is not None:
+        bus_load_handler(message)
+    return load
+
+def restart_transmissions():
+    """Restart every active transmission, e.g. after use_periodic_tasks changed."""
+    for channel in list(channels.values()):
+        for can_id in list(channel.transmissions.keys()):
+            channel.start_transmission(can_id)
+    remote_changed()
+
+def configure_bus(settings):
+    """
+    Apply new bus settings (interface, channel, bitrate, ... and optionally
+    "channels": {name: overrides}). If buses are open and the settings differ,
+    they are closed and every enabled parameter is re-enabled on the new ones.
+    Returns False if a bus could not be opened.
+    """
+    settings = dict(settings)
+    new_overrides = settings.pop("channels", channel_settings)
+    new_config = dict(bus_config)
+    new_config.update(settings)
+    if new_config == bus_config and new_overrides == channel_settings:
+        return True
+    was_open = remote is not None or any(channel.bus is not None for channel in channels.values())
+    enabled = [param for param in saved_parameters if param.enabled]
+    disable_parameters(enabled)
+    for channel in list(channels.values()):
+        channel.close()
+    bus_config.clear()
+    bus_config.update(new_config)
+    if new_overrides is not channel_settings:
+        channel_settings.clear()
+        channel_settings.update(new_overrides)
+    if not was_open:
+        return True
+    print(f"Bus reconfigured: {bus_config}")
+    # These were already sending: a smaller bitrate may exceed the budget, but only warns.
+    return open_and_enable(enabled, refuse=False) == len(enabled)
+
+def shutdown():
+    """Stop all cyclic sending, release every bus and flush the trace."""
+    global tracer
+    if remote is not None:
+        remote.stop()
+    for channel in list(channels.values()):
+        channel.close()
+    if tracer is not None:
+        tracer.stop()
+        status = tracer.status()
+        print(f"Trace: {status['written']} frames written, {status['dropped']} dropped")
+        tracer = None
+
+# ---------- Statistics Report ----------
+def reset_stats():
+    if remote is not None:
+        remote.reset_stats()
+    for channel in list(channels.values()):
+        for stats in list(channel.stats.values()):
+            stats.reset()
+
+def stats_report():
+    """
+    Return {"channels": {name: {"bus_load_percent", "planned_load_percent", "bitrate", "ids": {can_id: snapshot}}},
+            "connections": {name: {"state", "last_error", "queue_dropped"}}}.
+    Bus load is estimated from each ID's measured mean period and its frame size;
+    the planned load is the worst case of the current configuration (see Channel.planned_load).
+    While a transmit process runs, this is its latest report.
+    """
+    if remote is not None:
+        return remote.stats_report()
+    report = {}
+    for name, channel in list(channels.items()):
+        bitrate = channel.bitrate()
+        data_bitrate = channel.data_bitrate()
+        ids = {}
+        load = 0.0
+        for can_id, stats in sorted(list(channel.stats.items())):
+            snap = stats.snapshot()
+            mean = snap["period_mean_ms"]
+            busy = frame_time(stats.dlc, stats.is_extended_id, bitrate, stats.fd, stats.brs, data_bitrate)
+            snap["bus_load_percent"] = busy / (mean / 1000.0) * 100.0 if mean else 0.0
+            load += snap["bus_load_percent"]
+            ids[can_id] = snap
+        if ids:
+            report[name] = {"bus_load_percent": load, "planned_load_percent": channel.planned_load(),
+                            "bitrate": bitrate, "ids": ids}
+    return {"channels": report, "connections": connection_report()}
+
+def connection_report():
+    return {name: {"state": channel.state, "last_error": channel.last_error, "queue_dropped": channel.queue.dropped}
+            for name, channel in list(channels.items())}
+
+def connection_status():
+    """{channel name: {"state", "last_error", "queue_dropped"}}, see Connection."""
+    if remote is not None:
+        return remote.stats_report().get("connections", {})
+    return connection_report()
+
+STATS_COLUMNS = ["sent", "errors", "period_mean_ms", "period_min_ms", "period_max_ms", "period_p99_ms",
+                 "send_latency_mean_us", "send_latency_p99_us", "send_latency_max_us",
+                 "encode_mean_us", "encode_max_us", "bus_load_percent"]
+
+def export_stats(path):
+    """Write stats_report() to path as CSV (.csv) or JSON (anything else)."""
+    report = stats_report()
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(["channel", "can_id"] + STATS_COLUMNS)
+            for name, channel_report in report["channels"].items():
+                for can_id, snap in channel_report["ids"].items():
+                    writer.writerow([name, hex(can_id)] + ["" if snap[c] is None else snap[c] for c in STATS_COLUMNS])
+        else:
+            for channel_report in report["channels"].values():
+                channel_report["ids"] = {hex(can_id): snap for can_id, snap in channel_report["ids"].items()}
+            json.dump(report, f, indent=2)
+
+# ---------- Helper: Compute Slider Range (for Numeric Parameters) ----------
+def compute_slider_range(config):
+    if "min_value" in config and "max_value" in config:
+        min_str = config["min_value"]
+        max_str = config["max_value"]
+        try:
+            min_val = float(min_str)
+            max_val = float(max_str)
+        except:
+            min_val, max_val = 0, 100
+        if "." in max_str:
+            precision = len(max_str.split(".")[1])
+        else:
+            precision = 0
+        resolution_val = 10**(-precision) if precision > 0 else 1
+        return min_val, max_val, resolution_val, precision
+    else:
+        size_str = config["size"]
+        if "bit" in size_str:
+            num_bits = int(size_str.split()[0])
+            if config["type"] == "Unsigned":
+                return 0, (2 ** num_bits) - 1, 1, 0
+            else:
+                return -(2 ** (num_bits - 1)), (2 ** (num_bits - 1)) - 1, 1, 0
+        else:
+            num_bytes = int(size_str.split()[0])
+            if config["type"] == "Unsigned":
+                return 0, (2 ** (8 * num_bytes)) - 1, 1, 0
+            else:
+                return -(2 ** (8 * num_bytes - 1)), (2 ** (8 * num_bytes - 1)) - 1, 1, 0
+
+def timing_report_lines():
+    if remote is not None:
+        return remote.timing_report_lines()
+    lines = []
+    loads = stats_report()["channels"]
+    for name, channel in list(channels.items()):
+        timing = channel.scheduler.timing_stats()
+        transmissions = channel.transmissions
+        for can_id, st in sorted(timing.items()):
+            cycle = transmissions[can_id]["cycle_time"] if can_id in transmissions else float("nan")
+            lines.append(f"{name} {hex(can_id)}: cycle {cycle:g} ms, period mean {st['period_mean_ms']:.3f} ms "
+                         f"(min {st['period_min_ms']:.3f} / max {st['period_max_ms']:.3f}), "
+                         f"jitter std {st['jitter_std_ms']:.3f} ms, max {st['jitter_max_ms']:.3f} ms, "
+                         f"overruns {st['overruns']}, n={st['samples']}")
+        if timing and name in loads:
+            lines.append(f"{name} estimated bus load: {loads[name]['bus_load_percent']:.1f}%")
+    return lines
+
+# ==================== Parameter Model ====================
+saved_parameters = []  # Combined list for both numeric and ASCII parameters.
+# Changes to the model (saved_parameters, enabling, configs and timing, value
+# batches) can come from a front end's thread, the control server's thread and
+# scripts at once; functions decorated with model_change run one at a time.
+# set_value() stays outside it: it only swaps one value under the frame_lock.
+model_lock = threading.RLock()
+
+def model_change(func):
+    @functools.wraps(func)
+    def locked(*args, **kwargs):
+        with model_lock:
+            return func(*args, **kwargs)
+    return locked
+
+# Config keys that decide which frame a parameter belongs to.
+FRAME_KEYS = ("can_id", "channel", "fd", "brs", "dlc")
+
+class Parameter:
+    """
+    Plain-Python state of one saved parameter: config, current value and cached
+    payload, plus its membership in the transmissions of its channel
+    (config["channel"], default channel if absent). Front ends subclass this and
+    call set_value()/set_cycle_time()/enable()/disable().
+    """
+    kind = "parameter"
+    def __init__(self, config):
+        self.config = config.copy()
+        self.enabled = False
+        self.active_channel = None  # Channel the parameter is sending on while enabled
+        self.length = payload_length(self.config)  # bytes in the frame
+        self.mask = frame_mask(self.config)  # frame bits this parameter writes
+        self.generator = None  # pcan_waveform.Generator while config["generator"] is set
+        self.param_func = self.get_payload
+        self.value = self.initial_value()
+        self.payload = self.encode_payload()
+    def initial_value(self):
+        raise NotImplementedError
+    def check_value(self, value):
+        """value converted to this parameter's type; raises TypeError/ValueError and changes nothing."""
+        raise NotImplementedError
+    def encode(self, value):
+        """Payload bits for value, without changing the parameter."""
+        raise NotImplementedError
+    def encode_payload(self):
+        return self.encode(self.value)
+    def get_payload(self):
+        return self.payload
+    def set_value(self, value):
+        value = self.check_value(value)
+        if value == self.value:
+            return
+        self.store_value(value, self.encode(value))
+    def store_value(self, value, payload):
+        """Take a checked value and its payload; an enabled frame gets both under its frame_lock."""
+        channel = self.active_channel if self.enabled else None
+        if channel is None:
+            self.value = value
+            self.payload = payload
+        else:
+            with channel.frame_lock:
+                self.value = value
+                self.payload = payload
+            channel.data_changed(self.config["can_id"])
+        if remote is not None:
+            remote.value_changed(self)
+    def payload_changed(self):
+        """Re-encode after a value or config edit and mark the owning frame dirty."""
+        self.payload = self.encode_payload()
+        if self.enabled:
+            self.active_channel.data_changed(self.config["can_id"])
+    def cycle_time_changed(self):
+        """Hook for front ends: config["cycle_time"] (or the tx mode) was changed by another member of the same ID."""
+    def config_changed(self):
+        """Hook for subclasses to refresh values derived from config."""
+    @model_change
+    def set_config(self, config):
+        """Apply an edited config, moving an enabled parameter if its CAN ID, channel or frame format changed."""
+        if self.enabled and any(config.get(key) != self.config.get(key) for key in FRAME_KEYS):
+            self.disable()
+            self.config = config.copy()
+            self.length = payload_length(self.config)
+            self.mask = frame_mask(self.config)
+            self.config_changed()
+            self.payload = self.encode_payload()
+            self.enable()
+            remote_changed()
+            return
+        timing_changed = tx_timing(config) != tx_timing(self.config)
+        generator_changed = config.get("generator") != self.config.get("generator")
+        self.config = config.copy()
+        self.length = payload_length(self.config)
+        self.mask = frame_mask(self.config)
+        self.config_changed()
+        self.payload_changed()
+        if timing_changed:
+            self.set_tx_timing(*tx_timing(self.config))
+        elif self.enabled and (generator_changed or self.generator is not None):
+            self.active_channel.members_changed(self.config["can_id"])
+        remote_changed()
+    def set_cycle_time(self, new_cycle_time):
+        cycle_time, tx_mode, min_gap_ms = tx_timing(self.config)
+        self.set_tx_timing(new_cycle_time, tx_mode, min_gap_ms)
+    @model_change
+    def set_tx_timing(self, cycle_time, tx_mode="cyclic", min_gap_ms=0.0):
+        """Set cycle time, transmit mode and minimum gap; an enabled frame applies them to all its members."""
+        timing = {"cycle_time": cycle_time, "tx_mode": tx_mode, "min_gap_ms": min_gap_ms}
+        apply_tx_timing(self.config, timing)
+        if self.enabled:
+            can_id = self.config["can_id"]
+            channel = self.active_channel
+            if can_id in channel.transmissions:
+                channel.transmissions[can_id].update(timing)
+                sync_member_timing(channel, can_id)
+                channel.start_transmission(can_id)
+                print(f"Updated cycle time for CAN ID {hex(can_id)} to {cycle_time} ms ({tx_mode}).")
+        remote_changed()
+    @model_change
+    def enable(self):
+        if self.enabled:
+            return
+        can_id = self.config["can_id"]
+        channel = get_channel(self.config.get("channel"))
+        transmissions = channel.transmissions
+        cycle_time_ms, tx_mode, min_gap_ms = tx_timing(self.config)
+        check_bus_load(channel, {can_id: planned_frame(transmissions.get(can_id), [self.config],
+                                                       (cycle_time_ms, tx_mode, min_gap_ms))})
+        print(f"Enabling {self.kind} '{self.config['name']}' on CAN ID {hex(can_id)} ({channel.name}) "
+              f"with cycle time {cycle_time_ms} ms.")
+        if can_id in transmissions:
+            entry = transmissions[can_id]
+            entry["params"].append(self.param_func)
+            if (entry["cycle_time"], entry["tx_mode"], entry["min_gap_ms"]) != (cycle_time_ms, tx_mode, min_gap_ms):
+                entry.update(cycle_time=cycle_time_ms, tx_mode=tx_mode, min_gap_ms=min_gap_ms)
+                sync_member_timing(channel, can_id)
+                channel.start_transmission(can_id)
+            else:
+                channel.members_changed(can_id)
+        else:
+            transmissions[can_id] = new_transmission(cycle_time_ms, self.param_func, tx_mode, min_gap_ms)
+            channel.start_transmission(can_id)
+        self.active_channel = channel
+        self.enabled = True
+        remote_changed()
+    @model_change
+    def disable(self):
+        can_id = self.config["can_id"]
+        channel = self.active_channel
+        if channel is not None and can_id in channel.transmissions:
+            transmissions = channel.transmissions
+            try:
+                transmissions[can_id]["params"].remove(self.param_func)
+                print(f"Disabling {self.kind} '{self.config['name']}' on CAN ID {hex(can_id)} ({channel.name}).")
+            except ValueError:
+                pass
+            if not transmissions[can_id]["params"]:
+                channel.stop_transmission(can_id)
+                del transmissions[can_id]
+            else:
+                channel.members_changed(can_id)
+        self.active_channel = None
+        self.enabled = False
+        remote_changed()
+
+def sync_member_timing(channel, can_id):
+    """Copy the timing of channel's can_id entry into every enabled member's config."""
+    entry = channel.transmissions[can_id]
+    for sp in saved_parameters:
+        if sp.enabled and sp.active_channel is channel and sp.config["can_id"] == can_id:
+            apply_tx_timing(sp.config, entry)
+            sp.cycle_time_changed()
+
+def make_generator(config):
+    if not config.get("generator"):
+        return None
+    import pcan_waveform
+    return pcan_waveform.Generator(config["generator"])
+
+class NumericParameter(Parameter):
+    """
+    config keys:
+      name, can_id, size, type, resolution, offset (optional, default 0),
+      start_bit and byte_order, or mapping (list) and target_byte (if bit),
+      cycle_time, min_value, max_value, initial_value, mode ("numeric"),
+      channel, fd, brs, dlc, generator (optional, see pcan_waveform)
+    The raw value sent is round((value - offset) / resolution); see SignalLayout.
+    """
+    kind = "parameter"
+    def __init__(self, config):
+        self.layout = SignalLayout(config)
+        super().__init__(config)
+        self.generator = make_generator(self.config)
+    def config_changed(self):
+        self.layout = SignalLayout(self.config)
+        self.generator = make_generator(self.config)
+    def prepare_generator(self, cycle_time_ms):
+        min_val, max_val, res, prec = compute_slider_range(self.config)
+        self.generator.prepare(cycle_time_ms, self.config, self.layout, (min_val, max_val))
+    def initial_value(self):
+        return float(self.config.get("initial_value", 0))
+    def check_value(self, value):
+        if not isinstance(value, numbers.Real) or isinstance(value, bool):
+            raise TypeError(f"{self.config['name']}: value must be a number, not {value!r}")
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"{self.config['name']}: value must be finite, not {value!r}")
+        return value
+    def encode(self, value):
+        raw_value = (value - self.config.get("offset", 0)) / self.config["resolution"]
+        return self.layout.pack(int(round(raw_value)))
+
+class CounterParameter(NumericParameter):
+    """
+    Rolling (alive) counter placed like a numeric signal by start_bit, size
+    and byte_order. config keys as NumericParameter plus mode ("counter") and
+    wrap (largest value before returning to 0, default 2 ** bits - 1).
+    value is the counter of the next frame; every frame sent steps it by one.
+    """
+    kind = "counter"
+    def config_changed(self):
+        super().config_changed()
+        self.value = min(int(self.value), self.config["wrap"])
+    def initial_value(self):
+        return min(int(self.config.get("initial_value", 0)), self.config["wrap"])
+    def check_value(self, value):
+        return min(max(int(super().check_value(value)), 0), self.config["wrap"])
+    def encode(self, value):
+        return self.layout.pack(int(value))
+    def advance(self):
+        """Put the current counter into the payload and move on (scheduler thread)."""
+        value = int(self.value)
+        self.payload = self.layout.pack(value)
+        self.value = value + 1 if value < self.config["wrap"] else 0
+
+def make_checksum(config):
+    import pcan_e2e
+    return pcan_e2e.make_checksum(config["checksum"], frame_mask(config).bit_length() // 8 - 1)
+
+class ChecksumParameter(NumericParameter):
+    """
+    One checksum byte computed over the finished frame (see pcan_e2e).
+    config keys as NumericParameter with size "8 bit" on a whole byte, plus
+    mode ("checksum") and checksum (spec). Its own payload is 0; get_frame()
+    fills the byte in and value shows the last checksum.
+    """
+    kind = "checksum"
+    def __init__(self, config):
+        super().__init__(config)
+        self.config_changed()
+    def config_changed(self):
+        super().config_changed()
+        self.byte = frame_mask(self.config).bit_length() // 8 - 1
+        self.compute = make_checksum(self.config)
+    def initial_value(self):
+        return 0
+    def encode(self, value):
+        return 0
+
+class ASCIIParameter(Parameter):
+    """
+    config keys:
+      name, can_id, size, mapping (list), cycle_time, mode ("ascii"),
+      initial_value (a string), channel, fd, brs, dlc (optional)
+    For ASCII parameters, size is "X byte" (up to 64 in FD frames) and mapping is a list of target byte positions.
+    """
+    kind = "ASCII parameter"
+    def __init__(self, config):
+        self.expected_length = int(config["size"].split()[0])
+        super().__init__(config)
+    def config_changed(self):
+        self.expected_length = int(self.config["size"].split()[0])
+    def initial_value(self):
+        return str(self.config.get("initial_value", ""))
+    def check_value(self, value):
+        if not isinstance(value, str):
+            raise TypeError(f"{self.config['name']}: value must be a string, not {value!r}")
+        return value
+    def encode(self, value):
+        text = value
+        text = (text + " " * self.expected_length)[:self.expected_length]
+        payload = 0
+        for i, byte_pos in enumerate(self.config["mapping"]):
+            if i < len(text):
+                payload |= (ord(text[i]) & 0xFF) << (8 * int(byte_pos))
+        return payload
+
+# ---------- Profiles ----------
+# A profile stores the bus settings and the full saved_parameters set. On disk it
+# is compact JSON: one shared column list and one row per parameter, e.g.
+#   {"format": 1, "bus": {...}, "columns": PROFILE_COLUMNS, "rows": [[...], ...]}
+# The verbose form {"bus": {...}, "parameters": [{config}, ...]} is accepted too,
+# where each config may carry "value"/"initial_value" and "enabled".
+PROFILE_FORMAT = 1
+MODES = ("numeric", "ascii", "counter", "checksum")
+PROFILE_COLUMNS = ["name", "can_id", "mode", "size", "type", "resolution", "mapping",
+                   "target_byte", "min_value", "max_value", "cycle_time", "value", "enabled", "offset",
+                   "channel", "fd", "brs", "dlc", "start_bit", "byte_order",
+                   "generator", "tx_mode", "min_gap_ms", "wrap", "checksum"]
+
+def parse_can_id(value):
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value)
+
+def compile_config(raw, index=0):
+    """Validate one profile/config entry and return (config, enabled) ready for a Parameter."""
+    name = str(raw.get("name", ""))
+    def fail(message):
+        raise ValueError(f"Parameter {index} ('{name}'): {message}")
+    try:
+        can_id = parse_can_id(raw["can_id"])
+    except (KeyError, TypeError, ValueError):
+        fail("invalid or missing can_id")
+    if not 0 <= can_id <= 0x1FFFFFFF:
+        fail(f"CAN ID {hex(can_id)} out of range")
+    mode = raw.get("mode") or "numeric"
+    if mode not in MODES:
+        fail(f"unknown mode {mode!r}")
+    if mode != "numeric" and raw.get("generator"):
+        fail("generators need a numeric parameter")
+    if mode in ("counter", "checksum") and raw.get("start_bit") is None:
+        fail(f"a {mode} needs a start_bit")
+    tx_mode = raw.get("tx_mode") or "cyclic"
+    if tx_mode not in TX_MODES:
+        fail(f"tx_mode must be one of {TX_MODES}")
+    if tx_mode == "on_change" and raw.get("generator"):
+        fail("generators need a cyclic tx_mode")
+    fd = bool(raw.get("fd"))
+    frame_max = FD_MAX_LENGTH if fd else 8
+    size = str(raw.get("size", ""))
+    parts = size.split()
+    signal = mode != "ascii" and raw.get("start_bit") is not None
+    if signal:
+        max_size = MAX_SIGNAL_BITS
+    else:
+        max_size = frame_max if mode == "ascii" else 8
+    if len(parts) != 2 or parts[1] not in ("bit", "byte") or not parts[0].isdigit() \
+            or not 1 <= int(parts[0]) <= max_size or (mode == "ascii" and parts[1] != "byte") \
+            or (signal and parts[1] != "bit"):
+        fail(f"invalid size {size!r}")
+    try:
+        cycle_time = float(raw.get("cycle_time", 1000))
+    except (TypeError, ValueError):
+        fail("invalid cycle_time")
+    if cycle_time <= 0:
+        fail("cycle_time must be positive")
+    try:
+        min_gap_ms = float(raw.get("min_gap_ms") or 0)
+    except (TypeError, ValueError):
+        fail("invalid min_gap_ms")
+    if min_gap_ms < 0:
+        fail("min_gap_ms must not be negative")
+    config = {"name": name, "can_id": can_id, "size": size, "cycle_time": cycle_time, "mode": mode}
+    if tx_mode != "cyclic":
+        config["tx_mode"] = tx_mode
+    if min_gap_ms:
+        config["min_gap_ms"] = min_gap_ms
+    if signal:
+        start_bit = raw["start_bit"]
+        byte_order = raw.get("byte_order") or "intel"
+        if not isinstance(start_bit, int) or not 0 <= start_bit < 8 * frame_max:
+            fail(f"start_bit must be in 0..{8 * frame_max - 1}")
+        if byte_order not in BYTE_ORDERS:
+            fail(f"byte_order must be one of {BYTE_ORDERS}")
+        config.update({"start_bit": start_bit, "byte_order": byte_order})
+        if frame_mask(config).bit_length() > 8 * frame_max:
+            fail(f"signal does not fit a {frame_max} byte frame")
+    else:
+        positions = 8 if parts[1] == "bit" else frame_max  # bit positions in a byte, or byte positions in the frame
+        mapping = raw.get("mapping")
+        if not isinstance(mapping, list) or len(mapping) != int(parts[0]) \
+                or not all(isinstance(pos, int) and 0 <= pos < positions for pos in mapping):
+            fail(f"mapping must list {parts[0]} positions in 0..{positions - 1}")
+        config["mapping"] = list(mapping)
+    channel = raw.get("channel")
+    if channel:
+        config["channel"] = str(channel)
+    if fd:
+        config["fd"] = True
+        if raw.get("brs"):
+            config["brs"] = True
+        if raw.get("dlc"):
+            if raw["dlc"] not in FD_LENGTHS:
+                fail(f"dlc must be one of {FD_LENGTHS}")
+            config["dlc"] = raw["dlc"]
+    value = raw.get("value", raw.get("initial_value"))
+    if mode == "ascii":
+        config["initial_value"] = "" if value is None else str(value)
+    elif mode == "counter":
+        bits = int(parts[0])
+        wrap = raw.get("wrap")
+        if wrap is None:
+            wrap = (1 << bits) - 1
+        if not isinstance(wrap, int) or not 1 <= wrap < 1 << bits:
+            fail(f"wrap must be in 1..{(1 << bits) - 1}")
+        try:
+            initial_value = int(0 if value is None else value)
+        except (TypeError, ValueError):
+            fail("invalid value")
+        config.update({"type": "Unsigned", "resolution": 1.0, "min_value": "0", "max_value": str(wrap),
+                       "wrap": wrap, "initial_value": min(max(initial_value, 0), wrap)})
+    elif mode == "checksum":
+        mask = frame_mask(config)
+        if size != "8 bit" or mask.bit_length() % 8 or mask != 0xFF << (mask.bit_length() - 8):
+            fail("a checksum must fill one whole byte (size \"8 bit\")")
+        import pcan_e2e
+        try:
+            checksum = pcan_e2e.compile_spec(raw.get("checksum"))
+        except ValueError as e:
+            fail(str(e))
+        config.update({"type": "Unsigned", "resolution": 1.0, "min_value": "0", "max_value": "255",
+                       "checksum": checksum, "initial_value": 0})
+    else:
+        param_type = raw.get("type", "Unsigned")
+        if param_type not in ("Unsigned", "Signed"):
+            fail(f"invalid type {param_type!r}")
+        try:
+            resolution = float(raw.get("resolution", 1))
+            offset = float(raw.get("offset") or 0)
+            initial_value = float(0 if value is None else value)
+        except (TypeError, ValueError):
+            fail("invalid resolution, offset or value")
+        if resolution <= 0:
+            fail("resolution must be positive")
+        config.update({"type": param_type, "resolution": resolution, "initial_value": initial_value})
+        if offset:
+            config["offset"] = offset
+        for key in ("min_value", "max_value"):
+            if raw.get(key) is not None:
+                config[key] = str(raw[key])
+        if raw.get("generator"):
+            import pcan_waveform
+            try:
+                config["generator"] = pcan_waveform.compile_spec(raw["generator"])
+            except ValueError as e:
+                fail(str(e))
+        if parts[1] == "bit" and not signal:
+            target_byte = raw.get("target_byte", 0)
+            if not isinstance(target_byte, int) or not 0 <= target_byte < frame_max:
+                fail(f"target_byte must be in 0..{frame_max - 1}")
+            config["target_byte"] = target_byte
+    if fd and config.get("dlc") and payload_length(config) > config["dlc"]:
+        fail(f"mapped bytes do not fit dlc {config['dlc']}")
+    return config, bool(raw.get("enabled", False))
+
+def make_parameter(config):
+    if config.get("mode") == "ascii":
+        return ASCIIParameter(config)
+    if config.get("mode") == "counter":
+        return CounterParameter(config)
+    if config.get("mode") == "checksum":
+        return ChecksumParameter(config)
+    return NumericParameter(config)
+
+def frame_key(config, default_channel=None):
+    return (config.get("channel") or default_channel or bus_config["channel"], config["can_id"])
+
+def bit_range(mask):
+    low = (mask & -mask).bit_length() - 1
+    high = mask.bit_length() - 1
+    return f"bit {low}" if low == high else f"bits {low}-{high}"
+
+def overlap_error(config, other_name, overlap):
+    return ValueError(f"'{config['name']}' overlaps '{other_name}' on CAN ID {hex(config['can_id'])} "
+                      f"({bit_range(overlap)})")
+
+def check_overlap(config, exclude=None):
+    """Raise ValueError if config writes frame bits another saved parameter of the same frame writes."""
+    key = frame_key(config)
+    mask = frame_mask(config)
+    for param in saved_parameters:
+        if param is not exclude and param.mask & mask and frame_key(param.config) == key:
+            raise overlap_error(config, param.config["name"], param.mask & mask)
+
+def check_overlaps(configs, default_channel=None):
+    """check_overlap() for a whole parameter set in one pass, with one occupancy bitmap per frame."""
+    occupied = {}  # frame key -> [bitmap, [(mask, name), ...]]
+    for config in configs:
+        mask = frame_mask(config)
+        frame = occupied.setdefault(frame_key(config, default_channel), [0, []])
+        if frame[0] & mask:
+            for other_mask, other_name in frame[1]:
+                if other_mask & mask:
+                    raise overlap_error(config, other_name, other_mask & mask)
+        frame[0] |= mask
+        frame[1].append((mask, config["name"]))
+
+@model_change
+def add_parameter(config):
+    """Create a headless parameter from an editor-style config and register it."""
+    config, enabled = compile_config(config, len(saved_parameters))
+    check_overlap(config)
+    param = make_parameter(config)
+    saved_parameters.append(param)
+    remote_changed()
+    return param
+
+@model_change
+def update_parameter(param, config):
+    """Validate an edited config of param (including overlaps) and apply it."""
+    config, enabled = compile_config(config, saved_parameters.index(param))
+    check_overlap(config, exclude=param)
+    param.set_config(config)
+
+def set_generator(param, spec):
+    """Start the waveform generator spec (see pcan_waveform) on a numeric parameter, or stop it with None."""
+    config = dict(param.config, value=param.value)
+    if spec:
+        config["generator"] = spec
+    else:
+        config.pop("generator", None)
+    update_parameter(param, config)
+
+@model_change
+def set_values(changes):
+    """
+    Set the values of (param, value) pairs as one update: enabled members of
+    the same frame change under the channel's frame_lock and the frame is
+    invalidated once, so no frame carries only part of the batch and none is
+    sent because of it (except on-change frames, once). Every value is checked
+    and encoded first: if one is rejected (TypeError/ValueError), none is set.
+    In the transmit process (see remote) values travel per parameter and the
+    batch is not atomic.
+    """
+    prepared = []
+    for param, value in changes:
+        value = param.check_value(value)
+        prepared.append((param, value, param.encode(value)))
+    by_id = {}
+    for param, value, payload in prepared:
+        if value == param.value:
+            continue
+        if not param.enabled or remote is not None:
+            param.store_value(value, payload)
+            continue
+        by_id.setdefault((param.active_channel, param.config["can_id"]), []).append((param, value, payload))
+    for (channel, can_id), members in by_id.items():
+        with channel.frame_lock:
+            for param, value, payload in members:
+                param.value = value
+                param.payload = payload
+        channel.data_changed(can_id)
+
+@model_change
+def clear_parameters():
+    """Disable and forget every saved parameter."""
+    disable_parameters(saved_parameters)
+    saved_parameters.clear()
+    remote_changed()
+
+@model_change
+def enable_parameters(params, refuse=None):
+    """
+    Enable many parameters at once: one transmissions entry and one
+    transmission start per channel and CAN ID instead of one restart per member.
+    The first member's cycle time and tx mode win, as if the members had been enabled in order.
+    The bus load budget is checked per channel before anything is enabled
+    (refuse overrides bus_load_refuse).
+    """
+    by_id = {}
+    for param in params:
+        if not param.enabled:
+            channel = get_channel(param.config.get("channel"))
+            by_id.setdefault((channel, param.config["can_id"]), []).append(param)
+    changes = {}
+    for (channel, can_id), members in by_id.items():
+        entry = channel.transmissions.get(can_id)
+        timing = tx_timing(members[0].config) if entry is None else \
+            (entry["cycle_time"], entry["tx_mode"], entry["min_gap_ms"])
+        changes.setdefault(channel, {})[can_id] = planned_frame(entry, [param.config for param in members], timing)
+    for channel, channel_changes in changes.items():
+        check_bus_load(channel, channel_changes, refuse)
+    for (channel, can_id), members in by_id.items():
+        transmissions = channel.transmissions
+        entry = transmissions.get(can_id)
+        if entry is None:
+            cycle_time_ms, tx_mode, min_gap_ms = tx_timing(members[0].config)
+            entry = new_transmission(cycle_time_ms, members[0].param_func, tx_mode, min_gap_ms)
+            entry["params"] = []
+        for param in members:
+            apply_tx_timing(param.config, entry)
+            param.active_channel = channel
+            param.enabled = True
+            entry["params"].append(param.param_func)
+        entry["version"] += 1
+        if can_id not in transmissions:
+            transmissions[can_id] = entry
+            channel.start_transmission(can_id)
+        else:
+            channel.members_changed(can_id)
+        print(f"Enabled {len(members)} parameter(s) on CAN ID {hex(can_id)} ({channel.name}) "
+              f"with cycle time {entry['cycle_time']} ms.")
+    remote_changed()
+
+@model_change
+def disable_parameters(params):
+    """Disable many parameters at once; transmissions left without members are stopped."""
+    touched = set()
+    for param in params:
+        channel = param.active_channel
+        if not param.enabled or channel is None:
+            continue
+        can_id = param.config["can_id"]
+        entry = channel.transmissions.get(can_id)
+        if entry is not None and param.param_func in entry["params"]:
+            entry["params"].remove(param.param_func)
+            touched.add((channel, can_id))
+        param.active_channel = None
+        param.enabled = False
+    for channel, can_id in touched:
+        if not channel.transmissions[can_id]["params"]:
+            channel.stop_transmission(can_id)
+            del channel.transmissions[can_id]
+        else:
+            channel.members_changed(can_id)
+    remote_changed()
+
+def open_and_enable(params, refuse=None):
+    """
+    Open the bus of every channel used by params (each once) and enable the
+    parameters whose bus is available; the transmit process (see remote) opens
+    its own buses. Without wait_for_bus every parameter is enabled at once and
+    starts sending when its bus has been opened. Returns the number enabled.
+    """
+    usable = {}
+    for param in params:
+        name = param.config.get("channel")
+        if name not in usable:
+            usable[name] = remote is not None or not wait_for_bus or get_bus(name) is not None
+    ready = [param for param in params if usable[param.config.get("channel")]]
+    enable_parameters(ready, refuse)
+    return len(ready)
+
+def read_profile(path):
+    """Parse and validate a profile file; returns (bus settings, [(config, enabled), ...])."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "rows" in data:
+        columns = data.get("columns", PROFILE_COLUMNS)
+        raws = [dict(zip(columns, row)) for row in data["rows"]]
+    else:
+        raws = data.get("parameters", [])
+    return data.get("bus", {}), [compile_config(raw, index) for index, raw in enumerate(raws)]
+
+@model_change
+def load_profile(path, enable=True, bus_override=None):
+    """
+    Replace saved_parameters with the contents of a profile in one pass and, if
+    enable is set, start sending the enabled ones right away. bus_override is
+    applied on top of the profile's bus settings. Returns the new parameters so
+    a front end can build its widgets afterwards.
+    """
+    bus, compiled = read_profile(path)
+    if bus_override:
+        bus = dict(bus, **bus_override)
+    check_overlaps([config for config, enabled in compiled], bus.get("channel"))
+    clear_parameters()
+    configure_bus(bus)
+    params = [make_parameter(config) for config, enabled in compiled]
+    saved_parameters.extend(params)
+    remote_changed()
+    if enable:
+        to_enable = [param for param, (config, enabled) in zip(params, compiled) if enabled]
+        if to_enable:
+            open_and_enable(to_enable)
+    return params
+
+def save_profile(path, params=None):
+    """Write params (default: saved_parameters), bus_config and channel_settings as a compact profile."""
+    rows = []
+    for param in saved_parameters if params is None else params:
+        config = param.config
+        rows.append([config["name"], hex(config["can_id"]), config.get("mode", "numeric"), config["size"],
+                     config.get("type"), config.get("resolution"), config.get("mapping"),
+                     config.get("target_byte"), config.get("min_value"), config.get("max_value"),
+                     config.get("cycle_time", 1000), param.value, param.enabled, config.get("offset", 0),
+                     config.get("channel"), config.get("fd", False), config.get("brs", False), config.get("dlc"),
+                     config.get("start_bit"), config.get("byte_order"), config.get("generator"),
+                     config.get("tx_mode", "cyclic"), config.get("min_gap_ms", 0), config.get("wrap"),
+                     config.get("checksum")])
+    bus = dict(bus_config, channels=channel_settings) if channel_settings else bus_config
+    data = {"format": PROFILE_FORMAT, "bus": bus, "columns": PROFILE_COLUMNS, "rows": rows}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+# ================= Command Line =================
+def write_stats(path):
+    try:
+        export_stats(path)
+    except OSError as e:
+        print(f"Failed to write statistics to {path}: {e}")
+
+def main(argv=None):
+    global tracer, bus_load_budget, bus_load_refuse
+    parser = argparse.ArgumentParser(description="Send saved CAN parameter sets without a GUI.")
+    parser.add_argument("--config", help="profile/JSON config with bus settings and parameters")
+    parser.add_argument("--backend", choices=sorted(BUS_PRESETS),
+                        help="bus preset; overrides the profile's bus settings")
+    parser.add_argument("--interface", help="python-can interface, e.g. pcan, virtual, socketcan")
+    parser.add_argument("--channel", help="interface channel, e.g. PCAN_USBBUS1 or vcan0")
+    parser.add_argument("--bitrate", type=int, help="bit rate in bit/s")
+    parser.add_argument("--fd", action="store_true", default=None, help="open the bus in CAN FD mode")
+    parser.add_argument("--data-bitrate", type=int, help="CAN FD data phase bit rate in bit/s (e.g. 2000000)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="seconds to run (default: until interrupted)")
+    parser.add_argument("--status-interval", type=float, default=60.0,
+                        help="seconds between timing reports, 0 to disable")
+    parser.add_argument("--stats", metavar="FILE", default=None,
+                        help="export per-ID transmit statistics to FILE (.json or .csv) at every report and on exit")
+    parser.add_argument("--verbose", action="store_true", help="print every sent frame to the console")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="write sent/received frames to FILE (.asc, .blf, .csv, .log, ...)")
+    parser.add_argument("--trace-level", choices=["errors", "frames"], default="frames",
+                        help="what to trace: send errors only, or every frame (default)")
+    parser.add_argument("--trace-max-bytes", type=int, default=0,
+                        help="start a new trace file after this many bytes (0 = never)")
+    parser.add_argument("--trace-rotate-seconds", type=float, default=0,
+                        help="start a new trace file after this many seconds (0 = never)")
+    parser.add_argument("--load-budget", type=float, default=bus_load_budget,
+                        help=f"planned bus load in percent that enabling may reach (default {bus_load_budget:g})")
+    parser.add_argument("--refuse-over-budget", action="store_true",
+                        help="fail instead of warning when the profile exceeds the load budget")
+    parser.add_argument("--queue-policy", choices=SEND_QUEUE_POLICIES, default=send_queue_policy,
+                        help="when the send queue is full: keep only the latest frame per ID (default) "
+                             "or drop the oldest frame")
+    parser.add_argument("--queue-limit", type=int, default=send_queue_limit,
+                        help=f"frames the send queue of a channel holds (default {send_queue_limit})")
+    parser.add_argument("--replay", metavar="LOG", default=None,
+                        help="send a recorded log (.asc, .blf, .csv, ...) at its original timing, on top of "
+                             "the --config parameters; the run ends with the replay unless --duration is given")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="replay speed factor 0.5..10, 0 = as fast as possible (default 1)")
+    parser.add_argument("--replay-allow", metavar="IDS", default="", help="replay only these CAN IDs (hex, comma separated)")
+    parser.add_argument("--replay-deny", metavar="IDS", default="", help="never replay these CAN IDs")
+    parser.add_argument("--replay-loop", action="store_true", help="start the log over after its last frame")
+    parser.add_argument("--control", metavar="ADDRESS", default=None,
+                        help="accept JSON-lines control requests on a localhost TCP port ([host:]port) "
+                             "or Unix socket path (see pcan_control)")
+    args = parser.parse_args(argv)
+    if args.config is None and args.replay is None:
+        parser.error("--config or --replay is required")
+    set_send_queue(args.queue_policy, args.queue_limit)
+    bus_load_budget = args.load_budget
+    bus_load_refuse = args.refuse_over_budget
+    if args.trace is not None or args.verbose:
+        import pcan_trace
+        level = pcan_trace.TRACE_FRAMES if args.trace_level == "frames" else pcan_trace.TRACE_ERRORS
+        tracer = pcan_trace.TraceLogger(args.trace, verbosity=level, max_bytes=args.trace_max_bytes,
+                                        rotate_seconds=args.trace_rotate_seconds)
+        try:
+            tracer.start()
+        except (OSError, ValueError) as e:
+            print(f"Failed to open trace {args.trace}: {e}")
+            tracer = None
+            return 1
+    bus_override = dict(BUS_PRESETS[args.backend]) if args.backend else {}
+    for key in ("interface", "channel", "bitrate", "fd", "data_bitrate"):
+        if getattr(args, key) is not None:
+            bus_override[key] = getattr(args, key)
+    try:
+        if args.config is not None:
+            load_profile(args.config, bus_override=bus_override)
+        else:
+            configure_bus(bus_override)
+    except (OSError, ValueError) as e:
+        print(f"Failed to load {args.config}: {e}")
+        shutdown()
+        return 1
+    if not any(channel.bus is not None for channel in channels.values()) and get_global_bus() is None:
+        shutdown()
+        return 1
+    control = None
+    if args.control is not None:
+        import pcan_control
+        try:
+            control = pcan_control.start_server(args.control)
+        except OSError as e:
+            print(f"Failed to start control server on {args.control}: {e}")
+            shutdown()
+            return 1
+    replay = None
+    if args.replay is not None:
+        import pcan_replay
+        try:
+            replay = pcan_replay.start_replay(args.replay, speed=args.replay_speed,
+                                              allow=pcan_replay.parse_ids(args.replay_allow),
+                                              deny=pcan_replay.parse_ids(args.replay_deny), loop=args.replay_loop)
+        except (OSError, ValueError) as e:
+            print(f"Failed to replay {args.replay}: {e}")
+            if control is not None:
+                control.stop()
+            shutdown()
+            return 1
+    # Everything loaded so far lives for the whole run; keep it out of GC passes.
+    gc.collect()
+    gc.freeze()
+    stop_event = threading.Event()
+    def request_stop(signum, frame):
+        stop_event.set()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    deadline = None if args.duration is None else time.monotonic() + args.duration
+    next_status = time.monotonic() + args.status_interval
+    try:
+        while not stop_event.is_set():
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if replay is not None and deadline is None and not replay.running():
+                break
+            if args.status_interval > 0 and now >= next_status:
+                for line in timing_report_lines():
+                    print(line)
+                if args.stats:
+                    write_stats(args.stats)
+                next_status = now + args.status_interval
+            timeout = next_status - now if args.status_interval > 0 else 1.0
+            if deadline is not None:
+                timeout = min(timeout, deadline - now)
+            if replay is not None:
+                timeout = min(timeout, 0.2)
+            stop_event.wait(max(timeout, 0.0))
+    finally:
+        if replay is not None:
+            replay.stop()
+        if control is not None:
+            control.stop()
+        if args.stats:
+            write_stats(args.stats)
+        shutdown()
+    return 0
+
+if __name__ == "__main__":
+    # Run the importable module, so pcan_replay and others share its state with this run.
+    import pcan_engine
+    sys.exit(pcan_engine.main())
@@ -0,0 +1,317 @@
+"""
+ISO 15765-2 (ISO-TP) transport on the default engine channel.
+
+An IsoTpLink carries messages of any length between a tx_id and an rx_id on
+the same bus connection the engine transmits on, using the four frame types
+(first byte = protocol control information, PCI):
+
+  single       0x0L data             L <= 7 (CAN FD: 0x00 L data, L <= tx_dl - 2)
+  first        0x1L LL data          length up to 4095, or 0x10 0x00 + 32-bit length
+  consecutive  0x2N data             N = sequence number 1..15, 0, 1, ...
+  flow control 0x3S BS STmin         S: 0 continue, 1 wait, 2 overflow
+
+Outgoing messages are sent by the link's own thread: after the first frame
+it waits for the receiver's flow control and then sends each block of
+consecutive frames back to back, STmin apart when the receiver asks for a
+gap (or tx_st_min overrides it). Cyclic transmissions keep their place:
+before every consecutive frame the link yields while the channel's
+SendQueue holds frames the adapter could not take at once (see
+engine.SendQueue), so a long transfer fills only the bus time the cyclic
+frames leave free.
+
+Incoming frames of rx_id arrive through a pcan_receive.receiver listener
+(the receiver is started if needed) and are reassembled by receive() on the
+caller's thread, which answers first frames with flow control frames
+carrying block_size and st_min. Like the receiver, links work on the
+default channel (bus_config["channel"]) of this process only.
+"""
+import queue
+import threading
+import time
+
+import can
+
+import pcan_engine as engine
+import pcan_receive
+
+SINGLE, FIRST, CONSECUTIVE, FLOW_CONTROL = 0, 1, 2, 3
+CONTINUE, WAIT, OVERFLOW = 0, 1, 2  # flow status
+PADDING = 0xCC
+N_AS_TIMEOUT = 1.0    # s, for the adapter to take a frame
+N_BS_TIMEOUT = 1.0    # s, for the receiver's flow control
+N_CR_TIMEOUT = 1.0    # s, for the next consecutive frame
+MAX_WAIT_FRAMES = 10  # flow control "wait" frames accepted in a row
+RX_MAX_LENGTH = 1 << 24  # longer incoming messages are refused with an overflow flow control
+SEND_TIMEOUT = 0.01   # s, per attempt; a busy adapter is retried until N_AS_TIMEOUT
+YIELD_DELAY = 0.0002  # s, pause while cyclic frames wait in the channel's send queue
+STALL_TIMEOUT = 5.0   # s without a frame sent or flow control received before a waiting send() gives up
+
+class IsoTpError(OSError):
+    pass
+
+def encode_st_min(ms):
+    """STmin byte for a gap of ms milliseconds: 0..127 ms, or 0.1..0.9 ms as 0xF1..0xF9."""
+    if not 0 <= ms <= 127:
+        raise ValueError("STmin must be 0..127 ms")
+    if 0 < ms < 1:
+        return 0xF0 + max(1, int(round(ms * 10)))
+    return int(round(ms))
+
+def decode_st_min(byte):
+    """Gap in seconds for a received STmin byte; reserved values mean the maximum, 127 ms."""
+    if byte <= 0x7F:
+        return byte / 1000.0
+    if 0xF1 <= byte <= 0xF9:
+        return (byte - 0xF0) / 10000.0
+    return 0.127
+
+class Transfer:
+    """One outgoing message handed to the link thread; wait() raises what the send raised."""
+    def __init__(self, data, link):
+        self.data = bytes(data)
+        self.link = link
+        self.done = threading.Event()
+        self.error = None
+    def wait(self, timeout=STALL_TIMEOUT):
+        """Wait until the message is out; TimeoutError once the link made no progress for timeout seconds."""
+        while not self.done.wait(timeout):
+            if time.monotonic() - self.link.progress >= timeout:
+                raise TimeoutError(f"ISO-TP link {hex(self.link.tx_id)} stalled for {timeout:g} s")
+        if self.error is not None:
+            raise self.error
+
+class IsoTpLink:
+    """
+    Request/response channel between tx_id and rx_id; see the module
+    docstring. block_size (0 = no limit) and st_min (ms) are what this side
+    asks of a sender in its flow control frames; tx_st_min (ms) replaces the
+    STmin the other side asks for (None: obey it). With fd, frames are up to
+    tx_dl bytes (default 64) and sent with bit rate switching if brs.
+    """
+    def __init__(self, tx_id, rx_id, block_size=0, st_min=0.0, tx_st_min=None, padding=PADDING,
+                 fd=False, brs=False, tx_dl=None, extended=None):
+        tx_dl = tx_dl or (engine.FD_MAX_LENGTH if fd else 8)
+        if tx_dl not in engine.FD_LENGTHS or tx_dl < 8 or (tx_dl > 8 and not fd):
+            raise ValueError(f"tx_dl must be 8 for CAN, one of {engine.FD_LENGTHS[8:]} for CAN FD")
+        if not 0 <= block_size <= 0xFF:
+            raise ValueError("block size must be 0..255")
+        self.tx_id = tx_id
+        self.rx_id = rx_id
+        self.block_size = block_size
+        self.st_min = encode_st_min(st_min)
+        self.tx_st_min = None if tx_st_min is None else decode_st_min(encode_st_min(tx_st_min))
+        self.padding = padding
+        self.fd = fd
+        self.brs = fd and brs
+        self.tx_dl = tx_dl
+        self.extended = tx_id > 0x7FF if extended is None else extended
+        self.channel = engine.get_channel()
+        self.frames = queue.SimpleQueue()  # received single/first/consecutive frames of rx_id
+        self.flow = queue.SimpleQueue()    # received flow control frames of rx_id
+        self.jobs = queue.SimpleQueue()    # Transfer, None stops the thread
+        self.thread = None
+        self.sent_frames = 0
+        self.progress = time.monotonic()  # last frame sent or flow control received (see Transfer.wait)
+    # ---------- setup ----------
+    def open(self):
+        """Open the bus and start receiving and the link thread; raises IsoTpError if the bus is not available."""
+        if engine.remote is not None:
+            raise IsoTpError("ISO-TP is not available while the separate transmit process runs.")
+        if self.thread is not None:
+            return self
+        if self.channel.get_bus() is None:
+            raise IsoTpError(f"CAN bus {self.channel.name} is not available: {self.channel.last_error}")
+        if not pcan_receive.receiver.running() and not pcan_receive.start_receiver():
+            raise IsoTpError("Receiver could not be started: bus not available")
+        pcan_receive.receiver.add_listener(self.on_frame)
+        self.thread = threading.Thread(target=self.run, name=f"IsoTp-{self.tx_id:X}", daemon=True)
+        self.thread.start()
+        return self
+    def close(self):
+        pcan_receive.receiver.remove_listener(self.on_frame)
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join(timeout=2.0)
+            self.thread = None
+    def __enter__(self):
+        return self.open()
+    def __exit__(self, *exc):
+        self.close()
+    def on_frame(self, msg):
+        """Receiver listener (notifier thread)."""
+        if msg.arbitration_id != self.rx_id or msg.is_error_frame or msg.is_remote_frame or not msg.data:
+            return
+        if msg.data[0] >> 4 == FLOW_CONTROL:
+            self.flow.put(msg)
+        else:
+            self.frames.put(msg)
+    def clear(self):
+        """Forget frames received so far, e.g. late answers to an earlier request."""
+        for pending in (self.frames, self.flow):
+            while not pending.empty():
+                pending.get_nowait()
+    # ---------- sending ----------
+    def send(self, data, timeout=STALL_TIMEOUT):
+        """Send one message and wait until its last frame is out; raises IsoTpError/TimeoutError/can.CanError."""
+        transfer = self.send_async(data)
+        transfer.wait(timeout)
+    def send_async(self, data):
+        """Queue one message for the link thread and return its Transfer."""
+        if self.thread is None:
+            raise IsoTpError("ISO-TP link is not open")
+        transfer = Transfer(data, self)
+        self.jobs.put(transfer)
+        return transfer
+    def run(self):
+        """Send queued messages one after the other (link thread)."""
+        while True:
+            transfer = self.jobs.get()
+            if transfer is None:
+                return
+            self.progress = time.monotonic()
+            try:
+                self.transmit(transfer.data)
+            except Exception as e:  # handed to the sender; the link keeps serving the next message
+                transfer.error = e
+            finally:
+                transfer.done.set()
+    def transmit(self, data):
+        n = len(data)
+        if n <= (7 if self.tx_dl == 8 else self.tx_dl - 2):
+            self.send_frame((bytes([n]) if n <= 7 else bytes([0, n])) + data)
+            return
+        if n <= 0xFFF:
+            head = bytes([0x10 | n >> 8, n & 0xFF])
+        else:
+            head = b"\x10\x00" + n.to_bytes(4, "big")
+        first = self.tx_dl - len(head)
+        step = self.tx_dl - 1
+        while not self.flow.empty():
+            self.flow.get_nowait()  # stale flow control of an earlier message
+        self.send_frame(head + data[:first])
+        position = first
+        sequence = 1
+        send_queue = self.channel.queue
+        while position < n:
+            block_size, st_min = self.wait_flow_control()
+            if self.tx_st_min is not None:
+                st_min = self.tx_st_min
+            remaining = block_size or n
+            due = 0.0
+            while position < n and remaining:
+                while not send_queue.idle():
+                    time.sleep(YIELD_DELAY)  # cyclic frames first
+                if st_min:
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.send_frame(bytes([0x20 | sequence]) + data[position:position + step])
+                due = time.perf_counter() + st_min
+                position += step
+                sequence = (sequence + 1) & 0xF
+                remaining -= 1
+    def wait_flow_control(self):
+        """(block size, STmin in s) of the receiver's next "continue" flow control frame."""
+        waits = 0
+        while True:
+            try:
+                msg = self.flow.get(timeout=N_BS_TIMEOUT)
+            except queue.Empty:
+                raise TimeoutError(f"No flow control from {hex(self.rx_id)} within {N_BS_TIMEOUT:g} s") from None
+            self.progress = time.monotonic()
+            data = msg.data
+            status = data[0] & 0xF
+            if len(data) < 3 or status > OVERFLOW:
+                raise IsoTpError(f"Invalid flow control frame from {hex(self.rx_id)}: {bytes(data).hex()}")
+            if status == OVERFLOW:
+                raise IsoTpError(f"{hex(self.rx_id)} cannot take a message of this length (overflow)")
+            if status == CONTINUE:
+                return data[1], decode_st_min(data[2])
+            waits += 1
+            if waits > MAX_WAIT_FRAMES:
+                raise IsoTpError(f"{hex(self.rx_id)} sent more than {MAX_WAIT_FRAMES} wait frames")
+    def send_frame(self, payload):
+        """Pad payload to a valid frame length and send it, retrying a busy adapter up to N_AS_TIMEOUT."""
+        length = engine.fd_length(len(payload)) if self.fd else 8
+        if len(payload) < length and (self.padding is not None or self.fd):
+            payload = payload + bytes([self.padding or 0]) * (length - len(payload))
+        message = can.Message(timestamp=time.time(), arbitration_id=self.tx_id, data=payload,
+                              is_extended_id=self.extended, is_fd=self.fd, bitrate_switch=self.brs,
+                              is_rx=False, channel=self.channel.index)
+        deadline = None
+        while True:
+            bus = self.channel.bus
+            if bus is None:
+                raise IsoTpError(f"CAN bus {self.channel.name} is not connected")
+            try:
+                bus.send(message, SEND_TIMEOUT)
+                break
+            except can.CanError as e:
+                now = time.monotonic()
+                deadline = deadline or now + N_AS_TIMEOUT
+                if now >= deadline:
+                    raise IsoTpError(f"CAN Error for {hex(self.tx_id)} on {self.channel.name}: {e}") from None
+                time.sleep(YIELD_DELAY)
+        self.sent_frames += 1
+        self.progress = time.monotonic()
+        tracer = engine.tracer
+        if tracer is not None:
+            tracer.log(message)
+    def send_flow_control(self, status):
+        self.send_frame(bytes([0x30 | status, self.block_size, self.st_min]))
+    # ---------- receiving ----------
+    def receive(self, timeout=N_BS_TIMEOUT):
+        """
+        The next complete message from rx_id as bytes, waiting up to timeout
+        seconds for it to start; raises TimeoutError, or IsoTpError when a
+        multi-frame message breaks off. A first or single frame during a
+        multi-frame message starts over with the new message.
+        """
+        deadline = time.monotonic() + timeout
+        buffer = None
+        length = 0
+        while True:
+            wait = N_CR_TIMEOUT if buffer is not None else deadline - time.monotonic()
+            try:
+                msg = self.frames.get(timeout=max(wait, 0))
+            except queue.Empty:
+                if buffer is not None:
+                    raise IsoTpError(f"Consecutive frame from {hex(self.rx_id)} missing after "
+                                     f"{len(buffer)} of {length} bytes") from None
+                raise TimeoutError(f"No response from {hex(self.rx_id)} within {timeout:g} s") from None
+            data = msg.data
+            kind = data[0] >> 4
+            if kind == SINGLE:
+                n = data[0] & 0xF
+                start = 1
+                if n == 0 and len(data) > 8:
+                    n = data[1]
+                    start = 2
+                return bytes(data[start:start + n])
+            if kind == FIRST:
+                length = (data[0] & 0xF) << 8 | data[1]
+                start = 2
+                if length == 0:
+                    length = int.from_bytes(data[2:6], "big")
+                    start = 6
+                if length > RX_MAX_LENGTH:
+                    self.send_flow_control(OVERFLOW)
+                    raise IsoTpError(f"Message of {length} bytes from {hex(self.rx_id)} refused (overflow)")
+                buffer = bytearray(data[start:])
+                sequence = 1
+                block = 0
+                self.send_flow_control(CONTINUE)
+                continue
+            if kind != CONSECUTIVE or buffer is None:
+                continue  # stray consecutive frame, or a reserved PCI
+            if data[0] & 0xF != sequence:
+                raise IsoTpError(f"Wrong sequence number from {hex(self.rx_id)}: "
+                                 f"{data[0] & 0xF} instead of {sequence}")
+            buffer += data[1:]
+            if len(buffer) >= length:
+                return bytes(buffer[:length])
+            sequence = (sequence + 1) & 0xF
+            block += 1
+            if self.block_size and block == self.block_size:
+                block = 0
+                self.send_flow_control(CONTINUE)
@@ -0,0 +1,433 @@
+"""
+Process-isolated transmission.
+
+start() moves all sending into a child process, so Tk redraws, garbage
+collection or anything else holding the front end's GIL cannot delay frames.
+The front end keeps its parameter model in pcan_engine (saved_parameters,
+transmissions, bus load checks) and engine.remote routes everything else:
+
+  values    Parameter.set_value() writes into a SharedValues block, a fixed
+            array indexed by parameter slot with a sequence lock per slot. This
+            never blocks; the child picks changes up within POLL_INTERVAL and
+            encodes the frames itself.
+  control   added/removed parameters, enable/disable, timing, config and bus
+            setting changes go over a pipe as diffs of the model (push()).
+  readback  values the child changes itself (generators, counters, checksums)
+            come back through a second array of the block, transmit statistics
+            as pipe messages; poll() applies both.
+
+The child runs an ordinary pcan_engine with its own buses; its load budget is
+off since the front end already checked it. Frames the child sends are not
+written to engine.tracer and, on the virtual interface, not seen by a receiver
+in the front end process.
+"""
+import math
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+
+import pcan_engine as engine
+
+INITIAL_CAPACITY = 256      # parameter slots; the block is replaced by a larger one when full
+TEXT_BYTES = engine.FD_MAX_LENGTH  # ASCII values are at most one FD frame
+POLL_INTERVAL = 0.002       # s, how often the child looks for value changes
+READBACK_INTERVAL = 0.05    # s, how often the child publishes values it changed itself
+STATS_INTERVAL = 0.5        # s, minimum age of a statistics report before a new one is requested
+STOP_TIMEOUT = 3.0
+NUMERIC = 0xFFFFFFFF        # in_length of a slot holding a number instead of text
+READ_RETRIES = 8
+
+def align8(offset):
+    return (offset + 7) & ~7
+
+class SharedValues:
+    """
+    Parameter values in one shared memory block, one entry per slot:
+      header     u32 in_generation, u32 out_generation
+      in_seq     u32[capacity]  \\
+      in_value   f64[capacity]   | front end -> transmit process
+      in_length  u32[capacity]   | (text length, or NUMERIC)
+      in_text    TEXT_BYTES per slot
+      out_seq    u32[capacity]  \\ transmit process -> front end
+      out_value  f64[capacity]  /
+    Each direction has a single writer. A write makes the slot's sequence odd,
+    stores the value, makes it even again and then bumps the generation, so a
+    reader only rescans after a change and only takes a value whose sequence
+    was even and unchanged around the read.
+    """
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        regions = []
+        offset = 8
+        for fmt, size in (("I", 4), ("d", 8), ("I", 4), ("B", TEXT_BYTES), ("I", 4), ("d", 8)):
+            if fmt == "d":
+                offset = align8(offset)
+            regions.append((fmt, offset, offset + size * capacity))
+            offset += size * capacity
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=offset)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        self.views = [buf[0:8].cast("I")]
+        for fmt, start, end in regions:
+            self.views.append(buf[start:end].cast(fmt))
+        self.header, self.in_seq, self.in_value, self.in_length, self.in_text, self.out_seq, self.out_value = self.views
+    def close(self):
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.shm.close()
+    def unlink(self):
+        self.shm.unlink()
+    def copy_from(self, other):
+        """Take over the slots of a smaller block (front end side, when growing)."""
+        n = other.capacity
+        self.in_seq[:n] = other.in_seq
+        self.in_value[:n] = other.in_value
+        self.in_length[:n] = other.in_length
+        self.in_text[:n * TEXT_BYTES] = other.in_text
+        self.out_seq[:n] = other.out_seq
+        self.out_value[:n] = other.out_value
+        self.header[0] = other.header[0]
+        self.header[1] = other.header[1]
+    def write(self, slot, value):
+        """Store a parameter value (float, or str for ASCII) for the transmit process."""
+        seq = self.in_seq
+        seq[slot] = (seq[slot] + 1) & 0xFFFFFFFF
+        if isinstance(value, str):
+            data = bytes(ord(ch) & 0xFF for ch in value[:TEXT_BYTES])
+            start = slot * TEXT_BYTES
+            self.in_text[start:start + len(data)] = data
+            self.in_length[slot] = len(data)
+        else:
+            self.in_value[slot] = float(value)
+            self.in_length[slot] = NUMERIC
+        seq[slot] = (seq[slot] + 1) & 0xFFFFFFFF
+        self.header[0] = (self.header[0] + 1) & 0xFFFFFFFF
+    def read(self, slot):
+        """(sequence, value) of slot, or None while it is being written."""
+        seq = self.in_seq
+        for _ in range(READ_RETRIES):
+            before = seq[slot]
+            if before & 1:
+                continue
+            length = self.in_length[slot]
+            if length == NUMERIC:
+                value = self.in_value[slot]
+            else:
+                start = slot * TEXT_BYTES
+                value = bytes(self.in_text[start:start + min(length, TEXT_BYTES)]).decode("latin-1")
+            if seq[slot] == before:
+                return before, value
+        return None
+    def publish(self, slot, value):
+        """Store a value the transmit process changed itself for the front end."""
+        seq = self.out_seq
+        seq[slot] = (seq[slot] + 1) & 0xFFFFFFFF
+        self.out_value[slot] = float(value)
+        seq[slot] = (seq[slot] + 1) & 0xFFFFFFFF
+        self.header[1] = (self.header[1] + 1) & 0xFFFFFFFF
+    def read_published(self, slot):
+        seq = self.out_seq
+        for _ in range(READ_RETRIES):
+            before = seq[slot]
+            if before & 1:
+                continue
+            value = self.out_value[slot]
+            if seq[slot] == before:
+                return before, value
+        return None
+
+def changed_slots(sequences, seen):
+    return [slot for slot, (seq, old) in enumerate(zip(sequences, seen)) if seq != old]
+
+# ---------- Front End Side ----------
+class EngineProcess:
+    """The front end's handle on the transmit process; installed as engine.remote by start()."""
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.values = SharedValues(capacity)
+        self.lock = threading.Lock()  # one writer for the values and the pipe
+        self.slots = {}       # Parameter -> slot
+        self.params = {}      # slot -> Parameter
+        self.free = []        # released slots, reused before the block grows
+        self.next_slot = 0
+        self.sent = {}        # slot -> (config, enabled) as last pushed
+        self.sent_bus = None
+        self.sent_options = None
+        self.out_generation = None
+        self.out_seen = [0] * capacity
+        self.report = {"channels": {}, "connections": {}}
+        self.timing_lines = []
+        self.stats_requested = None  # time of the outstanding request
+        self.stats_received = 0.0
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=child_main, args=(child_conn, self.values.name, capacity),
+                                       name="pcan-transmit", daemon=True)
+        self.process.start()
+        child_conn.close()
+        print(f"Transmit process started (pid {self.process.pid}).")
+    def send(self, message):
+        try:
+            self.conn.send(message)
+        except (OSError, ValueError) as e:
+            print(f"Transmit process unavailable: {e}")
+    def allocate(self):
+        if self.free:
+            return self.free.pop()
+        if self.next_slot == self.values.capacity:
+            self.grow()
+        self.next_slot += 1
+        return self.next_slot - 1
+    def grow(self):
+        """Move to a block of twice the capacity; the child switches on the "resize" message."""
+        old = self.values
+        self.values = SharedValues(old.capacity * 2)
+        self.values.copy_from(old)
+        self.out_seen.extend([0] * old.capacity)
+        self.send(("resize", self.values.name, self.values.capacity))
+        old.close()
+        old.unlink()
+    def push(self):
+        """Send everything that changed in the parameter model since the last push."""
+        with self.lock:
+            state = {}
+            bus = (dict(engine.bus_config), {name: dict(o) for name, o in engine.channel_settings.items()})
+            if bus != self.sent_bus:
+                state["bus"] = self.sent_bus = bus
+            options = {"use_periodic_tasks": engine.use_periodic_tasks, "phase_offsets": engine.phase_offsets,
+                       "send_queue": (engine.send_queue_policy, engine.send_queue_limit)}
+            if options != self.sent_options:
+                state["options"] = self.sent_options = options
+            current = set()
+            params = {}
+            for param in engine.saved_parameters:
+                slot = self.slots.get(param)
+                if slot is None:
+                    slot = self.slots[param] = self.allocate()
+                    self.params[slot] = param
+                current.add(slot)
+                old = self.sent.get(slot)
+                if old is None or old[1] != param.enabled or old[0] != param.config:
+                    self.sent[slot] = (dict(param.config), param.enabled)
+                    params[slot] = (dict(param.config), param.enabled, param.value, self.values.in_seq[slot])
+            removed = [slot for slot in self.sent if slot not in current]
+            for slot in removed:
+                del self.sent[slot]
+                del self.slots[self.params.pop(slot)]
+                self.free.append(slot)
+            if removed:
+                state["removed"] = removed
+            if params:
+                state["params"] = params
+            if state:
+                self.send(("state", state))
+    def value_changed(self, param):
+        with self.lock:
+            slot = self.slots.get(param)
+            if slot is not None:
+                self.values.write(slot, param.value)
+    def poll(self):
+        """Handle messages of the transmit process and copy the values it changed into the parameters."""
+        try:
+            while self.conn.poll():
+                message = self.conn.recv()
+                if message[0] == "stats":
+                    self.report, self.timing_lines = message[1], message[2]
+                    self.stats_requested = None
+                    self.stats_received = time.monotonic()
+                elif message[0] == "error" and engine.bus_error_handler is not None:
+                    engine.bus_error_handler(message[1])
+        except (EOFError, OSError):
+            pass
+        with self.lock:
+            values = self.values
+            generation = values.header[1]
+            if generation == self.out_generation:
+                return
+            self.out_generation = generation
+            sequences = values.out_seq.tolist()
+            for slot in changed_slots(sequences, self.out_seen):
+                result = values.read_published(slot)
+                if result is None:
+                    self.out_generation = None  # look again next time
+                    continue
+                self.out_seen[slot], value = result
+                param = self.params.get(slot)
+                if param is not None:
+                    param.value = value
+    def request_stats(self):
+        now = time.monotonic()
+        if self.stats_requested is None and now - self.stats_received >= STATS_INTERVAL:
+            self.stats_requested = now
+            self.send(("stats",))
+    def stats_report(self):
+        """Latest statistics report of the transmit process (see engine.stats_report)."""
+        self.poll()
+        self.request_stats()
+        return self.report
+    def timing_report_lines(self):
+        self.poll()
+        self.request_stats()
+        return self.timing_lines
+    def reset_stats(self):
+        self.send(("reset_stats",))
+    def stop(self):
+        """Stop the transmit process and release the shared block."""
+        if engine.remote is self:
+            engine.remote = None
+        self.send(("stop",))
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(STOP_TIMEOUT)
+        self.conn.close()
+        with self.lock:
+            self.values.close()
+            self.values.unlink()
+        print("Transmit process stopped.")
+
+def start(capacity=INITIAL_CAPACITY):
+    """Move the sending of every channel into a transmit process; returns its EngineProcess."""
+    if engine.remote is not None:
+        return engine.remote
+    for channel in list(engine.channels.values()):
+        channel.close()  # the transmit process opens the buses itself
+    remote = EngineProcess(capacity)
+    engine.remote = remote
+    remote.push()
+    return remote
+
+def stop():
+    """Stop the transmit process and send from this process again."""
+    remote = engine.remote
+    if remote is None:
+        return
+    remote.stop()
+    enabled = [param for param in engine.saved_parameters if param.enabled]
+    engine.disable_parameters(enabled)
+    engine.open_and_enable(enabled, refuse=False)
+
+# ---------- Transmit Process Side ----------
+def newer(seq, other):
+    """True if sequence seq was written after other (both wrap at 2 ** 32)."""
+    return seq != other and (seq - other) & 0xFFFFFFFF < 0x80000000
+
+def apply_state(state, params, seen):
+    """
+    Bring this process's engine to a state pushed by EngineProcess.push().
+    Each pushed value comes with the slot's sequence at push time, so a value
+    already taken from the shared block is not replaced by an older one.
+    """
+    options = state.get("options")
+    if options:
+        engine.phase_offsets = options["phase_offsets"]
+        engine.set_send_queue(*options["send_queue"])
+        restart = engine.use_periodic_tasks != options["use_periodic_tasks"]
+        engine.use_periodic_tasks = options["use_periodic_tasks"]
+        if restart:
+            engine.restart_transmissions()
+    if "bus" in state:
+        bus_config, overrides = state["bus"]
+        engine.configure_bus(dict(bus_config, channels=overrides))
+    to_disable = []
+    for slot in state.get("removed", ()):
+        param = params.pop(slot)
+        engine.saved_parameters.remove(param)
+        to_disable.append(param)
+    to_enable = []
+    for slot, (config, enabled, value, seq) in state.get("params", {}).items():
+        param = params.get(slot)
+        if param is None:
+            param = params[slot] = engine.make_parameter(config)
+            param.value = value
+            param.payload = param.encode_payload()
+            engine.saved_parameters.append(param)
+            seen[slot] = seq
+        else:
+            if not newer(seen[slot], seq):
+                seen[slot] = seq
+                param.set_value(value)
+            if config != param.config:
+                param.set_config(config)
+        if enabled and not param.enabled:
+            to_enable.append(param)
+        elif not enabled and param.enabled:
+            to_disable.append(param)
+    engine.disable_parameters(to_disable)
+    engine.open_and_enable(to_enable, refuse=False)
+
+def published_slots(params):
+    """Slots whose value this process changes by itself while sending."""
+    return [slot for slot, param in params.items() if param.enabled and (
+        param.generator is not None or isinstance(param, (engine.CounterParameter, engine.ChecksumParameter)))]
+
+def child_main(conn, name, capacity):
+    """Entry point of the transmit process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the front end decides when to stop
+    engine.bus_load_budget = math.inf
+    engine.wait_for_bus = False  # keep taking values while a bus (re)connects
+    engine.bus_error_handler = lambda message: conn.send(("error", message))
+    values = SharedValues(capacity, name)
+    params = {}  # slot -> Parameter
+    seen = values.in_seq.tolist()
+    generation = None
+    live = []
+    published = {}
+    next_readback = time.monotonic()
+    try:
+        while True:
+            if conn.poll(POLL_INTERVAL):
+                message = conn.recv()
+                kind = message[0]
+                if kind == "stop":
+                    break
+                try:
+                    if kind == "state":
+                        for slot in message[1].get("removed", ()):
+                            published.pop(slot, None)
+                        apply_state(message[1], params, seen)
+                        live = published_slots(params)
+                    elif kind == "resize":
+                        values.close()
+                        values = SharedValues(message[2], message[1])
+                        seen.extend(values.in_seq[len(seen):])
+                        generation = None
+                        published.clear()  # values published into the old block meanwhile are not in the copy
+                    elif kind == "stats":
+                        conn.send(("stats", engine.stats_report(), engine.timing_report_lines()))
+                    elif kind == "reset_stats":
+                        engine.reset_stats()
+                except ValueError as e:
+                    print(f"Transmit process: {e}")
+                    conn.send(("error", str(e)))
+            current = values.header[0]
+            if current != generation:
+                generation = current
+                for slot in changed_slots(values.in_seq.tolist(), seen):
+                    result = values.read(slot)
+                    if result is None:
+                        generation = None  # caught mid-write, look again
+                        continue
+                    seen[slot], value = result
+                    param = params.get(slot)
+                    if param is not None:
+                        param.set_value(value)
+            now = time.monotonic()
+            if live and now >= next_readback:
+                next_readback = now + READBACK_INTERVAL
+                for slot in live:
+                    param = params.get(slot)
+                    if param is not None and published.get(slot) != param.value:
+                        published[slot] = param.value
+                        values.publish(slot, param.value)
+    except (EOFError, OSError):
+        pass  # front end went away
+    finally:
+        engine.shutdown()
+        values.close()
+        conn.close()
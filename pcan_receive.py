@@ -0,0 +1,220 @@
+"""
+Receive path for the CAN engine.
+
+A can.Notifier thread hands every received frame to `receiver`, which appends
+it to a fixed-size ring buffer; the receiver's decoder thread drains the ring
+by cursor and decodes the frames through a dictionary of arbitration ID ->
+decoders. The decoders are compiled from the same config
+schema that NumericParameter/ASCIIParameter encode (size, type, resolution,
+offset, and start_bit/byte_order or mapping/target_byte), numeric ones through
+the same engine.SignalLayout. Front ends only read the latest decoded values at
+their own rate, so a fully loaded bus never reaches the UI event loop.
+"""
+import threading
+
+import can
+
+import pcan_engine as engine
+
+DECODE_INTERVAL = 0.005  # s, how often the decoder thread looks at an empty ring
+
+# ---------- Ring Buffer ----------
+class FrameRing:
+    """
+    Preallocated single-producer ring of received can.Message objects.
+    The reader thread writes a slot and then advances `head`; each consumer
+    keeps its own cursor and calls read() without taking a lock. A consumer
+    that falls more than `size` frames behind loses the oldest ones and is
+    told how many were dropped.
+    """
+    def __init__(self, size=65536):
+        self.size = size
+        self.slots = [None] * size
+        self.head = 0  # total frames ever pushed
+    def push(self, msg):
+        self.slots[self.head % self.size] = msg
+        self.head += 1
+    def cursor(self):
+        """Cursor that starts reading at the next frame to arrive."""
+        return self.head
+    def read(self, cursor, max_items=None):
+        """Return (frames, new_cursor, dropped) for everything after cursor."""
+        head = self.head
+        dropped = 0
+        if head - cursor > self.size:
+            dropped = head - cursor - self.size
+            cursor = head - self.size
+        end = head if max_items is None else min(head, cursor + max_items)
+        frames = [self.slots[i % self.size] for i in range(cursor, end)]
+        # Slots the producer overwrote while we were copying are no longer valid.
+        overwritten = self.head - self.size - cursor
+        if overwritten > 0:
+            overwritten = min(overwritten, len(frames))
+            frames = frames[overwritten:]
+            dropped += overwritten
+        return frames, end, dropped
+
+# ---------- Decoders ----------
+def make_decoder(config):
+    """
+    Build the inverse of the parameter's encode_payload(): a function taking
+    the frame data and returning the physical value (a float, or a str for
+    ASCII parameters), or None if the frame is too short.
+    """
+    if config.get("mode") == "ascii":
+        mapping = [int(pos) for pos in config["mapping"]]
+        needed = max(mapping) + 1
+        def decode_ascii(data):
+            if len(data) < needed:
+                return None
+            return bytes(data[pos] for pos in mapping).decode("latin-1").rstrip(" ")
+        return decode_ascii
+    resolution = float(config["resolution"])
+    offset = float(config.get("offset", 0))
+    layout = engine.SignalLayout(config)
+    needed = layout.needed_bytes
+    unpack = layout.unpack
+    def decode(data):
+        if len(data) < needed:
+            return None
+        return unpack(int.from_bytes(data, "little")) * resolution + offset
+    return decode
+
+def build_decoders(configs):
+    """Compile configs into {can_id: [((can_id, name), decoder), ...]}."""
+    decoders = {}
+    for config in configs:
+        try:
+            decoder = make_decoder(config)
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"Skipping RX signal '{config.get('name')}': {e}")
+            continue
+        can_id = config["can_id"]
+        decoders.setdefault(can_id, []).append(((can_id, config["name"]), decoder))
+    return decoders
+
+# ---------- Receiver ----------
+class Receiver(can.Listener):
+    """
+    Listener fed by a can.Notifier. on_message_received runs on the notifier
+    thread: it counts and traces the frame, hands it to the listeners and
+    pushes it into the ring. The decoder thread reads the ring and updates
+    `values`, which maps (can_id, signal name) -> (timestamp, value) and is
+    only ever replaced key by key, so readers can take a snapshot with
+    latest_values() at any time. Frames the decoder falls more than the ring
+    size behind on are counted in `dropped`.
+    """
+    def __init__(self, ring_size=65536):
+        self.ring = FrameRing(ring_size)
+        self.decoders = {}
+        self.configs = []
+        self.values = {}
+        self.received = 0
+        self.errors = 0
+        self.dropped = 0
+        self.notifier = None
+        self.decoder = None
+        self.decoder_stop = None
+        self.bus = None
+        self.resume = False  # restart when the default channel's bus is opened again
+        self.listeners = ()  # called with every frame on the notifier thread; replaced, never mutated
+    def set_signals(self, configs):
+        """Replace the decode table; takes effect with the next received frame."""
+        self.decoders = build_decoders(configs)
+        self.configs = list(configs)
+        self.values = {}
+    def start(self, bus):
+        if self.notifier is None:
+            self.bus = bus
+            self.decoder_stop = threading.Event()
+            self.decoder = threading.Thread(target=self.run_decoder, args=(self.ring.cursor(), self.decoder_stop),
+                                            name="Decoder", daemon=True)
+            self.decoder.start()
+            self.notifier = can.Notifier(bus, [self], timeout=0.1)
+    def shutdown(self):
+        # Not named stop(): can.Notifier.stop() calls Listener.stop() on its listeners.
+        self.resume = False
+        if self.notifier is not None:
+            notifier = self.notifier
+            self.notifier = None
+            self.bus = None
+            notifier.stop()
+            self.decoder_stop.set()
+            self.decoder.join(timeout=1.0)
+            self.decoder = None
+    def bus_closing(self, bus):
+        if bus is self.bus:
+            self.shutdown()
+            self.resume = True
+    def bus_opened(self, channel, bus):
+        """Pick up receiving again after a reconnect or bus change (connector thread)."""
+        if self.resume and channel is engine.get_channel():
+            self.resume = False
+            self.start(bus)
+    def running(self):
+        return self.notifier is not None
+    def add_listener(self, listener):
+        self.listeners = self.listeners + (listener,)
+    def remove_listener(self, listener):
+        self.listeners = tuple(item for item in self.listeners if item != listener)  # bound methods compare equal
+    def on_message_received(self, msg):
+        self.received += 1
+        tracer = engine.tracer
+        if tracer is not None:
+            tracer.log(msg)
+        for listener in self.listeners:
+            listener(msg)
+        self.ring.push(msg)
+    def run_decoder(self, cursor, stop_event):
+        """Decode what arrives in the ring until stop_event is set (decoder thread)."""
+        ring = self.ring
+        while True:
+            frames, cursor, dropped = ring.read(cursor)
+            self.dropped += dropped
+            if frames:
+                self.decode(frames)
+            elif stop_event.wait(DECODE_INTERVAL):
+                return
+    def decode(self, frames):
+        table = self.decoders
+        values = self.values
+        for msg in frames:
+            if msg.is_error_frame or msg.is_remote_frame:
+                continue
+            decoders = table.get(msg.arbitration_id)
+            if decoders is None:
+                continue
+            data = msg.data
+            timestamp = msg.timestamp
+            for key, decode in decoders:
+                value = decode(data)
+                if value is not None:
+                    values[key] = (timestamp, value)
+    def on_error(self, exc):
+        self.errors += 1
+        print(f"CAN receive error: {exc}")
+    def latest_values(self):
+        # dict() of a plain dict copies in one C call while holding the GIL.
+        return dict(self.values)
+
+def saved_signal_configs():
+    """Configs of the saved parameters that live on the default channel, which the receiver listens to."""
+    default = engine.get_channel()
+    return [param.config for param in engine.saved_parameters
+            if engine.get_channel(param.config.get("channel")) is default]
+
+receiver = Receiver()
+# The notifier must stop reading before its bus is closed (e.g. on a bus change).
+engine.bus_closing_handlers.append(receiver.bus_closing)
+engine.bus_opened_handlers.append(receiver.bus_opened)
+
+def start_receiver(configs=None):
+    """Open the default channel's bus if needed and start receiving; configs default to the saved parameters."""
+    bus = engine.get_global_bus()
+    if bus is None:
+        return False
+    if configs is None:
+        configs = saved_signal_configs()
+    receiver.set_signals(configs)
+    receiver.start(bus)
+    return True
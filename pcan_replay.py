@@ -0,0 +1,170 @@
+"""
+Replay of recorded CAN logs onto a bus.
+
+A log (.asc, .blf, .csv, .log, ... anything can.LogReader opens) is streamed
+through a chain of generators, so even multi-GB drive-cycle captures are
+never held in memory:
+
+  read_frames    can.LogReader, data and remote frames only
+  filter_frames  allow/deny lists of CAN IDs
+  paced_frames   each frame with the monotonic time it is due at: the gap to
+                 the first frame's timestamp divided by the speed factor
+                 (SPEED_MIN..SPEED_MAX), or no waiting at all with speed 0;
+                 with loop the log starts over after its last frame
+
+A Replay sends on an engine Channel from its own thread. With overlay, IDs
+the channel itself transmits (parameters enabled in the engine) are left out
+of the replay, checked per frame, so edited parameters replace their recorded
+frames while the rest of the recording keeps going. Frames of every recorded
+channel go to the one replay channel. Replay sends from this process; it is
+not available while engine.remote runs the transmissions elsewhere.
+"""
+import itertools
+import threading
+import time
+
+import can
+
+import pcan_engine as engine
+
+SPEED_MIN = 0.5
+SPEED_MAX = 10.0
+AS_FAST_AS_POSSIBLE = 0  # speed
+SEND_TIMEOUT = 0.1       # s; a frame the bus does not take by then is counted as an error
+
+def parse_ids(text):
+    """Set of CAN IDs from "0x100, 1A0 7FF" (hex, separated by commas or spaces); None if empty."""
+    ids = {engine.parse_can_id(part) for part in text.replace(",", " ").split()}
+    return ids or None
+
+def read_frames(path):
+    """The data and remote frames of a log file, read lazily."""
+    with can.LogReader(path) as reader:
+        for msg in reader:
+            if not msg.is_error_frame:
+                yield msg
+
+def filter_frames(frames, allow=None, deny=None):
+    for msg in frames:
+        can_id = msg.arbitration_id
+        if (allow is None or can_id in allow) and (deny is None or can_id not in deny):
+            yield msg
+
+def paced_frames(open_frames, speed, loop=False, start=None):
+    """
+    (due, msg) for the frames of open_frames() with due on time.monotonic().
+    Timestamps that go backwards are sent right after the previous frame.
+    open_frames is called again for every loop pass.
+    """
+    base = time.monotonic() if start is None else start
+    for _ in itertools.count() if loop else range(1):
+        first = None
+        due = base
+        for msg in open_frames():
+            if first is None:
+                first = msg.timestamp
+            if speed:
+                due = max(due, base + (msg.timestamp - first) / speed)
+            yield due, msg
+        if first is None:
+            return  # nothing passes the filters; looping would spin
+        base = due if not speed else max(due, time.monotonic())
+
+class Replay:
+    """One log being sent onto a channel; see the module docstring."""
+    def __init__(self, path, speed=1.0, allow=None, deny=None, loop=False, overlay=True, channel=None):
+        if speed != AS_FAST_AS_POSSIBLE and not SPEED_MIN <= speed <= SPEED_MAX:
+            raise ValueError(f"replay speed must be {SPEED_MIN:g}..{SPEED_MAX:g} or 0 (as fast as possible)")
+        self.path = path
+        self.speed = speed
+        self.allow = allow
+        self.deny = deny
+        self.loop = loop
+        self.overlay = overlay
+        self.channel = engine.get_channel(channel)
+        self.sent = 0
+        self.errors = 0
+        self.overlaid = 0   # frames left out because the channel transmits their ID itself
+        self.late_max = 0.0  # s, worst delay of a frame behind its due time
+        self.error = None
+        self.stop_event = threading.Event()
+        self.thread = None
+    def frames(self):
+        return filter_frames(read_frames(self.path), self.allow, self.deny)
+    def start(self):
+        if engine.remote is not None:
+            raise ValueError("Replay is not available while the separate transmit process runs.")
+        can.LogReader(self.path).stop()  # fail here on a missing file or unknown format
+        self.thread = threading.Thread(target=self.run, name="Replay", daemon=True)
+        self.thread.start()
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+    def run(self):
+        channel = self.channel
+        stop_event = self.stop_event
+        channel.connect()
+        if not channel.opened.wait(engine.BUS_OPEN_TIMEOUT) or channel.bus is None:
+            self.error = f"CAN bus {channel.name} is not available: {channel.last_error}"
+            print(f"Replay of {self.path} stopped. {self.error}")
+            return
+        index = channel.index
+        transmissions = channel.transmissions
+        try:
+            for due, msg in paced_frames(self.frames, self.speed, self.loop):
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    if stop_event.wait(remaining):
+                        break
+                elif stop_event.is_set():
+                    break
+                elif self.speed:
+                    self.late_max = max(self.late_max, -remaining)
+                can_id = msg.arbitration_id
+                if self.overlay and can_id in transmissions:
+                    self.overlaid += 1
+                    continue
+                bus = channel.bus
+                if bus is None:  # reconnecting; frames due meanwhile are lost
+                    self.errors += 1
+                    continue
+                message = can.Message(timestamp=time.time(), arbitration_id=can_id, data=msg.data,
+                                      dlc=msg.dlc, is_extended_id=msg.is_extended_id,
+                                      is_remote_frame=msg.is_remote_frame, is_fd=msg.is_fd,
+                                      bitrate_switch=msg.bitrate_switch, is_rx=False, channel=index)
+                try:
+                    bus.send(message, SEND_TIMEOUT)
+                except can.CanError as e:
+                    self.errors += 1
+                    if self.errors == 1:
+                        print(f"Replay: CAN Error for {hex(can_id)} on {channel.name}: {e}")
+                    continue
+                self.sent += 1
+                tracer = engine.tracer
+                if tracer is not None:
+                    tracer.log(message)
+        except Exception as e:  # unreadable or truncated log
+            self.error = str(e)
+            print(f"Replay of {self.path} failed: {e}")
+        print(f"Replay of {self.path}: {self.sent} frames sent, {self.errors} errors.")
+    def status(self):
+        return {"running": self.running(), "sent": self.sent, "errors": self.errors, "overlaid": self.overlaid,
+                "late_max_ms": self.late_max * 1000.0, "error": self.error}
+
+replay = None  # the running (or last) Replay
+
+def start_replay(path, **options):
+    """Stop a running replay and start path; options as for Replay. Raises ValueError/OSError."""
+    global replay
+    stop_replay()
+    new = Replay(path, **options)
+    new.start()
+    replay = new
+    return new
+
+def stop_replay():
+    if replay is not None:
+        replay.stop()
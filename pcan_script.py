@@ -0,0 +1,102 @@
+"""
+Asyncio scripting API for automated test sequences.
+
+Scripts drive the engine's parameters directly, without Tk:
+
+    import asyncio
+    import pcan_engine as engine
+    import pcan_script as script
+
+    async def sequence():
+        await script.set("EngineSpeed", 800)
+        await script.update({"Gear": 1, "Throttle": 12.5})   # same frame, together
+        await script.ramp("EngineSpeed", 800, 3000, duration=2.0)
+        msg = await script.wait_for_rx(0x18FF00F9, lambda msg: msg.data[0] == 1, timeout=1.0)
+
+    engine.load_profile("rig.json")
+    asyncio.run(sequence())
+
+Signals are parameter names or engine Parameter objects. Values only change
+the parameter's payload: the next cyclic frame of its CAN ID carries them
+and no extra frame is sent (on-change frames are triggered as usual), so a
+script can make thousands of updates per second. update() goes through
+engine.set_values(), so the parameters of one frame never go out half
+updated. wait_for_rx() listens on the default channel through
+pcan_receive.receiver, which it starts if needed.
+"""
+import asyncio
+
+import pcan_engine as engine
+import pcan_receive
+
+names = {}  # parameter name -> Parameter, rebuilt when a name is not found
+
+def parameter(signal):
+    """The Parameter called signal (or signal itself); raises KeyError."""
+    if isinstance(signal, engine.Parameter):
+        return signal
+    param = names.get(signal)
+    if param is None or param.config.get("name") != signal or param not in engine.saved_parameters:
+        names.clear()
+        names.update((param.config.get("name"), param) for param in engine.saved_parameters)
+        param = names.get(signal)
+        if param is None:
+            raise KeyError(f"No parameter named {signal!r}")
+    return param
+
+async def set(signal, value):
+    """Set one parameter; it goes out with the next frame of its CAN ID."""
+    parameter(signal).set_value(value)
+    await asyncio.sleep(0)
+
+async def update(values):
+    """Set {signal: value, ...} as one batch (see engine.set_values)."""
+    engine.set_values([(parameter(signal), value) for signal, value in values.items()])
+    await asyncio.sleep(0)
+
+async def ramp(signal, start, end, duration, step=None):
+    """
+    Move a numeric parameter from start to end over duration seconds, one
+    value every step seconds (default: the parameter's cycle time, so every
+    frame carries a new value and none is skipped). Steps are timed against
+    the event loop clock, so a slow step does not delay the following ones.
+    """
+    param = parameter(signal)
+    if step is None:
+        step = float(param.config.get("cycle_time", 100)) / 1000.0
+    count = max(1, int(round(duration / step))) if step > 0 else 1
+    loop = asyncio.get_running_loop()
+    begin = loop.time()
+    for i in range(count + 1):
+        param.set_value(start + (end - start) * i / count)
+        if i < count:
+            await asyncio.sleep(max(begin + (i + 1) * duration / count - loop.time(), 0))
+
+async def start_receiver():
+    """Start pcan_receive.receiver on the default channel unless it runs; False if its bus is unavailable."""
+    if pcan_receive.receiver.running():
+        return True
+    return await asyncio.to_thread(pcan_receive.start_receiver)
+
+async def wait_for_rx(can_id, predicate=None, timeout=None):
+    """
+    The next received can.Message with can_id for which predicate(msg) is
+    true (any, without predicate). predicate runs on the receive thread and
+    should be quick. Raises TimeoutError after timeout seconds.
+    """
+    if not await start_receiver():
+        raise RuntimeError("Receiver could not be started: bus not available")
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    def deliver(msg):
+        if not future.done():
+            future.set_result(msg)
+    def listener(msg):
+        if msg.arbitration_id == can_id and (predicate is None or predicate(msg)):
+            pcan_receive.receiver.remove_listener(listener)
+            loop.call_soon_threadsafe(deliver, msg)
+    pcan_receive.receiver.add_listener(listener)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    finally:
+        pcan_receive.receiver.remove_listener(listener)
@@ -0,0 +1,135 @@
+"""
+Buffered trace logging for sent and received frames.
+
+The send and receive paths only append the can.Message to a bounded deque
+(`TraceLogger.log`); a writer thread drains it in batches into a python-can
+writer chosen by file suffix (.asc, .blf, .csv, ...) or the console. When the
+deque is full the frame is counted in `dropped` instead of waiting, so
+logging can never block or delay sending. Files can be rotated by size
+and/or age; segments are named <name>_001.asc, <name>_002.asc, ...
+"""
+import collections
+import os
+import threading
+import time
+
+import can
+
+# Verbosity levels
+TRACE_OFF = 0
+TRACE_ERRORS = 1   # send errors only (written as error frames)
+TRACE_FRAMES = 2   # every sent/received frame
+
+class TraceLogger:
+    def __init__(self, path=None, verbosity=TRACE_FRAMES, max_bytes=0, rotate_seconds=0,
+                 queue_size=100000, batch_size=1000, flush_interval=0.2):
+        """
+        path: output file (format from the suffix) or None to print to the console.
+        max_bytes / rotate_seconds: start a new segment when exceeded (0 = never).
+        """
+        self.path = path
+        self.verbosity = verbosity
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = collections.deque()
+        self.dropped = 0
+        self.written = 0
+        self.segment = 0
+        self.segment_started = 0.0
+        self.writer = None
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+    # ---------- producer side (any thread) ----------
+    def log(self, msg):
+        if self.verbosity < TRACE_FRAMES:
+            return
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.queue.append(msg)
+    def log_error(self, can_id, error):
+        if self.verbosity < TRACE_ERRORS:
+            return
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.queue.append(can.Message(timestamp=time.time(), arbitration_id=can_id, is_error_frame=True,
+                                      is_extended_id=(can_id > 0x7FF), is_rx=False))
+    # ---------- writer thread ----------
+    def segment_path(self):
+        if not (self.max_bytes or self.rotate_seconds):
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        if ext.lower() == ".gz":
+            root, inner = os.path.splitext(root)
+            ext = inner + ext
+        return f"{root}_{self.segment:03d}{ext}"
+    def open_writer(self):
+        self.segment += 1
+        self.segment_started = time.monotonic()
+        if self.path is None:
+            self.writer = can.Printer()
+        else:
+            self.writer = can.Logger(self.segment_path())
+    def close_writer(self):
+        if self.writer is not None:
+            try:
+                self.writer.stop()
+            except Exception as e:
+                print(f"Error closing trace file: {e}")
+            self.writer = None
+    def needs_rotation(self):
+        if self.path is None:
+            return False
+        if self.rotate_seconds and time.monotonic() - self.segment_started >= self.rotate_seconds:
+            return True
+        if self.max_bytes:
+            try:
+                return self.writer.file_size() >= self.max_bytes
+            except (AttributeError, NotImplementedError, OSError, ValueError):
+                return False
+        return False
+    def start(self):
+        if self.thread is not None:
+            return
+        self.open_writer()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="TraceLogger", daemon=True)
+        self.thread.start()
+    def stop(self):
+        """Write out everything still queued and close the file."""
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+    def run(self):
+        queue = self.queue
+        try:
+            while True:
+                self.wakeup.wait(self.flush_interval)
+                self.wakeup.clear()
+                running = self.running
+                while queue:
+                    count = min(len(queue), self.batch_size)
+                    writer = self.writer
+                    for _ in range(count):
+                        writer.on_message_received(queue.popleft())
+                    self.written += count
+                    if self.needs_rotation():
+                        self.close_writer()
+                        self.open_writer()
+                if self.rotate_seconds and self.needs_rotation():
+                    self.close_writer()
+                    self.open_writer()
+                if not running:
+                    break
+        finally:
+            self.close_writer()
+    def status(self):
+        return {"written": self.written, "dropped": self.dropped, "queued": len(self.queue),
+                "segment": self.segment}
@@ -0,0 +1,102 @@
+"""
+Small UDS (ISO 14229) client on top of a pcan_isotp link.
+
+    import pcan_isotp, pcan_uds
+
+    with pcan_isotp.IsoTpLink(0x7E0, 0x7E8, st_min=0) as link:
+        uds = pcan_uds.UdsClient(link)
+        uds.request(bytes([0x10, 0x02]))                 # any service, e.g. programming session
+        vin = uds.read_data_by_identifier(0xF190)
+        uds.write_data_by_identifier(0xF198, b"RIG01")
+        uds.download(0x00010000, image, progress=print)  # RequestDownload, TransferData..., RequestTransferExit
+
+request() sends one request and returns the positive response, waiting
+pending_timeout instead of timeout after every "response pending" (NRC 0x78)
+answer; other negative responses raise NegativeResponse.
+"""
+P2_TIMEOUT = 1.0        # s, for a response
+P2_STAR_TIMEOUT = 5.0   # s, after a "response pending" answer
+NEGATIVE_RESPONSE = 0x7F
+RESPONSE_PENDING = 0x78
+POSITIVE_OFFSET = 0x40
+READ_DATA_BY_IDENTIFIER = 0x22
+WRITE_DATA_BY_IDENTIFIER = 0x2E
+REQUEST_DOWNLOAD = 0x34
+TRANSFER_DATA = 0x36
+REQUEST_TRANSFER_EXIT = 0x37
+NRC_NAMES = {
+    0x10: "generalReject", 0x11: "serviceNotSupported", 0x12: "subFunctionNotSupported",
+    0x13: "incorrectMessageLengthOrInvalidFormat", 0x14: "responseTooLong", 0x21: "busyRepeatRequest",
+    0x22: "conditionsNotCorrect", 0x24: "requestSequenceError", 0x31: "requestOutOfRange",
+    0x33: "securityAccessDenied", 0x35: "invalidKey", 0x70: "uploadDownloadNotAccepted",
+    0x71: "transferDataSuspended", 0x72: "generalProgrammingFailure", 0x73: "wrongBlockSequenceCounter",
+    0x7E: "subFunctionNotSupportedInActiveSession", 0x7F: "serviceNotSupportedInActiveSession",
+}
+
+class NegativeResponse(Exception):
+    def __init__(self, sid, nrc):
+        super().__init__(f"Service {sid:#04x} refused: {NRC_NAMES.get(nrc, 'NRC')} ({nrc:#04x})")
+        self.sid = sid
+        self.nrc = nrc
+
+class UdsClient:
+    """Services of one ECU over an open IsoTpLink; errors as for IsoTpLink.send/receive, plus NegativeResponse."""
+    def __init__(self, link, timeout=P2_TIMEOUT, pending_timeout=P2_STAR_TIMEOUT):
+        self.link = link
+        self.timeout = timeout
+        self.pending_timeout = pending_timeout
+    def request(self, payload):
+        """Send a request (service ID first) and return the positive response."""
+        payload = bytes(payload)
+        sid = payload[0]
+        self.link.clear()
+        self.link.send(payload)
+        timeout = self.timeout
+        while True:
+            response = self.link.receive(timeout)
+            if len(response) >= 3 and response[0] == NEGATIVE_RESPONSE and response[1] == sid:
+                if response[2] != RESPONSE_PENDING:
+                    raise NegativeResponse(sid, response[2])
+                timeout = self.pending_timeout
+            elif response and response[0] == sid + POSITIVE_OFFSET:
+                return response
+            # anything else answers an earlier request and is skipped
+    def read_data_by_identifier(self, did):
+        """The data record of one data identifier."""
+        response = self.request(bytes([READ_DATA_BY_IDENTIFIER]) + did.to_bytes(2, "big"))
+        if response[1:3] != did.to_bytes(2, "big"):
+            raise ValueError(f"Response is for identifier {response[1:3].hex()}, not {did:04x}")
+        return response[3:]
+    def write_data_by_identifier(self, did, data):
+        self.request(bytes([WRITE_DATA_BY_IDENTIFIER]) + did.to_bytes(2, "big") + bytes(data))
+    def request_download(self, address, size, address_bytes=4, size_bytes=4, data_format=0):
+        """Announce a download; returns the ECU's maximum TransferData request length (service ID included)."""
+        response = self.request(bytes([REQUEST_DOWNLOAD, data_format, size_bytes << 4 | address_bytes])
+                                + address.to_bytes(address_bytes, "big") + size.to_bytes(size_bytes, "big"))
+        length_bytes = response[1] >> 4
+        if not 1 <= length_bytes <= len(response) - 2:
+            raise ValueError(f"Invalid RequestDownload response: {response.hex()}")
+        return int.from_bytes(response[2:2 + length_bytes], "big")
+    def transfer_data(self, sequence, data):
+        """Send one block (sequence counter 0..255); returns the response's parameter bytes."""
+        response = self.request(bytes([TRANSFER_DATA, sequence & 0xFF]) + bytes(data))
+        return response[2:]
+    def request_transfer_exit(self, data=b""):
+        return self.request(bytes([REQUEST_TRANSFER_EXIT]) + bytes(data))[1:]
+    def download(self, address, data, progress=None, **options):
+        """
+        RequestDownload, TransferData in blocks as large as the ECU accepts
+        and RequestTransferExit. progress(sent, total) is called after every
+        block. options go to request_download().
+        """
+        data = memoryview(bytes(data))
+        block_length = self.request_download(address, len(data), **options) - 2
+        if block_length <= 0:
+            raise ValueError(f"ECU accepts TransferData requests of {block_length + 2} bytes only")
+        sequence = 1
+        for position in range(0, len(data), block_length):
+            self.transfer_data(sequence, data[position:position + block_length])
+            sequence = (sequence + 1) & 0xFF
+            if progress is not None:
+                progress(min(position + block_length, len(data)), len(data))
+        return self.request_transfer_exit()
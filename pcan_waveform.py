@@ -0,0 +1,119 @@
+"""
+Precomputed waveform generators for numeric parameters.
+
+A parameter config may carry "generator": {"type": ..., ...} with
+  ramp      low -> high over period_ms, then back to low
+  sine      between low and high with period period_ms
+  triangle  low -> high -> low over period_ms
+  square    high for duty * period_ms (default 0.5), then low
+  steps     "steps": [[duration_ms, value], ...], repeated
+  random    uniform in low..high from "seed"; the sequence repeats every period_ms
+low/high default to the parameter's slider range.
+
+Generator.prepare() renders one period with NumPy at the cycle time of the
+parameter's frame, quantizes it by resolution, clamps it to the slider range
+and packs every sample into its payload integer. The transmit path then only
+calls advance(), which steps an index; no math runs per frame.
+"""
+import numpy as np
+
+WAVEFORMS = ("ramp", "sine", "triangle", "square", "steps", "random")
+MAX_SAMPLES = 1000000  # per period
+
+def compile_spec(spec):
+    """Validate a generator spec and return it normalized; raises ValueError."""
+    if not isinstance(spec, dict):
+        raise ValueError("generator must be an object")
+    kind = spec.get("type")
+    if kind not in WAVEFORMS:
+        raise ValueError(f"generator type must be one of {WAVEFORMS}")
+    result = {"type": kind}
+    try:
+        if kind == "steps":
+            steps = [[float(duration), float(value)] for duration, value in spec.get("steps") or []]
+            if not steps or any(duration <= 0 for duration, value in steps):
+                raise ValueError("generator steps must be [[duration_ms > 0, value], ...]")
+            result["steps"] = steps
+            return result
+        period = float(spec.get("period_ms", 1000))
+        if period <= 0:
+            raise ValueError("generator period_ms must be positive")
+        result["period_ms"] = period
+        for key in ("low", "high"):
+            if spec.get(key) is not None:
+                result[key] = float(spec[key])
+        if kind == "square":
+            duty = float(spec.get("duty", 0.5))
+            if not 0 <= duty <= 1:
+                raise ValueError("generator duty must be in 0..1")
+            result["duty"] = duty
+        elif kind == "random":
+            result["seed"] = int(spec.get("seed", 0))
+    except (TypeError, ValueError) as e:
+        raise ValueError(str(e) if str(e).startswith("generator") else f"invalid generator: {e}")
+    return result
+
+def sample_count(duration_ms, cycle_ms):
+    return max(1, int(round(duration_ms / cycle_ms)))
+
+def render(spec, cycle_ms, low, high):
+    """Physical values of one period, one sample per cycle."""
+    kind = spec["type"]
+    if kind == "steps":
+        counts = [sample_count(duration, cycle_ms) for duration, value in spec["steps"]]
+        if sum(counts) > MAX_SAMPLES:
+            raise ValueError(f"generator period exceeds {MAX_SAMPLES} samples")
+        return np.repeat(np.array([value for duration, value in spec["steps"]], dtype=np.float64), counts)
+    n = sample_count(spec["period_ms"], cycle_ms)
+    if n > MAX_SAMPLES:
+        raise ValueError(f"generator period exceeds {MAX_SAMPLES} samples")
+    low = spec.get("low", low)
+    high = spec.get("high", high)
+    phase = np.arange(n, dtype=np.float64) / n
+    if kind == "ramp":
+        return low + (high - low) * (np.arange(n, dtype=np.float64) / max(n - 1, 1))
+    if kind == "sine":
+        return (low + high) / 2.0 + (high - low) / 2.0 * np.sin(2.0 * np.pi * phase)
+    if kind == "triangle":
+        return low + (high - low) * (1.0 - np.abs(2.0 * phase - 1.0))
+    if kind == "square":
+        return np.where(phase < spec["duty"], high, low)
+    return np.random.default_rng(spec["seed"]).uniform(low, high, n)
+
+def quantize(values, resolution, offset, minimum, maximum):
+    """(raw int64 array, physical float array) of values clamped to minimum..maximum."""
+    raw_min = np.ceil((minimum - offset) / resolution)
+    raw_max = np.floor((maximum - offset) / resolution)
+    raw = np.clip(np.round((values - offset) / resolution), raw_min, raw_max).astype(np.int64)
+    return raw, raw * resolution + offset
+
+class Generator:
+    """
+    The precomputed period of one parameter. `table` is replaced as a whole
+    (payloads, values) tuple, so the scheduler thread can keep calling
+    advance() while a front end re-prepares it. A config edit creates a new
+    Generator, so prepare() only renders again when the cycle time changed.
+    """
+    __slots__ = ("spec", "cycle_ms", "table", "index")
+    def __init__(self, spec):
+        self.spec = spec
+        self.cycle_ms = None
+        self.table = ((0,), (0.0,))
+        self.index = 0
+    def prepare(self, cycle_ms, config, layout, bounds):
+        """Render the period for cycle_ms; bounds is (min, max) from compute_slider_range."""
+        if cycle_ms == self.cycle_ms:
+            return
+        minimum, maximum = bounds
+        resolution = float(config["resolution"])
+        offset = float(config.get("offset", 0))
+        raw, values = quantize(render(self.spec, cycle_ms, minimum, maximum), resolution, offset, minimum, maximum)
+        pack = layout.pack
+        self.table = (tuple(pack(r) for r in raw.tolist()), tuple(values.tolist()))
+        self.cycle_ms = cycle_ms
+    def advance(self):
+        """(payload, value) of the next sample."""
+        payloads, values = self.table
+        i = self.index % len(payloads)
+        self.index = i + 1
+        return payloads[i], values[i]
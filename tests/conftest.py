@@ -0,0 +1,36 @@
+import itertools
+import os
+import sys
+
+import can
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pcan_engine as engine  # noqa: E402
+import pcan_receive  # noqa: E402
+
+names = itertools.count()
+
+@pytest.fixture
+def bus():
+    """The engine on a fresh python-can virtual channel; yields a second bus on the same channel (the "peer")."""
+    channel = f"test{next(names)}"
+    engine.bus_config = {"interface": "virtual", "channel": channel, "bitrate": 500000}
+    engine.channel_settings = {}
+    peer = can.Bus(interface="virtual", channel=channel)
+    yield peer
+    engine.clear_parameters()
+    pcan_receive.receiver.shutdown()
+    pcan_receive.receiver.listeners = ()
+    engine.shutdown()
+    engine.channels.clear()
+    peer.shutdown()
+
+def next_frame(peer, can_id, timeout=1.0):
+    """The next frame of can_id the peer receives."""
+    while True:
+        msg = peer.recv(timeout)
+        assert msg is not None, f"no frame of {hex(can_id)} within {timeout} s"
+        if msg.arbitration_id == can_id:
+            return msg
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+import pcan_control
+import pcan_engine as engine
+from conftest import next_frame
+
+@pytest.fixture
+def client(bus, tmp_path):
+    """A connection to a control server on a Unix socket; yields request(obj) -> reply."""
+    path = str(tmp_path / "control.sock")
+    pcan_control.start_server(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(5.0)
+    sock.connect(path)
+    stream = sock.makefile("rwb")
+    def request(obj):
+        stream.write(json.dumps(obj).encode() + b"\n")
+        stream.flush()
+        return json.loads(stream.readline())
+    yield request
+    stream.close()
+    sock.close()
+    pcan_control.stop_server()
+
+def add(name, can_id, start_bit, value):
+    return engine.add_parameter({"name": name, "can_id": hex(can_id), "size": "8 bit", "start_bit": start_bit,
+                                 "resolution": 1, "value": value, "cycle_time": 10})
+
+@pytest.mark.parametrize("values, error", [
+    ({"a": 5, "b": "xyz"}, "b"),      # not a number
+    ({"a": 5, "missing": 1}, "missing"),
+    ({"a": 5, "b": float("inf")}, "b"),
+])
+def test_set_error_changes_nothing(bus, client, values, error):
+    a = add("a", 0x100, 0, 1)
+    b = add("b", 0x100, 8, 2)
+    engine.open_and_enable([a, b])
+    reply = client({"id": 7, "op": "set", "values": values})
+    assert reply["id"] == 7 and reply["ok"] is False
+    assert error in reply["error"]
+    assert {p["name"]: p["value"] for p in client({"id": 8, "op": "list"})["result"]} == {"a": 1, "b": 2}
+    next_frame(bus, 0x100)
+    assert next_frame(bus, 0x100).data[:2] == bytes([1, 2])
+
+def test_set(bus, client):
+    a = add("a", 0x100, 0, 1)
+    b = add("b", 0x100, 8, 2)
+    engine.open_and_enable([a, b])
+    assert client({"id": 1, "op": "set", "values": {"a": 10, "b": 20}}) == {"id": 1, "ok": True, "result": 2}
+    next_frame(bus, 0x100)
+    assert next_frame(bus, 0x100).data[:2] == bytes([10, 20])
+
+@pytest.mark.parametrize("line", [{"id": 1, "op": "nope"}, {"id": 1, "op": "set"}, {"id": 1, "op": "set", "values": [1]}])
+def test_bad_requests(client, line):
+    reply = client(line)
+    assert reply["ok"] is False and reply["error"]
+
+def test_invalid_json():
+    reply = asyncio.run(pcan_control.dispatch(None, b"{not json"))
+    assert reply["id"] is None and reply["ok"] is False
@@ -0,0 +1,59 @@
+import pytest
+
+import pcan_dbc
+import pcan_engine as engine
+
+DBC = """
+VERSION ""
+
+BO_ 256 Engine: 8 ECU
+ SG_ Speed : 0|16@1+ (0.1,0) [0|6553.5] "km/h" Dash
+ SG_ Temp : 23|8@0- (1,-40) [-40|215] "C" Dash
+ SG_ Torque : 39|12@0+ (0.5,0) [0|2047.5] "Nm" Dash
+
+BO_ 2147484672 Modes: 8 ECU
+ SG_ Mode M : 0|4@1+ (1,0) [0|15] "" Dash
+ SG_ Low m1 : 8|8@1+ (1,0) [0|255] "" Dash
+
+BA_DEF_DEF_ "GenMsgCycleTime" 100;
+BA_ "GenMsgCycleTime" BO_ 256 20;
+"""
+
+@pytest.fixture
+def db():
+    return pcan_dbc.parse_dbc(DBC.splitlines())
+
+def test_parse(db):
+    assert sorted(db.messages) == [0x100, 0x400]
+    engine_msg = db.messages[0x100]
+    assert (engine_msg.name, engine_msg.dlc, engine_msg.is_extended_id, engine_msg.cycle_time) == ("Engine", 8, False, 20)
+    assert [sig.name for sig in engine_msg.signals] == ["Speed", "Temp", "Torque"]
+    temp = engine_msg.signals[1]
+    assert (temp.start_bit, temp.length, temp.little_endian, temp.signed, temp.offset) == (23, 8, False, True, -40)
+    modes = db.messages[0x400]
+    assert modes.is_extended_id and modes.cycle_time == 100
+    assert [sig.multiplex for sig in modes.signals] == ["M", "m1"]
+
+def test_pack_plan(db):
+    plan = db.messages[0x100].plan
+    values = {"Speed": 100.0, "Temp": -10, "Torque": 100}
+    data = plan.pack(values)
+    assert data == bytes([0xE8, 0x03, 0x1E, 0x00, 0x0C, 0x80, 0x00, 0x00])
+    assert plan.unpack(data) == pytest.approx(values)
+    assert plan.pack({}) == bytes(8)
+
+def test_pack_plan_skips_multiplexed(db):
+    plan = db.messages[0x400].plan
+    assert plan.pack({"Mode": 1, "Low": 0x55}) == bytes([1, 0, 0, 0, 0, 0, 0, 0])
+
+def test_configs_match_plan(db):
+    """The editor configs of a message's signals build the same frame as its PackPlan."""
+    configs, skipped = pcan_dbc.database_configs(db)
+    assert skipped == ["Modes.Low"]
+    raw = {"Engine.Speed": 1000, "Engine.Temp": 30, "Engine.Torque": 200}
+    frame = 0
+    for config in configs:
+        if config["name"] in raw:
+            compiled, enabled = engine.compile_config(dict(config))
+            frame |= engine.SignalLayout(compiled).pack(raw[config["name"]])
+    assert frame.to_bytes(8, "little") == db.messages[0x100].plan.pack({"Speed": 100.0, "Temp": -10, "Torque": 100})
@@ -0,0 +1,85 @@
+import statistics
+
+import pytest
+
+import pcan_engine as engine
+from conftest import next_frame
+
+def layout(size, start_bit, byte_order, signed=False):
+    return engine.SignalLayout({"size": f"{size} bit", "start_bit": start_bit, "byte_order": byte_order,
+                                "type": "Signed" if signed else "Unsigned"})
+
+def frame_bytes(frame, length=8):
+    return frame.to_bytes(length, "little")
+
+def test_intel_packing():
+    sig = layout(16, 8, "intel")
+    assert frame_bytes(sig.pack(0x1234)) == bytes([0, 0x34, 0x12, 0, 0, 0, 0, 0])
+    assert sig.unpack(sig.pack(0x1234)) == 0x1234
+    assert sig.needed_bytes == 3
+
+def test_motorola_packing():
+    sig = layout(16, 7, "motorola")  # DBC start bit = MSB of byte 0
+    assert frame_bytes(sig.pack(0x1234)) == bytes([0x12, 0x34, 0, 0, 0, 0, 0, 0])
+    odd = layout(12, 3, "motorola")  # MSB at bit 3 of byte 0, LSB in the high nibble of byte 1
+    assert frame_bytes(odd.pack(0xABC)) == bytes([0x0A, 0xBC, 0, 0, 0, 0, 0, 0])
+    assert odd.unpack(odd.pack(0xABC)) == 0xABC
+
+def test_signed_saturates_and_round_trips():
+    sig = layout(8, 0, "intel", signed=True)
+    assert sig.unpack(sig.pack(-5)) == -5
+    assert sig.unpack(sig.pack(-1000)) == -128
+    assert sig.unpack(sig.pack(1000)) == 127
+
+def signal_config(name, start_bit, size=8, can_id=0x100):
+    config, enabled = engine.compile_config({"name": name, "can_id": hex(can_id), "size": f"{size} bit",
+                                             "start_bit": start_bit, "resolution": 1})
+    return config
+
+def test_overlap_rejected():
+    with pytest.raises(ValueError, match="overlaps 'a'"):
+        engine.check_overlaps([signal_config("a", 0), signal_config("b", 4)])
+    engine.check_overlaps([signal_config("a", 0), signal_config("b", 8), signal_config("c", 0, can_id=0x101)])
+
+def test_add_parameter_rejects_overlap(bus):
+    engine.add_parameter(dict(signal_config("a", 0), value=1))
+    with pytest.raises(ValueError, match="overlaps"):
+        engine.add_parameter(signal_config("b", 7, size=4))
+    assert [param.config["name"] for param in engine.saved_parameters] == ["a"]
+
+def test_profile_round_trip(bus, tmp_path):
+    engine.add_parameter({"name": "speed", "can_id": "0x100", "size": "16 bit", "start_bit": 0, "resolution": 0.5,
+                          "offset": -10, "type": "Signed", "value": 42.5, "cycle_time": 20})
+    engine.add_parameter({"name": "text", "can_id": "0x101", "size": "3 byte", "mode": "ascii",
+                          "mapping": [0, 1, 2], "value": "abc"})
+    engine.add_parameter({"name": "alive", "can_id": "0x100", "size": "4 bit", "start_bit": 16, "mode": "counter",
+                          "wrap": 14, "tx_mode": "cyclic_on_change", "min_gap_ms": 5})
+    before = [(param.config, param.value, param.payload) for param in engine.saved_parameters]
+    path = str(tmp_path / "profile.json")
+    engine.save_profile(path)
+    engine.clear_parameters()
+    params = engine.load_profile(path, enable=False)
+    assert [(param.config, param.value, param.payload) for param in params] == before
+    assert engine.bus_config["channel"] == engine.get_channel().name
+
+def frame_times(peer, can_ids, count):
+    times = {can_id: [] for can_id in can_ids}
+    while min(len(t) for t in times.values()) < count:
+        msg = peer.recv(1.0)
+        assert msg is not None
+        if msg.arbitration_id in times:
+            times[msg.arbitration_id].append(msg.timestamp)
+    return times
+
+def test_scheduler_period_and_phase(bus):
+    a = engine.add_parameter(dict(signal_config("a", 0), cycle_time=20))
+    b = engine.add_parameter(dict(signal_config("b", 0, can_id=0x101), cycle_time=20))
+    engine.open_and_enable([a, b])
+    next_frame(bus, 0x101)
+    times = frame_times(bus, (0x100, 0x101), 30)
+    for stamps in times.values():
+        period = statistics.median(t1 - t0 for t0, t1 in zip(stamps, stamps[1:]))
+        assert period == pytest.approx(0.020, abs=0.002)
+    # the second ID gets the phase farthest from the first: half a period apart
+    offsets = [min(abs(tb - ta) for ta in times[0x100]) for tb in times[0x101]]
+    assert statistics.median(offsets) == pytest.approx(0.010, abs=0.003)
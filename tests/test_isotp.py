@@ -0,0 +1,110 @@
+import threading
+import time
+
+import can
+import pytest
+
+import pcan_isotp
+import pcan_uds
+from conftest import next_frame
+
+TX, RX = 0x7E0, 0x7E8
+
+@pytest.fixture
+def link(bus):
+    with pcan_isotp.IsoTpLink(TX, RX, block_size=1) as link:
+        yield link
+
+def reply(peer, *data):
+    peer.send(can.Message(arbitration_id=RX, data=bytes(data).ljust(8, b"\xCC"), is_extended_id=False))
+
+def test_st_min_encoding():
+    assert [pcan_isotp.encode_st_min(ms) for ms in (0, 5, 127, 0.1, 0.9)] == [0, 5, 127, 0xF1, 0xF9]
+    assert [pcan_isotp.decode_st_min(b) for b in (0, 20, 0xF5, 0x80)] == [0, 0.02, 0.0005, 0.127]
+    with pytest.raises(ValueError):
+        pcan_isotp.encode_st_min(128)
+
+def test_single_frame(bus, link):
+    link.send(b"\x22\xF1\x90")
+    assert bytes(next_frame(bus, TX).data) == bytes([0x03, 0x22, 0xF1, 0x90, 0xCC, 0xCC, 0xCC, 0xCC])
+
+def test_segmentation_and_flow_control(bus, link):
+    data = bytes(range(100))
+    transfer = link.send_async(data)
+    first = next_frame(bus, TX)
+    assert bytes(first.data) == bytes([0x10, 100]) + data[:6]
+    received = bytearray(first.data[2:])
+    sequence = 1
+    while len(received) < len(data):
+        reply(bus, 0x30, 3, 5)  # continue, block size 3, STmin 5 ms
+        stamps = []
+        for _ in range(3):
+            frame = next_frame(bus, TX)
+            stamps.append(time.perf_counter())
+            assert frame.data[0] == 0x20 | sequence
+            sequence = (sequence + 1) & 0xF
+            received += frame.data[1:]
+            if len(received) >= len(data):
+                break
+        assert all(t1 - t0 >= 0.004 for t0, t1 in zip(stamps, stamps[1:]))
+        if len(received) < len(data):
+            assert bus.recv(0.05) is None  # the block is over: wait for the next flow control
+    transfer.wait()
+    assert bytes(received[:len(data)]) == data
+    assert received[len(data):] == b"\xCC" * (len(received) - len(data))
+
+def test_overflow_and_missing_flow_control(bus, link):
+    transfer = link.send_async(bytes(20))
+    next_frame(bus, TX)
+    reply(bus, 0x32, 0, 0)
+    with pytest.raises(pcan_isotp.IsoTpError, match="overflow"):
+        transfer.wait()
+    with pytest.raises(TimeoutError, match="No flow control"):
+        link.send(bytes(20))
+    next_frame(bus, TX)  # its first frame
+    link.send(b"\x3E\x00")  # the link thread still serves
+    assert next_frame(bus, TX).data[:3] == bytearray([0x02, 0x3E, 0x00])
+
+def test_receive_sends_flow_control(bus, link):
+    data = bytes(range(1, 21))
+    def peer():
+        reply(bus, 0x10, 20, *data[:6])
+        for sequence, position in ((1, 6), (2, 13)):
+            assert bytes(next_frame(bus, TX).data[:3]) == bytes([0x30, 1, 0])  # block size 1: one FC per CF
+            reply(bus, 0x20 | sequence, *data[position:position + 7])
+    thread = threading.Thread(target=peer)
+    thread.start()
+    assert link.receive(2.0) == data
+    thread.join()
+
+def test_receive_wrong_sequence(bus, link):
+    reply(bus, 0x10, 20, *range(6))
+    reply(bus, 0x22, *range(7))
+    with pytest.raises(pcan_isotp.IsoTpError, match="Wrong sequence number"):
+        link.receive(1.0)
+    assert bytes(next_frame(bus, TX).data[:3]) == bytes([0x30, 1, 0])
+
+def test_uds_read_data_by_identifier(bus, link):
+    def ecu():
+        assert bytes(next_frame(bus, TX).data[:4]) == bytes([0x03, 0x22, 0xF1, 0x90])
+        reply(bus, 0x03, 0x7F, 0x22, 0x78)  # response pending
+        reply(bus, 0x10, 20, 0x62, 0xF1, 0x90, *b"WVW")
+        next_frame(bus, TX)  # flow control
+        reply(bus, 0x21, *b"ZZZ1JZW")
+        next_frame(bus, TX)
+        reply(bus, 0x22, *b"0000012")
+    thread = threading.Thread(target=ecu)
+    thread.start()
+    assert pcan_uds.UdsClient(link).read_data_by_identifier(0xF190) == b"WVWZZZ1JZW0000012"
+    thread.join()
+
+def test_uds_negative_response(bus, link):
+    def ecu():
+        next_frame(bus, TX)
+        reply(bus, 0x03, 0x7F, 0x22, 0x31)
+    thread = threading.Thread(target=ecu)
+    thread.start()
+    with pytest.raises(pcan_uds.NegativeResponse, match="requestOutOfRange") as info:
+        pcan_uds.UdsClient(link).read_data_by_identifier(0x1234)
+    assert info.value.nrc == 0x31
+    thread.join()
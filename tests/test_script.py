@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+import pcan_engine as engine
+import pcan_script as script
+from conftest import next_frame
+
+def add(config):
+    defaults = {"can_id": "0x100", "size": "8 bit", "mapping": list(range(8)), "target_byte": 0,
+                "resolution": 1, "cycle_time": 10}
+    return engine.add_parameter(dict(defaults, **config))
+
+@pytest.mark.parametrize("name, value", [("v", "abc"), ("v", None), ("v", True), ("v", float("inf")), ("s", 5)])
+def test_rejected_set_changes_nothing(bus, name, value):
+    v = add({"name": "v", "value": 3})
+    add({"name": "w", "target_byte": 1, "value": 4})
+    s = add({"name": "s", "can_id": "0x101", "size": "2 byte", "mode": "ascii", "mapping": [0, 1], "value": "ok"})
+    engine.open_and_enable(engine.saved_parameters)
+    before = {param.config["name"]: (param.value, param.payload) for param in engine.saved_parameters}
+    frames = {can_id: bytes(next_frame(bus, can_id).data) for can_id in (0x100, 0x101)}
+    with pytest.raises((TypeError, ValueError)):
+        asyncio.run(script.set(name, value))
+    with pytest.raises((TypeError, ValueError)):
+        asyncio.run(script.update({"w": 9, name: value}))  # w is valid, but the batch is rejected as a whole
+    assert {param.config["name"]: (param.value, param.payload) for param in engine.saved_parameters} == before
+    for can_id, data in frames.items():
+        next_frame(bus, can_id)  # may have been built before the attempts
+        assert bytes(next_frame(bus, can_id).data) == data
+    assert (v.value, s.value) == (3.0, "ok")
+
+def test_update_changes_frame(bus):
+    add({"name": "v", "value": 3})
+    add({"name": "w", "target_byte": 1, "value": 4})
+    engine.open_and_enable(engine.saved_parameters)
+    before = bytes(next_frame(bus, 0x100).data)
+    asyncio.run(script.update({"v": 7, "w": 8}))
+    next_frame(bus, 0x100)
+    after = bytes(next_frame(bus, 0x100).data)
+    assert after != before
+    assert (script.parameter("v").value, script.parameter("w").value) == (7.0, 8.0)